@@ -1,49 +1,125 @@
-from flask import render_template, Flask, request, redirect, url_for, flash, jsonify
+from flask import render_template, Flask, request, redirect, url_for, flash, jsonify, Response, stream_with_context
+import json
+import logging
+import time
+import threading
+from dataclasses import asdict
 from flask_wtf import CSRFProtect
 from forms import TradeForm
-import os
-import secrets
-from stock_trader.services.trade_service import init_db, get_trades, calculate_positions_and_pnl
+from stock_trader.utils.secret_key import load_secret_key
+from stock_trader.services.trade_service import init_db, get_trades_page, calculate_positions_from_ledger, add_trade_listener
 from stock_trader.services.llm_trading import llm_auto_trade
-from stock_trader.services.llm_agent import LLMTraderAgent
+from stock_trader.services.llm_agent import get_model_registry, get_response_cache, get_inference_queue
 from stock_trader.services.trading_executor import auto_trade_by_llm_decision
-from stock_trader.utils.logger import log_llm_decision, get_recent_logs
-from stock_trader.utils.market import get_symbols, get_market_rows, summarize_asset_values
-from stock_trader.utils.market_data import fetch_market_data, append_market_data_csv
-from stock_trader.utils.chart import generate_asset_bar_chart, generate_position_pie_chart
+from stock_trader.utils.logger import log_llm_decision, get_recent_logs, LOG_FORMAT, DECISION_LOGGER
+from stock_trader.utils.market import get_watchlist, get_market_rows, summarize_asset_values
+from stock_trader.services.symbol_registry import get_symbol_registry
+from stock_trader.services.market_collector import get_market_collector
+from stock_trader.services.market_history import get_market_store
+from stock_trader.services.event_bus import get_event_bus, publish_fills, sse_messages, EventLogHandler
+from stock_trader.services.order_queue import get_order_queue
+from stock_trader.services.risk_analytics import get_risk_analytics
+from stock_trader.data import get_stock_price
+from stock_trader.utils.market_data import get_market_fetcher
+from stock_trader.utils import instrumentation
+from stock_trader.utils.instrumentation import span
+from stock_trader.config import (
+    MARKET_COLLECTOR_ENABLED, MARKET_DATA_CSV, LLM_WARMUP, PRELOAD, DEFAULT_INITIAL_FUND, CHART_RENDER_MODE, CHART_FORMAT,
+    TRADES_PAGE_SIZE, TRADES_MAX_PAGE_SIZE, SYMBOL_SEARCH_LIMIT, EVENTS_MAX_STREAMS
+)
+from stock_trader.utils.chart import (
+    render_asset_bar_chart, render_position_pie_chart, asset_chart_key, position_chart_key, chart_series, MIMETYPES,
+    get_pyplot
+)
 from stock_trader.services.trade_form_service import handle_trade_form, handle_trade_form_errors
 from flask_wtf.csrf import CSRFError
 
 
 def create_app():
     app = Flask(__name__, template_folder='templates', static_folder='static')
-    # 开发环境可自动生成 secret_key，生产环境建议用环境变量
-    secret_key = os.environ.get('FLASK_SECRET_KEY')
-    if not secret_key:
-        secret_key = secrets.token_urlsafe(32)
-    app.secret_key = secret_key
+    # FLASK_SECRET_KEY 优先；否则所有 worker 共用 SECRET_KEY_PATH 中生成一次的 key
+    app.secret_key = load_secret_key()
     # Enable CSRF protection
     csrf = CSRFProtect(app)
     app.csrf = csrf  # 方便全局访问
     return app
 
 app = create_app()
+# 请求计时最先注册，使其覆盖其余 before_request 钩子
+metrics = instrumentation.init_app(app)
+metrics.register_gauge('stocktrader_llm_queue_depth', 'Prompts waiting for batched inference.',
+                       lambda: get_inference_queue().depth())
+metrics.register_gauge('stocktrader_orders_pending', 'Orders waiting to be executed by the order worker.',
+                       lambda: get_order_queue().depth())
+metrics.register_gauge('stocktrader_market_snapshot_age_seconds', 'Seconds since the last market snapshot.',
+                       lambda: _snapshot_age())
 
-init_db()
+def _snapshot_age():
+    _, collected_at = get_market_collector().latest_snapshot()
+    return round(time.time() - collected_at, 3) if collected_at else None
 
-@app.route('/')
-def dashboard():
-    initial_fund = 1_000_000_000
-    trades = get_trades()
-    position_rows, cash_balance, position_value, total_asset_value, pnl, roi_str = calculate_positions_and_pnl(trades, initial_fund)
-    symbols = get_symbols()
-    market_rows = get_market_rows(symbols)
+_startup_lock = threading.Lock()
+_started = False
+
+def startup():
+    """
+    初始化交易库和行情库（幂等）。导入 app 时不做任何 I/O，首个请求时自动调用；
+    生产 worker 可通过 preload() 提前完成。
+    """
+    global _started
+    if _started:
+        return
+    with _startup_lock:
+        if _started:
+            return
+        init_db()
+        get_market_store().init(migrate_from=MARKET_DATA_CSV)
+        # 成交和成交/决策日志行推送到 /events；其余模块的日志不推送（每行都会写一次状态库）
+        add_trade_listener(publish_fills)
+        log_handler = EventLogHandler(get_event_bus())
+        log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logging.getLogger(DECISION_LOGGER).addHandler(log_handler)
+        # 订单 worker：执行本进程和其他进程提交的订单（含重启前遗留的）
+        get_order_queue().start()
+        if LLM_WARMUP:
+            get_model_registry().warm_up()
+        _started = True
 
+def preload():
+    """
+    生产 worker 预热：完成 startup()，并提前导入 matplotlib 和 yfinance，
+    让首个请求不承担这些导入开销（LLM_WARMUP 时模型也在后台加载）。
+    设置 STOCKTRADER_PRELOAD=1 时在导入 app 时调用，适合 gunicorn --preload。
+    """
+    startup()
+    get_pyplot()
+    import yfinance  # noqa: F401
 
-    # 每次刷新时获取最新市场数据并追加到 market_data.json
-    market_data = fetch_market_data(symbols)
-    append_market_data_csv(market_data, os.path.join(os.path.dirname(__file__), 'market_data.csv'))
+@app.before_request
+def ensure_started():
+    startup()
 
+@app.before_request
+def start_market_collector():
+    # 行情采集在后台线程中进行，首个请求时启动（避免 debug reloader 的父进程重复采集）
+    if MARKET_COLLECTOR_ENABLED:
+        get_market_collector().start()
+
+@app.route('/')
+def dashboard():
+    initial_fund = 1_000_000_000
+    # 先记下事件位置再读取状态：之后的成交都会通过 /events 补发（页面按版本号去重）
+    events_after = get_event_bus().latest_id()
+    # 只渲染第一页成交记录，其余由前端通过 /api/trades 按需加载
+    trades, trades_next_after_id = get_trades_page(limit=TRADES_PAGE_SIZE)
+    position_rows, cash_balance, position_value, total_asset_value, pnl, roi_str = calculate_positions_from_ledger(initial_fund)
+    # 只展示持仓和关注列表的前 DASHBOARD_MARKET_ROWS 个 symbol，页面大小不随注册表增长
+    symbols = get_watchlist(position_rows)
+    # 行情快照由后台采集器写入，这里只读取最新一份
+    snapshot, _ = get_market_collector().latest_snapshot()
+    market_rows = get_market_rows(symbols, snapshot)
+    # 风险指标按快照增量更新并缓存，同一快照内的刷新不重复计算
+    risk = get_risk_analytics().report(_holdings(position_rows))
 
     # 智能分析：不自动调用，由按钮触发
     llm_answer = None
@@ -52,32 +128,177 @@ def dashboard():
 
     logs = get_recent_logs(50)
     stock_buy, stock_market, crypto_buy, crypto_market = summarize_asset_values(position_rows)
-    asset_bar_chart = generate_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market)
-    position_pie_chart = generate_position_pie_chart(position_rows)
-
-    return render_template(
-        'dashboard.html',
-        initial_fund=initial_fund,
-        cash_balance=cash_balance,
-        position_value=position_value,
-        total_asset_value=total_asset_value,
-        pnl=pnl,
-        roi=roi_str,
-        market_rows=market_rows,
-        position_rows=position_rows,
-        trades=trades,
-        symbols=symbols,
-        asset_bar_chart=asset_bar_chart,
-        position_pie_chart=position_pie_chart,
-        stock_buy=stock_buy,
-        stock_market=stock_market,
-        crypto_buy=crypto_buy,
-        crypto_market=crypto_market,
-        llm_answer=llm_answer,
-        user_question=user_question,
-        auto_trade_result=auto_trade_result,
-        logs=logs
+    # 图表不再内联 base64：页面只引用带内容版本号的图片地址，图片由 /charts 接口按需渲染并缓存
+    asset_bar_chart = url_for('chart_image', name='assets', fmt=CHART_FORMAT,
+                              v=asset_chart_key(stock_buy, stock_market, crypto_buy, crypto_market, CHART_FORMAT))
+    position_pie_chart = None
+    if any(row['Market Value'] for row in position_rows):
+        position_pie_chart = url_for('chart_image', name='positions', fmt=CHART_FORMAT,
+                                     v=position_chart_key(position_rows, CHART_FORMAT))
+
+    with span('template'):
+        html = render_template(
+            'dashboard.html',
+            initial_fund=initial_fund,
+            cash_balance=cash_balance,
+            position_value=position_value,
+            total_asset_value=total_asset_value,
+            pnl=pnl,
+            roi=roi_str,
+            market_rows=market_rows,
+            position_rows=position_rows,
+            trades=trades,
+            trades_next_after_id=trades_next_after_id,
+            symbols=symbols,
+            asset_bar_chart=asset_bar_chart,
+            position_pie_chart=position_pie_chart,
+            chart_mode=CHART_RENDER_MODE,
+            stock_buy=stock_buy,
+            stock_market=stock_market,
+            crypto_buy=crypto_buy,
+            crypto_market=crypto_market,
+            llm_answer=llm_answer,
+            user_question=user_question,
+            auto_trade_result=auto_trade_result,
+            logs=logs,
+            risk=risk,
+            dashboard_state=_dashboard_state(initial_fund, cash_balance, position_rows, trades, events_after)
+        )
+    return html
+
+def _holdings(position_rows):
+    return {row['Symbol']: row['Quantity'] for row in position_rows if row['Quantity'] > 0}
+
+def _dashboard_state(initial_fund, cash_balance, position_rows, trades, events_after):
+    """页面初始状态，dashboard.js 在此基础上应用 /events 推送的增量。"""
+    return {
+        'initialFund': initial_fund,
+        'cash': cash_balance,
+        'version': trades[0].id if trades else 0,
+        'eventsAfter': events_after,
+        'positions': {
+            row['Symbol']: {'quantity': row['Quantity'], 'costBasis': row['Market Value'] - row['P&L'],
+                            'buyDate': row['Buy Date'], 'price': row['Current Price']}
+            for row in position_rows
+        },
+    }
+
+# 每个 /events 连接占用一个 worker 线程：限制本进程的并发流数量，保证普通请求总有线程可用
+_event_streams = threading.BoundedSemaphore(EVENTS_MAX_STREAMS)
+
+@app.route('/events')
+def events():
+    """
+    仪表盘推送通道（SSE）：fills（成交及持仓变化）、tick（价格）、log（日志行）。
+    从 ?after=<事件 id> 开始推送，重连时以 Last-Event-ID 为准。
+    本进程已有 EVENTS_MAX_STREAMS 个连接时返回 503，页面稍后重连。
+    """
+    if not _event_streams.acquire(blocking=False):
+        return Response('retry: 10000\n\n', status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': '10', 'Cache-Control': 'no-cache'})
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('after', type=int)
+    response = Response(stream_with_context(sse_messages(get_event_bus(), last_id)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # 连接关闭（含客户端断开）时由 WSGI 服务器调用，即使流从未开始迭代也会释放
+    response.call_on_close(_event_streams.release)
+    return response
+
+def _wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+@app.route('/api/trades')
+def api_trades():
+    """
+    成交记录分页接口（按时间倒序）。参数：after_id（上一页返回的游标）、limit、symbol、start、end。
+    返回 {"trades": [...], "next_after_id": int 或 null}。
+    """
+    try:
+        after_id = request.args.get('after_id', type=int)
+        limit = min(request.args.get('limit', TRADES_PAGE_SIZE, type=int), TRADES_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'invalid parameters'}), 400
+    trades, next_after_id = get_trades_page(
+        after_id=after_id, limit=max(limit, 1), symbol=request.args.get('symbol') or None,
+        start=request.args.get('start') or None, end=request.args.get('end') or None
     )
+    return jsonify({
+        'trades': [{
+            'id': t.id, 'symbol': t.symbol, 'type': t.type, 'quantity': t.quantity,
+            'price': t.price, 'timestamp': str(t.timestamp),
+        } for t in trades],
+        'next_after_id': next_after_id,
+    })
+
+@app.route('/api/symbols')
+def api_symbols():
+    """按前缀搜索 symbol（交易表单自动补全用）。参数：q、limit。"""
+    limit = min(request.args.get('limit', SYMBOL_SEARCH_LIMIT, type=int) or SYMBOL_SEARCH_LIMIT, 100)
+    results = get_symbol_registry().search(request.args.get('q', ''), limit=max(limit, 1))
+    return jsonify({'symbols': [asdict(info) for info in results]})
+
+@app.route('/api/quote/<symbol>')
+def api_quote(symbol):
+    """返回单个已注册 symbol 的最新价格（走行情缓存）。"""
+    symbol = symbol.upper()
+    if symbol not in get_symbol_registry():
+        return jsonify({'error': 'unknown symbol'}), 404
+    return jsonify({'symbol': symbol, 'price': get_stock_price(symbol)})
+
+@app.route('/api/orders/<int:order_id>')
+def api_order(order_id):
+    """返回订单当前状态及其事件历史（submitted → claimed → filled/rejected/failed）。"""
+    queue = get_order_queue()
+    order = queue.get_order(order_id)
+    if order is None:
+        return jsonify({'error': 'unknown order'}), 404
+    order['events'] = queue.get_events(order_id)
+    return jsonify(order)
+
+@app.route('/api/risk')
+def api_risk():
+    """
+    当前持仓在最近 RISK_WINDOW 个行情快照上的风险指标：组合收益、年化波动率、Sharpe、回撤、
+    持仓间收益相关系数，以及各持仓 symbol 的滚动收益和波动率。
+    """
+    position_rows = calculate_positions_from_ledger(DEFAULT_INITIAL_FUND)[0]
+    return jsonify(get_risk_analytics().report(_holdings(position_rows)))
+
+def _chart_inputs():
+    position_rows = calculate_positions_from_ledger(DEFAULT_INITIAL_FUND)[0]
+    return summarize_asset_values(position_rows), position_rows
+
+@app.route('/charts/<name>.<fmt>')
+def chart_image(name, fmt):
+    """返回当前持仓的图表图片，带 ETag；内容未变时返回 304，不做任何渲染。"""
+    if fmt not in MIMETYPES or name not in ('assets', 'positions'):
+        return Response(status=404)
+    asset_values, position_rows = _chart_inputs()
+    if name == 'assets':
+        key = asset_chart_key(*asset_values, fmt)
+    else:
+        key = position_chart_key(position_rows, fmt)
+    if key in request.if_none_match:
+        response = Response(status=304)
+    else:
+        data = render_asset_bar_chart(*asset_values, fmt=fmt) if name == 'assets' else render_position_pie_chart(position_rows, fmt=fmt)
+        if data is None:
+            return Response(status=404)
+        response = Response(data, mimetype=MIMETYPES[fmt])
+    response.set_etag(key)
+    # 带正确版本号的地址内容不会变，可长期缓存；否则每次都需用 ETag 校验
+    if request.args.get('v') == key:
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+@app.route('/charts/data.json')
+def chart_data():
+    asset_values, position_rows = _chart_inputs()
+    return jsonify(chart_series(*asset_values, position_rows))
 
 @app.route('/llm_analysis', methods=['POST'])
 @app.csrf.exempt
@@ -86,26 +307,60 @@ def llm_analysis():
     answer = auto_llm_analysis()
     return jsonify({'llm_answer': answer})
 
+@app.route('/llm_analysis/stream', methods=['POST'])
+@app.csrf.exempt
+def llm_analysis_stream():
+    """以 SSE 格式逐段推送分析结果：每段为 data: {"text": ...}，结束时发送 event: done。"""
+    from stock_trader.services.llm_agent import stream_auto_llm_analysis
+
+    def generate():
+        for text in stream_auto_llm_analysis():
+            yield f"data: {json.dumps({'text': text}, ensure_ascii=False)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/health/llm')
+def llm_health():
+    status = get_model_registry().status()
+    status['queue_depth'] = get_inference_queue().depth()
+    status['response_cache'] = get_response_cache().stats()
+    return jsonify(status)
+
+@app.route('/health/market')
+def market_health():
+    collector = get_market_collector()
+    _, collected_at = collector.latest_snapshot()
+    return jsonify({'collected_at': collected_at, 'collector_leader': collector.is_leader,
+                    'symbols': get_market_fetcher().stats()})
+
 @app.route('/auto_trade', methods=['POST'])
 def auto_trade():
-    symbols = get_symbols()
     user_question = request.form.get('question')
     llm_answer = request.form.get('llm_answer')
-    from stock_trader.services.trading_executor import auto_trade_by_llm_decision
-    auto_trade_result = auto_trade_by_llm_decision(llm_answer, symbols)
+    # 只提交订单、立即返回；成交由订单 worker 完成并经 /events 推送。Idempotency-Key 头可由客户端指定
+    # 注册表本身支持 O(1) 的 in 判断，解析时不复制 symbol 列表
+    auto_trade_result = auto_trade_by_llm_decision(llm_answer, get_symbol_registry(),
+                                                   idempotency_key=request.headers.get('Idempotency-Key'))
+    if _wants_json():
+        return jsonify({'auto_trade_result': auto_trade_result})
     return redirect(url_for('dashboard', question=user_question, auto_trade_result=auto_trade_result))
 
 @app.route('/trade', methods=['GET', 'POST'])
 def trade():
-    symbols = get_symbols()
     form = TradeForm()
-    form.symbol.choices = [(s, s) for s in symbols]
+    # 页面脚本以 Accept: application/json 提交，只返回结果消息，成交经 /events 推送到页面
     if form.validate_on_submit():
-        return handle_trade_form(form)
+        return handle_trade_form(form, as_json=_wants_json())
     else:
-        return handle_trade_form_errors(form)
+        return handle_trade_form_errors(form, as_json=_wants_json())
+
+if PRELOAD:
+    preload()
 
 def main():
+    # 开发服务器（单进程）；生产环境使用 gunicorn -c gunicorn.conf.py wsgi:app
     app.run(debug=True)
 
 if __name__ == '__main__':
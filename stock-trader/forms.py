@@ -1,9 +1,16 @@
 from flask_wtf import FlaskForm
-from wtforms import SelectField, IntegerField, SubmitField
-from wtforms.validators import DataRequired, NumberRange
+from wtforms import SelectField, IntegerField, StringField, SubmitField
+from wtforms.validators import DataRequired, NumberRange, ValidationError
+from stock_trader.services.symbol_registry import get_symbol_registry
+
+def known_symbol(form, field):
+    """Validate against the symbol registry (O(1) lookup, independent of watchlist size)."""
+    field.data = (field.data or '').strip().upper()
+    if field.data not in get_symbol_registry():
+        raise ValidationError('Unknown symbol.')
 
 class TradeForm(FlaskForm):
-    symbol = SelectField('Symbol', validators=[DataRequired()])
+    symbol = StringField('Symbol', validators=[DataRequired(), known_symbol])
     trade_type = SelectField('Trade Type', choices=[('Buy', 'Buy'), ('Sell', 'Sell')], validators=[DataRequired()])
     quantity = IntegerField('Quantity', validators=[DataRequired(), NumberRange(min=1, max=1000000)])
     submit = SubmitField('Submit Trade')
@@ -0,0 +1,37 @@
+"""
+gunicorn 配置：多进程 + 每进程多线程（gthread）。
+
+环境变量：
+    STOCKTRADER_BIND      监听地址，默认 0.0.0.0:8000
+    WEB_CONCURRENCY       worker 进程数，默认 2
+    STOCKTRADER_THREADS   每个 worker 的线程数，默认 16；其中至多一半（STOCKTRADER_EVENTS_MAX_STREAMS）
+                          用于仪表盘的 /events 长连接，超出时返回 503，页面稍后重连
+    FLASK_SECRET_KEY      所有 worker 共用的 secret key（未设置时使用 STOCKTRADER_SECRET_KEY_FILE 中生成一次的 key）
+
+共享状态（LLM 回答缓存、LLM 交易去重）在 STOCKTRADER_STATE_DB_PATH 指向的 SQLite 中；
+行情采集只在持有采集锁的一个 worker 中运行；日志由各 worker 追加到同一文件，轮转时加文件锁。
+
+注意：大模型不在进程间共享，每个 worker 在首次分析时（STOCKTRADER_LLM_WARMUP=1 时在启动时）
+各自加载一份模型，显存/内存占用随 worker 数成倍增加。使用大模型时保持较少的 worker，
+用 STOCKTRADER_THREADS 提高并发。
+"""
+import os
+
+bind = os.environ.get('STOCKTRADER_BIND', '0.0.0.0:8000')
+# 默认只开 2 个 worker：每个 worker 各持有一份模型（见上）
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# worker 导入配置前导出 worker 数：多于一个时日志改为从共享文件读取最近行
+os.environ['STOCKTRADER_WORKERS'] = str(workers)
+threads = int(os.environ.get('STOCKTRADER_THREADS', 16))
+worker_class = 'gthread'
+# LLM 请求最长等待 STOCKTRADER_LLM_TIMEOUT（默认 300s），SSE 流也会长时间占用连接
+timeout = int(os.environ.get('STOCKTRADER_WORKER_TIMEOUT', 330))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get('STOCKTRADER_ACCESS_LOG')  # '-' 输出到 stdout
+
+
+def post_worker_init(worker):
+    # 每个 worker 在开始接收请求前完成数据库初始化并导入 matplotlib / yfinance，首个请求不再变慢
+    from app import preload
+    preload()
@@ -0,0 +1,100 @@
+"""
+对比旧的逐 symbol 子串匹配（parse_llm_decision）与单次扫描解析器（decision_parser）：
+在数千个 symbol 和长模型输出上测量每次解析耗时，并统计旧方法的误匹配
+（如 "META" 命中 "METAL"）和遗漏（旧方法每个回答只返回一个意图）。
+
+用法：
+    python scripts/benchmark_decision_parser.py                           # 1k / 5k / 20k symbols
+    python scripts/benchmark_decision_parser.py --symbols 5000 --chars 2000 20000 --repeat 20
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_trader.services.decision_parser import DecisionParser, parse_decision
+
+FILLER = ["市场整体震荡，成交量放大。", "METAL 板块和 metadata 服务商表现一般。", "预计未来5天波动加大，",
+          "Volatility remains elevated across sectors. ", "宏观数据好于预期，风险偏好回升。"]
+
+
+def legacy_parse(llm_answer, symbols):
+    """旧实现：逐个 symbol 做子串查找，返回第一个 (action, symbol)。"""
+    if not llm_answer:
+        return None
+    for symbol in symbols:
+        if symbol in llm_answer:
+            if '买' in llm_answer or 'buy' in llm_answer.lower():
+                return 'Buy', symbol
+            if '卖' in llm_answer or 'sell' in llm_answer.lower():
+                return 'Sell', symbol
+    return None
+
+
+def synthetic_symbols(n, seed=0):
+    rng = random.Random(seed)
+    symbols = {'META', 'AAPL', 'MSFT', 'BTC-USD'}
+    while len(symbols) < n:
+        symbols.add(''.join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 5))))
+    return sorted(symbols)
+
+
+def synthetic_answer(symbols, chars, intents, seed=0):
+    """长度约 chars 的模型输出，中间穿插 intents 个买卖建议。"""
+    rng = random.Random(seed)
+    parts, length, expected = [], 0, []
+    slots = set(rng.sample(range(max(intents * 4, 1)), intents))
+    i = 0
+    while length < chars or len(expected) < intents:
+        if i in slots:
+            symbol = rng.choice(symbols)
+            action = rng.choice(['Buy', 'Sell'])
+            qty = rng.randint(1, 50)
+            parts.append(f"建议{'买入' if action == 'Buy' else '卖出'}{qty}股{symbol}。")
+            expected.append((action, symbol, qty))
+        else:
+            parts.append(rng.choice(FILLER))
+        length += len(parts[-1])
+        i += 1
+    return ''.join(parts), expected
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LLM decision parsing over large watchlists.")
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1_000, 5_000, 20_000])
+    parser.add_argument('--chars', type=int, nargs='+', default=[500, 5_000, 50_000], help="model output length")
+    parser.add_argument('--intents', type=int, default=5, help="buy/sell suggestions per output")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print(f"{'symbols':>8} {'chars':>7} {'legacy ms':>10} {'new ms':>8} {'reuse ms':>9} {'speedup':>8} "
+          f"{'found':>6} {'legacy':>7}")
+    for n in args.symbols:
+        symbols = synthetic_symbols(n)
+        reused = DecisionParser(frozenset(symbols))
+        for chars in args.chars:
+            text, expected = synthetic_answer(symbols, chars, args.intents)
+            legacy, legacy_s = timed(lambda: legacy_parse(text, symbols), args.repeat)
+            intents, new_s = timed(lambda: parse_decision(text, symbols), args.repeat)
+            _, reuse_s = timed(lambda: reused.parse(text), args.repeat)
+            found = len({(a, s) for a, s, _ in intents} & {(a, s) for a, s, _ in expected})
+            # 旧方法：0 或 1 个意图，且 symbol 可能是子串误匹配
+            legacy_ok = int(legacy is not None and any(legacy == (a, s) for a, s, _ in expected))
+            print(f"{n:>8} {len(text):>7} {legacy_s * 1000:>10.3f} {new_s * 1000:>8.3f} {reuse_s * 1000:>9.3f} "
+                  f"{legacy_s / reuse_s:>7.1f}x {found:>3}/{len(expected):<2} {legacy_ok:>4}/{len(expected):<2}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+热点路径基准：在合成数据上测量各函数耗时，可保存基线并与基线比较，超过阈值时以非零状态退出。
+全部使用临时数据库/文件和本地假行情，不访问网络、不影响正式数据。
+
+用法：
+    python scripts/benchmark_hot_paths.py                               # 默认 10k 笔成交
+    python scripts/benchmark_hot_paths.py --size 100000 --repeat 7
+    python scripts/benchmark_hot_paths.py --only get_trades dashboard
+    python scripts/benchmark_hot_paths.py --save-baseline scripts/benchmark_baseline.json
+    python scripts/benchmark_hot_paths.py --compare scripts/benchmark_baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_trader import data
+from stock_trader.models.trade import Trade
+from stock_trader.services import trade_service
+from stock_trader.services.db import transaction
+from stock_trader.services.event_bus import get_event_bus
+from stock_trader.services.market_history import get_market_store
+from stock_trader.utils import chart, logger as trade_logger, market_data
+from stock_trader.utils.cache import TTLCache
+
+SYMBOLS = ["AAPL", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "TSLA", "BTC-USD", "ETH-USD"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+def synthetic_rows(n, seed=0):
+    """n 笔成交 (symbol, type, quantity, price, timestamp)，约 70% 买入。"""
+    rng = np.random.default_rng(seed)
+    symbols = rng.integers(0, len(SYMBOLS), n)
+    is_buy = rng.random(n) < 0.7
+    quantity = np.where(is_buy, rng.integers(1, 100, n), rng.integers(1, 20, n))
+    price = rng.uniform(10, 500, n).round(2)
+    start = datetime(2024, 1, 1)
+    return [
+        (SYMBOLS[symbols[i]], 'Buy' if is_buy[i] else 'Sell', int(quantity[i]), float(price[i]),
+         (start + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'))
+        for i in range(n)
+    ]
+
+
+class Context:
+    """一次运行共享的合成数据：成交库、Trade 列表、日志文件、持仓行。"""
+
+    def __init__(self, size, workdir):
+        self.size = size
+        self.workdir = workdir
+        rows = synthetic_rows(size)
+        self.trades = [Trade(id=i + 1, symbol=s, type=t, quantity=q, price=p, timestamp=datetime.fromisoformat(ts))
+                       for i, (s, t, q, p, ts) in enumerate(rows)]
+        trade_service.DB_NAME = os.path.join(workdir, 'trades.db')
+        trade_service.init_db()
+        with transaction(trade_service.DB_NAME) as conn:
+            conn.executemany('INSERT INTO trades (symbol, type, quantity, price, timestamp) VALUES (?, ?, ?, ?, ?)', rows)
+        trade_service.rebuild_positions()
+        self.position_rows = trade_service.calculate_positions_from_ledger()[0]
+        self.log_path = os.path.join(workdir, 'trading.log')
+        with open(self.log_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"2024-01-01 00:00:00,000 INFO TRADE: Buy {q} {s} @ {p}\n" for s, _, q, p, _ in rows)
+        self.csv_path = os.path.join(workdir, 'market_data.csv')
+        self.snapshot = {s: {'price': 100.0, 'volatility': 1.0, 'volume': 1000, 'timestamp': '2024-01-01T00:00:00'}
+                         for s in SYMBOLS}
+        self._client = None
+
+    def dashboard_client(self):
+        if self._client is None:
+            # app 在首个请求时初始化数据库，先把两个库都指向临时目录
+            get_market_store().db_path = os.path.join(self.workdir, 'market.db')
+            get_event_bus().db_path = os.path.join(self.workdir, 'state.db')
+            import app as app_module
+            app_module.MARKET_COLLECTOR_ENABLED = False
+            self._client = app_module.app.test_client()
+        return self._client
+
+
+def bench_calculate_positions_and_pnl(ctx):
+    trade_service.calculate_positions_and_pnl(ctx.trades)
+
+
+def bench_get_trades_page(ctx):
+    trade_service.get_trades_page(limit=50)
+
+
+def bench_get_trades(ctx):
+    trade_service.get_trades()
+
+
+def bench_record_trade(ctx):
+    for _ in range(100):
+        trade_service.record_trade('AAPL', 'Buy', 1, 100.0)
+
+
+def bench_append_market_data_csv(ctx):
+    market_data.append_market_data_csv(ctx.snapshot, ctx.csv_path)
+
+
+def bench_get_recent_logs(ctx):
+    trade_logger.get_recent_logs(50)
+
+
+def bench_tail_log_file(ctx):
+    trade_logger.tail_lines(ctx.log_path, 50)
+
+
+def bench_chart_cold(ctx):
+    chart._chart_cache = TTLCache(maxsize=8)
+    chart.render_asset_bar_chart(1000.0, 1200.0, 500.0, 400.0, fmt='svg')
+    chart.render_position_pie_chart(ctx.position_rows, fmt='svg')
+
+
+def bench_chart_warm(ctx):
+    chart.render_asset_bar_chart(1000.0, 1200.0, 500.0, 400.0, fmt='svg')
+    chart.render_position_pie_chart(ctx.position_rows, fmt='svg')
+
+
+def bench_dashboard(ctx):
+    response = ctx.dashboard_client().get('/')
+    assert response.status_code == 200
+
+
+# name -> (function, 说明)
+BENCHMARKS = {
+    'calculate_positions_and_pnl': (bench_calculate_positions_and_pnl, "fold all trades in Python"),
+    'get_trades_page': (bench_get_trades_page, "first dashboard page (50 rows)"),
+    'get_trades': (bench_get_trades, "load every trade"),
+    'record_trade': (bench_record_trade, "100 single-trade transactions"),
+    'append_market_data_csv': (bench_append_market_data_csv, "append one snapshot"),
+    'get_recent_logs': (bench_get_recent_logs, "last 50 lines (ring buffer)"),
+    'tail_log_file': (bench_tail_log_file, "last 50 lines of a size-line log file"),
+    'chart_cold': (bench_chart_cold, "render both charts, empty cache"),
+    'chart_warm': (bench_chart_warm, "both charts, cached"),
+    'dashboard': (bench_dashboard, "GET / end to end"),
+}
+
+
+def run(names, size, repeat, workdir):
+    ctx = Context(size, workdir)
+    results = {}
+    for name in names:
+        fn, _ = BENCHMARKS[name]
+        fn(ctx)  # 预热（导入、首次渲染、连接建立）
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(ctx)
+            timings.append(time.perf_counter() - start)
+        results[name] = {'median_ms': statistics.median(timings) * 1000, 'min_ms': min(timings) * 1000}
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms=0.1):
+    """
+    返回 [(name, current_ms, baseline_ms, ratio)]，只含中位数比基线慢超过 threshold 的项。
+    绝对差小于 min_delta_ms 的不算（亚毫秒级的项受计时抖动影响大）。
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = result['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        if ratio > 1 + threshold and result['median_ms'] - base['median_ms'] >= min_delta_ms:
+            regressions.append((name, result['median_ms'], base['median_ms'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark stock-trader hot paths on synthetic data.")
+    parser.add_argument('--size', type=int, default=10_000, help="number of synthetic trades / log lines")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument('--save-baseline', metavar='PATH', nargs='?', const=DEFAULT_BASELINE)
+    parser.add_argument('--compare', metavar='PATH', nargs='?', const=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.1, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    data.set_quote_provider(data.FakeQuoteProvider())
+    market_data.get_market_fetcher().provider = market_data.FakeMarketDataProvider()
+    names = args.only or list(BENCHMARKS)
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(names, args.size, args.repeat, workdir)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        if stored.get('size') != args.size:
+            print(f"warning: baseline was recorded with --size {stored.get('size')}", file=sys.stderr)
+        baseline = stored['results']
+
+    print(f"size={args.size:,} repeat={args.repeat}")
+    print(f"{'benchmark':<28} {'median':>10} {'min':>10} {'baseline':>10}  description")
+    for name, result in results.items():
+        base = baseline.get(name, {}).get('median_ms')
+        base_str = f"{base:>8.2f}ms" if base else f"{'-':>10}"
+        print(f"{name:<28} {result['median_ms']:>8.2f}ms {result['min_ms']:>8.2f}ms {base_str}  {BENCHMARKS[name][1]}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'size': args.size, 'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baseline saved to {args.save_baseline}")
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    for name, current, base, ratio in regressions:
+        print(f"REGRESSION {name}: {current:.2f}ms vs baseline {base:.2f}ms ({ratio:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
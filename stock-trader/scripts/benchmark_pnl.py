@@ -0,0 +1,75 @@
+"""
+对比逐笔计算（calculate_positions_and_pnl）与向量化计算（calculate_positions_and_pnl_vectorized）的耗时。
+
+用法：
+    python scripts/benchmark_pnl.py                 # 默认 10k / 100k / 1M 笔
+    python scripts/benchmark_pnl.py --sizes 10000 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_trader import data
+from stock_trader.models.trade_batch import TradeBatch
+from stock_trader.services import trade_service
+from stock_trader.services.db import transaction
+from stock_trader.services.vectorized_pnl import calculate_positions_and_pnl_vectorized
+
+SYMBOLS = ["AAPL", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "TSLA", "BTC-USD", "ETH-USD"]
+
+
+def synthetic_rows(n, seed=0):
+    """随机生成 n 笔成交 (symbol, type, quantity, price, timestamp)：约 70% 买入。"""
+    rng = np.random.default_rng(seed)
+    symbols = rng.integers(0, len(SYMBOLS), n)
+    is_buy = rng.random(n) < 0.7
+    quantity = np.where(is_buy, rng.integers(1, 100, n), rng.integers(1, 20, n))
+    price = rng.uniform(10, 500, n).round(2)
+    start = datetime(2024, 1, 1)
+    return [
+        (SYMBOLS[symbols[i]], 'Buy' if is_buy[i] else 'Sell', int(quantity[i]), float(price[i]),
+         (start + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'))
+        for i in range(n)
+    ]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trade-by-trade vs vectorized P&L.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    data.set_quote_provider(data.FakeQuoteProvider())
+
+    print("load = 从 SQLite 读入（get_trades 的 Trade 列表 / TradeBatch.from_db），compute = 计算持仓和 P&L")
+    print(f"{'trades':>10} {'loop load':>10} {'loop compute':>13} {'vec load':>9} {'vec compute':>12} {'total speedup':>14}")
+    for n in args.sizes:
+        trade_service.DB_NAME = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        trade_service.init_db()
+        with transaction(trade_service.DB_NAME) as conn:
+            conn.executemany('INSERT INTO trades (symbol, type, quantity, price, timestamp) VALUES (?, ?, ?, ?, ?)',
+                             synthetic_rows(n))
+        trades, loop_load = timed(trade_service.get_trades)
+        loop_result, loop_compute = timed(trade_service.calculate_positions_and_pnl, trades)
+        with transaction(trade_service.DB_NAME) as conn:
+            batch, vec_load = timed(TradeBatch.from_db, conn)
+        vec_result, vec_compute = timed(calculate_positions_and_pnl_vectorized, batch)
+        assert abs(loop_result[1] - vec_result[1]) < 1e-6 * max(1.0, abs(loop_result[1]))
+        speedup = (loop_load + loop_compute) / (vec_load + vec_compute)
+        print(f"{n:>10,} {loop_load:>9.3f}s {loop_compute:>12.3f}s {vec_load:>8.3f}s {vec_compute:>11.3f}s {speedup:>13.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
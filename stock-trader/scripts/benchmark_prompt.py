@@ -0,0 +1,93 @@
+"""
+测量 LLM prompt 的 token 数和构造耗时：对比旧的逐行字符串拼接（只含最新快照）与
+feature_pipeline 的滚动特征表（最近 FEATURE_WINDOW 个快照，按 token 预算截断）。
+使用临时行情库和随机行情；--tokenizer 给出模型名时额外用该 tokenizer 统计实际 token 数（需要 transformers）。
+
+用法：
+    python scripts/benchmark_prompt.py                                  # 100 / 1k / 5k symbols
+    python scripts/benchmark_prompt.py --symbols 2000 --snapshots 120 --budget 2048 --tokenizer Qwen/Qwen3-0.6B
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_trader.services.feature_pipeline import FeaturePipeline, estimate_tokens
+from stock_trader.services.market_history import MarketHistoryStore
+
+
+def legacy_context(store):
+    """旧实现：最新快照每行一次字符串拼接。"""
+    latest_date, latest_rows = store.latest_snapshot()
+    context = f"市场数据日期: {latest_date}\n"
+    for row in latest_rows:
+        context += f"{row['symbol']}: 价格={row['price']}, 波动={row['volatility']}, 成交量={row['volume']}\n"
+    return context
+
+
+def fill_store(store, symbols, snapshots, first=0, seed=0):
+    rng = random.Random(seed)
+    prices = {s: rng.uniform(5, 500) for s in symbols}
+    for i in range(first, first + snapshots):
+        snapshot = {}
+        for s in symbols:
+            prices[s] *= 1 + rng.gauss(0, 0.01)
+            snapshot[s] = {'price': round(prices[s], 4), 'volatility': round(abs(rng.gauss(0, 2)), 4),
+                           'volume': int(rng.lognormvariate(12, 0.5))}
+        store.append_snapshot(snapshot, f'2025-01-01 {i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}')
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure prompt token count and build time.")
+    parser.add_argument('--symbols', type=int, nargs='+', default=[100, 1_000, 5_000])
+    parser.add_argument('--snapshots', type=int, default=30, help="history length in the store")
+    parser.add_argument('--window', type=int, default=30, help="feature window (snapshots)")
+    parser.add_argument('--budget', type=int, default=1024, help="prompt token budget")
+    parser.add_argument('--tokenizer', help="model name for exact token counts (optional)")
+    args = parser.parse_args(argv)
+
+    count_exact = None
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, trust_remote_code=True)
+        count_exact = lambda text: len(tokenizer.encode(text))
+
+    print(f"{'symbols':>8} {'variant':>8} {'tokens':>8} {'exact':>7} {'build ms':>9} {'next ms':>10} {'cached ms':>10} "
+          f"{'symbols in prompt':>18}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.symbols:
+            store = MarketHistoryStore(os.path.join(workdir, f'market_{n}.db'))
+            store.init()
+            symbols = [f'S{i:05d}' for i in range(n)]
+            fill_store(store, symbols, args.snapshots)
+
+            text, legacy_s = timed(lambda: legacy_context(store))
+            exact = count_exact(text) if count_exact else '-'
+            print(f"{n:>8} {'legacy':>8} {estimate_tokens(text):>8} {exact:>7} {legacy_s * 1000:>9.2f} {'-':>10} "
+                  f"{'-':>10} {n:>18}")
+
+            pipeline = FeaturePipeline(store=store, window=args.window, budget=args.budget)
+            _, load_s = timed(pipeline.update)  # 首次从行情库读取窗口内的快照
+            rendered, render_s = timed(pipeline.render)
+            # 新快照到达后：增量更新并重新渲染一次，之后同一快照内命中缓存
+            fill_store(store, symbols, 1, first=args.snapshots, seed=1)
+            _, update_s = timed(pipeline.render)
+            _, cached_s = timed(pipeline.render)
+            exact = count_exact(rendered.text) if count_exact else '-'
+            print(f"{n:>8} {'features':>8} {rendered.tokens:>8} {exact:>7} {(load_s + render_s) * 1000:>9.2f} "
+                  f"{update_s * 1000:>10.2f} {cached_s * 1000:>10.3f} {len(rendered.symbols):>18}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+trades 数据库并发压测：若干写线程用 record_trades 批量写入，同时若干读线程读取台账和成交记录，
+输出写入吞吐（trades/sec）和读取吞吐（reads/sec）。使用临时数据库，不影响正式数据。
+
+用法：
+    python scripts/load_test_db.py --writers 2 --readers 4 --batch 50 --seconds 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_trader import data
+from stock_trader.services import trade_service
+
+SYMBOLS = ["AAPL", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "TSLA", "BTC-USD", "ETH-USD"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent read/write load test for the trades database.")
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=50, help="trades per record_trades call (1 = record_trade)")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    data.set_quote_provider(data.FakeQuoteProvider())
+    trade_service.DB_NAME = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+    trade_service.init_db()
+
+    stop = threading.Event()
+    written = [0] * args.writers
+    reads = [0] * args.readers
+
+    def writer(i):
+        rng = random.Random(i)
+        while not stop.is_set():
+            batch = [(rng.choice(SYMBOLS), 'Buy', rng.randint(1, 10), rng.uniform(10, 500)) for _ in range(args.batch)]
+            if args.batch == 1:
+                trade_service.record_trade(*batch[0])
+            else:
+                trade_service.record_trades(batch)
+            written[i] += len(batch)
+
+    def reader(i):
+        while not stop.is_set():
+            trade_service.calculate_positions_from_ledger()
+            trade_service.get_trades()
+            reads[i] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"writers={args.writers} readers={args.readers} batch={args.batch} elapsed={elapsed:.2f}s")
+    print(f"writes: {sum(written)} trades, {sum(written) / elapsed:,.0f} trades/sec")
+    print(f"reads:  {sum(reads)} dashboard reads, {sum(reads) / elapsed:,.1f} reads/sec")
+    print(f"ledger consistent: {not trade_service.verify_positions()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+HTTP 压测：用 gunicorn 以不同的 worker 数启动应用（临时数据库、本地假行情、关闭行情采集），
+多个客户端线程通过 keep-alive 连接持续请求同一路径，输出各配置下的 req/s 和延迟分位数。
+
+用法：
+    python scripts/load_test_http.py                                  # workers 1 2 4，每进程 4 线程，请求 /
+    python scripts/load_test_http.py --workers 1 2 4 8 --threads 2 --clients 32 --seconds 10
+    python scripts/load_test_http.py --path /api/trades --trades 5000
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed_trades(db_path, n):
+    """预先写入 n 笔成交（子进程环境变量指向同一个库）。"""
+    from stock_trader.services import trade_service
+    trade_service.DB_NAME = db_path
+    trade_service.init_db()
+    symbols = ["AAPL", "NVDA", "MSFT", "AMZN", "BTC-USD"]
+    for start in range(0, n, 500):
+        trade_service.record_trades([(symbols[i % len(symbols)], 'Buy', 1, 100.0 + i % 50)
+                                     for i in range(start, min(start + 500, n))])
+
+
+def start_server(workers, threads, port, workdir):
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(workers),
+               STOCKTRADER_THREADS=str(threads),
+               STOCKTRADER_BIND=f'127.0.0.1:{port}',
+               STOCKTRADER_DB_PATH=os.path.join(workdir, 'trades.db'),
+               STOCKTRADER_MARKET_DB_PATH=os.path.join(workdir, 'market.db'),
+               STOCKTRADER_STATE_DB_PATH=os.path.join(workdir, 'state.db'),
+               STOCKTRADER_SECRET_KEY_FILE=os.path.join(workdir, 'secret_key'),
+               STOCKTRADER_LOG_DIR=os.path.join(workdir, 'logs'),
+               STOCKTRADER_COLLECTOR='0',
+               STOCKTRADER_QUOTE_PROVIDER='fake')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/metrics')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.2)
+        if process.poll() is not None:
+            break
+    process.kill()
+    raise RuntimeError(f"gunicorn with {workers} workers did not start")
+
+
+def drive(port, path, clients, seconds):
+    """clients 个线程各持一个 keep-alive 连接请求 path，返回 (请求数, 错误数, 延迟列表)。"""
+    stop = time.perf_counter() + seconds
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise OSError(response.status)
+                local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(latencies), errors[0], sorted(latencies)
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP throughput vs. gunicorn worker count.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help="threads per worker")
+    parser.add_argument('--clients', type=int, default=16, help="concurrent client connections")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--trades', type=int, default=1000, help="trades seeded into the temp database")
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}  path={args.path}  clients={args.clients}  threads/worker={args.threads}")
+    print(f"{'workers':>7} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+    base = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            seed_trades(os.path.join(workdir, 'trades.db'), args.trades)
+            port = free_port()
+            process = start_server(workers, args.threads, port, workdir)
+            try:
+                drive(port, args.path, args.clients, min(1.0, args.seconds))  # 预热各 worker
+                count, errors, latencies = drive(port, args.path, args.clients, args.seconds)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        rate = count / args.seconds
+        base = base or rate
+        print(f"{workers:>7} {count:>9} {errors:>7} {rate:>9.1f} {percentile(latencies, 0.5) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.95) * 1000:>8.1f} {rate / base:>7.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
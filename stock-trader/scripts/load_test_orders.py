@@ -0,0 +1,113 @@
+"""
+订单队列压测：模拟大模型突发输出，若干客户端线程每轮同时提交一批订单，后台 worker 批量成交。
+输出提交延迟（调用方等待时间）、从提交到成交的延迟和成交吞吐（orders/sec），
+并与逐笔同步执行（旧的 auto_trade 路径：取价 + 写库）对比。使用临时数据库和本地假行情。
+
+用法：
+    python scripts/load_test_orders.py --clients 8 --bursts 20 --burst-size 50 --batch-size 100
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORKDIR = tempfile.mkdtemp()
+# 成交日志写到临时目录（需在导入 stock_trader 之前设置）
+os.environ.setdefault('STOCKTRADER_LOG_DIR', os.path.join(WORKDIR, 'logs'))
+
+from stock_trader import data
+from stock_trader.services import trade_service
+from stock_trader.services.db import get_connection
+from stock_trader.services.order_queue import OrderQueue
+
+SYMBOLS = ["AAPL", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "TSLA", "BTC-USD", "ETH-USD"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float('nan')
+
+
+def run_queue(args):
+    queue = OrderQueue(batch_size=args.batch_size, poll_interval=0.05)
+    queue.start()
+    submit_latencies, lock = [], threading.Lock()
+    barrier = threading.Barrier(args.clients)
+
+    def client(i):
+        local = []
+        for burst in range(args.bursts):
+            barrier.wait()  # 所有客户端同时开始一轮突发
+            for j in range(args.burst_size):
+                start = time.perf_counter()
+                queue.submit(SYMBOLS[(i + j) % len(SYMBOLS)], 'Buy', 1, source='load-test')
+                local.append(time.perf_counter() - start)
+            time.sleep(args.pause)
+        with lock:
+            submit_latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    submitted_at = time.perf_counter()
+    while queue.depth():
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    queue.stop(timeout=5)
+    rows = get_connection(trade_service.DB_NAME).execute(
+        "SELECT updated_at - created_at FROM orders WHERE status = 'filled'").fetchall()
+    fill_latencies = [row[0] for row in rows]
+    return submit_latencies, fill_latencies, elapsed, submitted_at - start, queue
+
+
+def run_sync(count):
+    start = time.perf_counter()
+    for i in range(count):
+        trade_service.execute_trades([(SYMBOLS[i % len(SYMBOLS)], 'Buy', 1)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bursty load test for the order queue.")
+    parser.add_argument('--clients', type=int, default=8, help="concurrent submitting threads")
+    parser.add_argument('--bursts', type=int, default=20)
+    parser.add_argument('--burst-size', type=int, default=50, help="orders per client per burst")
+    parser.add_argument('--pause', type=float, default=0.05, help="seconds between bursts")
+    parser.add_argument('--batch-size', type=int, default=100, help="orders executed per worker batch")
+    parser.add_argument('--quote-latency', type=float, default=0.005, help="simulated quote fetch latency")
+    args = parser.parse_args()
+
+    # 同步路径不写成交日志，两边都关闭 INFO 日志，只比较取价和写库
+    logging.getLogger().setLevel(logging.WARNING)
+    data.set_quote_provider(data.FakeQuoteProvider(latency=args.quote_latency))
+    trade_service.DB_NAME = os.path.join(WORKDIR, 'queue.db')
+    trade_service.init_db()
+    submit, fill, elapsed, submit_elapsed, queue = run_queue(args)
+    total = len(submit)
+
+    print(f"clients={args.clients} bursts={args.bursts} burst_size={args.burst_size} batch_size={args.batch_size}")
+    print(f"queue: {total} orders in {elapsed:.2f}s ({total / elapsed:,.0f} orders/sec), "
+          f"{queue.batches} batches, counts={queue.counts()}")
+    print(f"  submit latency  p50={percentile(submit, 0.5) * 1000:.2f}ms p95={percentile(submit, 0.95) * 1000:.2f}ms "
+          f"max={max(submit) * 1000:.2f}ms (all submitted after {submit_elapsed:.2f}s)")
+    print(f"  submit -> fill  p50={percentile(fill, 0.5) * 1000:.1f}ms p95={percentile(fill, 0.95) * 1000:.1f}ms")
+
+    sync_count = min(total, 500)
+    trade_service.DB_NAME = os.path.join(WORKDIR, 'sync.db')
+    trade_service.init_db()
+    sync_elapsed = run_sync(sync_count)
+    print(f"sync:  {sync_count} orders in {sync_elapsed:.2f}s ({sync_count / sync_elapsed:,.0f} orders/sec), "
+          f"{sync_elapsed / sync_count * 1000:.2f}ms per order held in the request")
+    print(f"ledger consistent: {not trade_service.verify_positions()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+将旧的 market_data.csv / market_data.json 一次性导入行情历史库（market.db）。
+
+用法：
+    python scripts/migrate_market_history.py [文件 ...]   # 默认导入 market_data.csv 和 market_data.json
+"""
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from stock_trader.services.market_history import get_market_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import legacy market data files into the market history store.")
+    parser.add_argument('paths', nargs='*', default=[
+        os.path.join(BASE_DIR, 'market_data.csv'),
+        os.path.join(BASE_DIR, 'market_data.json'),
+    ])
+    args = parser.parse_args()
+    store = get_market_store()
+    store.init()
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"Skip missing file: {path}")
+            continue
+        count = store.migrate(path)
+        print(f"Imported {count} rows from {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+重建或校验持仓台账（positions 表）。
+
+用法：
+    python scripts/rebuild_positions.py           # 从 trades 全量重建
+    python scripts/rebuild_positions.py --verify  # 仅校验，不一致时返回非零退出码
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_trader.services.trade_service import init_db, rebuild_positions, verify_positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or verify the positions ledger.")
+    parser.add_argument('--verify', action='store_true', help="only compare the ledger with trade history")
+    args = parser.parse_args()
+    init_db()
+    if args.verify:
+        mismatched = verify_positions()
+        if mismatched:
+            print(f"Ledger mismatch for: {', '.join(mismatched)}")
+            return 1
+        print("Ledger is consistent with trade history.")
+        return 0
+    count = rebuild_positions()
+    print(f"Rebuilt positions ledger for {count} symbols.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
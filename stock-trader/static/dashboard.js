@@ -1,3 +1,43 @@
+// 解析 SSE 流：每个事件以空行分隔，data 为 {"text": ...}，event: done 表示结束
+function readAnalysisStream(reader, loading, result) {
+  var decoder = new TextDecoder();
+  var buffer = '';
+  result.textContent = '';
+  function handleEvent(block) {
+    var event = 'message';
+    var data = '';
+    block.split('\n').forEach(function(line) {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    if (event === 'done') {
+      if (!result.textContent) result.textContent = '无分析结果';
+      return;
+    }
+    if (data) {
+      loading.style.display = 'none';
+      result.style.display = '';
+      result.textContent += JSON.parse(data).text;
+    }
+  }
+  function pump() {
+    return reader.read().then(function(chunk) {
+      if (chunk.done) {
+        if (buffer.trim()) handleEvent(buffer);
+        loading.style.display = 'none';
+        result.style.display = '';
+        return;
+      }
+      buffer += decoder.decode(chunk.value, {stream: true});
+      var parts = buffer.split('\n\n');
+      buffer = parts.pop();
+      parts.forEach(handleEvent);
+      return pump();
+    });
+  }
+  return pump();
+}
+
 // 智能分析按钮逻辑
 document.addEventListener('DOMContentLoaded', function() {
   var btn = document.getElementById('llm-analysis-btn');
@@ -7,17 +47,27 @@ document.addEventListener('DOMContentLoaded', function() {
       var result = document.getElementById('llm-analysis-result');
       loading.style.display = '';
       result.style.display = 'none';
-      fetch('/llm_analysis', {method: 'POST'})
-        .then(r => r.json())
-        .then(data => {
-          loading.style.display = 'none';
-          result.textContent = data.llm_answer || '无分析结果';
-          result.style.display = '';
+      result.textContent = '';
+      // 优先使用流式接口，逐段显示生成结果；浏览器不支持流读取时退回一次性接口
+      fetch('/llm_analysis/stream', {method: 'POST'})
+        .then(r => {
+          if (!r.ok || !r.body || !window.TextDecoder) throw new Error('stream unavailable');
+          return readAnalysisStream(r.body.getReader(), loading, result);
         })
         .catch(() => {
-          loading.style.display = 'none';
-          result.textContent = '分析失败';
-          result.style.display = '';
+          if (result.textContent) return;
+          fetch('/llm_analysis', {method: 'POST'})
+            .then(r => r.json())
+            .then(data => {
+              loading.style.display = 'none';
+              result.textContent = data.llm_answer || '无分析结果';
+              result.style.display = '';
+            })
+            .catch(() => {
+              loading.style.display = 'none';
+              result.textContent = '分析失败';
+              result.style.display = '';
+            });
         });
     });
   }
@@ -25,12 +75,330 @@ document.addEventListener('DOMContentLoaded', function() {
 const marketData = {
     ...window.marketRows
 };
-const select = document.querySelector('select[name="symbol"]');
+const select = document.querySelector('input[name="symbol"]');
+const symbolOptions = document.getElementById('symbol-options');
 const priceDiv = document.getElementById('current-price');
+function showPrice(price) {
+    priceDiv.innerHTML = price !== null && price !== undefined ? `<i class='fa-solid fa-tag'></i> Current Price: <span class='fw-bold'>$${price}</span>` : '<i class="fa-solid fa-tag"></i> Current Price: <span class="text-danger">N/A</span>';
+}
 function updatePrice() {
-    const symbol = select.value;
-    const price = marketData[symbol];
-    priceDiv.innerHTML = price !== null ? `<i class='fa-solid fa-tag'></i> Current Price: <span class='fw-bold'>$${price}</span>` : '<i class="fa-solid fa-tag"></i> Current Price: <span class="text-danger">N/A</span>';
+    const symbol = select.value.trim().toUpperCase();
+    if (symbol in marketData) {
+        showPrice(marketData[symbol]);
+        return;
+    }
+    // 不在页面上的 symbol 按需查询一次并缓存
+    fetch('/api/quote/' + encodeURIComponent(symbol))
+      .then(r => r.ok ? r.json() : {price: null})
+      .then(data => {
+        marketData[symbol] = data.price;
+        if (select.value.trim().toUpperCase() === symbol) showPrice(data.price);
+      })
+      .catch(() => showPrice(null));
+}
+// 前缀补全：输入变化时从 /api/symbols 取最多 20 个候选
+let symbolSearchTimer = null;
+function updateSymbolOptions() {
+    clearTimeout(symbolSearchTimer);
+    const query = select.value.trim();
+    if (!query) return;
+    symbolSearchTimer = setTimeout(function() {
+      fetch('/api/symbols?q=' + encodeURIComponent(query))
+        .then(r => r.json())
+        .then(data => {
+          symbolOptions.innerHTML = '';
+          data.symbols.forEach(function(info) {
+            const option = document.createElement('option');
+            option.value = info.symbol;
+            option.label = [info.name, info.exchange, info.currency].filter(Boolean).join(' · ');
+            symbolOptions.appendChild(option);
+          });
+        });
+    }, 150);
+}
+if (select) {
+  select.addEventListener('input', updateSymbolOptions);
+  select.addEventListener('change', updatePrice);
+  updatePrice();
+}
+
+// 浏览器端绘图模式（STOCKTRADER_CHART_MODE=client）：从 /charts/data.json 取数据，用 Chart.js 绘制
+// 成交后重绘时先销毁旧图表
+var clientCharts = [];
+function renderClientCharts() {
+  var barCanvas = document.getElementById('asset-bar-chart');
+  var pieCanvas = document.getElementById('position-pie-chart');
+  if (!window.Chart || (!barCanvas && !pieCanvas)) return;
+  fetch('/charts/data.json')
+    .then(r => r.json())
+    .then(series => {
+      clientCharts.forEach(function(chart) { chart.destroy(); });
+      clientCharts = [];
+      if (barCanvas) {
+        clientCharts.push(new Chart(barCanvas, {
+          type: 'bar',
+          data: {
+            labels: series.asset_bar.labels,
+            datasets: [
+              {label: 'Buy Total', data: series.asset_bar.buy_total, backgroundColor: ['#6EC6FF', '#FFD54F']},
+              {label: 'Market Value', data: series.asset_bar.market_value, backgroundColor: ['#AB47BC', '#4DB6AC']}
+            ]
+          },
+          options: {plugins: {title: {display: true, text: 'Buy Total vs Market Value', color: '#195ca7'}}}
+        }));
+      }
+      if (pieCanvas && series.position_pie.labels.length) {
+        clientCharts.push(new Chart(pieCanvas, {
+          type: 'pie',
+          data: {
+            labels: series.position_pie.labels,
+            datasets: [{data: series.position_pie.market_value}]
+          },
+          options: {plugins: {title: {display: true, text: 'Position Distribution', color: '#195ca7'}}}
+        }));
+      }
+    });
+}
+renderClientCharts();
+
+// 成交记录分页：点击按钮从 /api/trades 加载下一页并追加到表格
+function setupLoadMoreTrades() {
+  var btn = document.getElementById('load-more-trades');
+  var body = document.getElementById('trades-body');
+  if (!btn || !body) return;
+  btn.addEventListener('click', function() {
+    btn.disabled = true;
+    fetch('/api/trades?after_id=' + encodeURIComponent(btn.dataset.next))
+      .then(r => r.json())
+      .then(data => {
+        data.trades.forEach(function(t) {
+          var tr = document.createElement('tr');
+          [t.id, t.symbol, t.type, t.quantity, t.price, t.timestamp].forEach(function(value, i) {
+            var td = document.createElement('td');
+            if (i === 1) {
+              var badge = document.createElement('span');
+              badge.className = 'badge bg-primary bg-opacity-10 text-primary fw-bold';
+              badge.textContent = value;
+              td.appendChild(badge);
+            } else {
+              td.textContent = value;
+            }
+            tr.appendChild(td);
+          });
+          body.appendChild(tr);
+        });
+        if (data.next_after_id) {
+          btn.dataset.next = data.next_after_id;
+          btn.disabled = false;
+        } else {
+          btn.remove();
+        }
+      })
+      .catch(() => { btn.disabled = false; });
+  });
+}
+setupLoadMoreTrades();
+
+// 实时更新：订阅 /events（SSE），按推送的成交、价格和日志增量修改页面，不再整页刷新
+var liveState = window.dashboardState;
+
+function formatMoney(value) {
+  return value.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+}
+
+function roundMoney(value) {
+  return Math.round(value * 100) / 100;
+}
+
+function renderMetrics() {
+  var positionValue = 0;
+  Object.keys(liveState.positions).forEach(function(symbol) {
+    var position = liveState.positions[symbol];
+    positionValue += position.quantity * (position.price || 0);
+  });
+  var total = liveState.cash + positionValue;
+  var pnl = total - liveState.initialFund;
+  var roi = liveState.initialFund ? pnl / liveState.initialFund * 100 : 0;
+  document.getElementById('metric-cash').textContent = formatMoney(liveState.cash);
+  document.getElementById('metric-position-value').textContent = formatMoney(positionValue);
+  document.getElementById('metric-total-asset').textContent = formatMoney(total);
+  var pnlEl = document.getElementById('metric-pnl');
+  pnlEl.querySelector('span').textContent = formatMoney(pnl);
+  pnlEl.classList.toggle('pnl-neg', pnl < 0);
+  pnlEl.classList.toggle('pnl-pos', pnl >= 0);
+  var roiEl = document.getElementById('metric-roi');
+  roiEl.querySelector('span').textContent = roi.toFixed(4) + '%';
+  roiEl.classList.toggle('roi-neg', pnl < 0);
+  roiEl.classList.toggle('roi-pos', pnl >= 0);
+}
+
+function badgeCell(symbol) {
+  var td = document.createElement('td');
+  var badge = document.createElement('span');
+  badge.className = 'badge bg-primary bg-opacity-10 text-primary fw-bold';
+  badge.textContent = symbol;
+  td.appendChild(badge);
+  return td;
+}
+
+function renderPositionRow(symbol) {
+  var body = document.getElementById('positions-body');
+  var position = liveState.positions[symbol];
+  var row = body.querySelector('tr[data-symbol="' + symbol + '"]');
+  if (!position || position.quantity <= 0) {
+    if (row) row.remove();
+  } else {
+    if (!row) {
+      row = document.createElement('tr');
+      row.dataset.symbol = symbol;
+      row.appendChild(badgeCell(symbol));
+      for (var i = 0; i < 6; i++) row.appendChild(document.createElement('td'));
+      body.appendChild(row);
+    }
+    var price = position.price || 0;
+    var marketValue = position.quantity * price;
+    var pnl = marketValue - position.costBasis;
+    var cells = row.children;
+    cells[1].textContent = position.buyDate;
+    cells[2].textContent = roundMoney(position.costBasis / position.quantity);
+    cells[3].textContent = price;
+    cells[4].textContent = position.quantity;
+    cells[5].textContent = roundMoney(marketValue);
+    cells[6].textContent = roundMoney(pnl);
+    cells[6].className = pnl < 0 ? 'pnl-neg' : 'pnl-pos';
+  }
+  var empty = !body.children.length;
+  document.getElementById('no-positions').style.display = empty ? '' : 'none';
+  body.closest('.table-responsive').style.display = empty ? 'none' : '';
+}
+
+function prependTrade(t) {
+  var body = document.getElementById('trades-body');
+  var tr = document.createElement('tr');
+  [t.id, t.symbol, t.type, t.quantity, t.price, t.timestamp].forEach(function(value, i) {
+    if (i === 1) {
+      tr.appendChild(badgeCell(value));
+      return;
+    }
+    var td = document.createElement('td');
+    td.textContent = value;
+    tr.appendChild(td);
+  });
+  body.insertBefore(tr, body.firstChild);
+  document.getElementById('no-trades').style.display = 'none';
+  body.closest('.table-responsive').style.display = '';
+}
+
+// 持仓变化后刷新图表（合并 1 秒内的多次成交）
+var chartRefreshTimer = null;
+function refreshCharts() {
+  clearTimeout(chartRefreshTimer);
+  chartRefreshTimer = setTimeout(function() {
+    document.querySelectorAll('img[src*="/charts/"]').forEach(function(img) {
+      img.src = img.src.split('?')[0] + '?t=' + liveState.version;
+    });
+    renderClientCharts();
+  }, 1000);
+}
+
+// fills：一批成交及其持仓的最新值；version 为批内最后一笔成交 id，旧于页面状态的部分忽略
+function applyFills(event) {
+  var prices = {};
+  event.trades.forEach(function(t) {
+    prices[t.symbol] = t.price;
+    if (t.id > liveState.version) prependTrade(t);
+  });
+  if (event.version <= liveState.version) return;
+  liveState.version = event.version;
+  event.positions.forEach(function(p) {
+    var previous = liveState.positions[p.symbol];
+    var price = (previous && previous.price) || marketData[p.symbol] || prices[p.symbol];
+    if (p.quantity > 0) {
+      liveState.positions[p.symbol] = {quantity: p.quantity, costBasis: p.cost_basis,
+                                       buyDate: (p.first_buy_date || '').slice(0, 10), price: price};
+    } else {
+      delete liveState.positions[p.symbol];
+    }
+    renderPositionRow(p.symbol);
+  });
+  liveState.cash = liveState.initialFund - event.buy_cost + event.sell_income;
+  renderMetrics();
+  refreshCharts();
+}
+
+// tick：采集器的最新价格
+function applyTick(event) {
+  var marketBody = document.getElementById('market-body');
+  Object.keys(event.prices).forEach(function(symbol) {
+    var price = event.prices[symbol];
+    marketData[symbol] = price;
+    var cell = marketBody && marketBody.querySelector('tr[data-symbol="' + symbol + '"] [data-field="price"]');
+    if (cell) cell.textContent = price;
+    if (liveState.positions[symbol]) {
+      liveState.positions[symbol].price = price;
+      renderPositionRow(symbol);
+    }
+  });
+  renderMetrics();
+  if (select && event.prices[select.value.trim().toUpperCase()] !== undefined) updatePrice();
+}
+
+// log：追加日志行，只保留最近 500 段
+function applyLog(event) {
+  var pre = document.getElementById('log-lines');
+  var noLogs = document.getElementById('no-logs');
+  if (noLogs) noLogs.remove();
+  pre.appendChild(document.createTextNode(event.lines.join('')));
+  while (pre.childNodes.length > 500) pre.removeChild(pre.firstChild);
+  pre.parentNode.scrollTop = pre.parentNode.scrollHeight;
+}
+
+function connectEvents() {
+  var source = new EventSource('/events?after=' + liveState.eventsAfter);
+  function handle(apply) {
+    return function(e) {
+      if (e.lastEventId) liveState.eventsAfter = e.lastEventId;
+      apply(JSON.parse(e.data));
+    };
+  }
+  source.addEventListener('fills', handle(applyFills));
+  source.addEventListener('tick', handle(applyTick));
+  source.addEventListener('log', handle(applyLog));
+  // 推送连接已满（503）时浏览器不会自动重连：稍后从最后收到的事件继续
+  source.onerror = function() {
+    if (source.readyState === EventSource.CLOSED) setTimeout(connectEvents, 10000);
+  };
+}
+
+function showTradeMessage(ok, messages) {
+  var box = document.getElementById('trade-message');
+  box.innerHTML = '';
+  (messages || []).forEach(function(message) {
+    var div = document.createElement('div');
+    div.className = 'alert alert-' + (ok ? 'success' : 'danger');
+    div.textContent = message;
+    box.appendChild(div);
+  });
+}
+
+// 交易表单改为异步提交：服务端只返回结果消息，页面由 fills 事件更新
+function setupTradeForm() {
+  var form = document.getElementById('trade-form');
+  if (!form) return;
+  form.addEventListener('submit', function(e) {
+    e.preventDefault();
+    var button = form.querySelector('button[type="submit"]');
+    button.disabled = true;
+    fetch(form.action, {method: 'POST', body: new FormData(form), headers: {'Accept': 'application/json'}})
+      .then(r => r.json())
+      .then(data => showTradeMessage(data.ok, data.messages))
+      .catch(() => showTradeMessage(false, ['Trade failed']))
+      .finally(() => { button.disabled = false; });
+  });
+}
+
+// 不支持 EventSource 的浏览器保持原来的表单提交 + 整页刷新
+if (liveState && window.EventSource && window.fetch) {
+  connectEvents();
+  setupTradeForm();
 }
-select.addEventListener('change', updatePrice);
-updatePrice();
@@ -3,7 +3,126 @@ import os
 # Centralized configuration for the stock trader app
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.environ.get('STOCKTRADER_DB_PATH') or os.path.join(BASE_DIR, 'stock_trader', 'data', 'trades.db')
-
+MARKET_DB_PATH = os.environ.get('STOCKTRADER_MARKET_DB_PATH') or os.path.join(BASE_DIR, 'stock_trader', 'data', 'market.db')
+# State shared by all worker processes on a host: the LLM response cache and
+# trade de-duplication claims live in this SQLite file.
+STATE_DB_PATH = os.environ.get('STOCKTRADER_STATE_DB_PATH') or os.path.join(BASE_DIR, 'stock_trader', 'data', 'state.db')
+# Flask secret key: FLASK_SECRET_KEY, or a key generated once and stored in this
+# file so every worker signs sessions/CSRF tokens with the same key.
+SECRET_KEY_PATH = os.environ.get('STOCKTRADER_SECRET_KEY_FILE') or os.path.join(BASE_DIR, 'stock_trader', 'data', 'secret_key')
+# Watchlist: symbol metadata (asset class, exchange, currency) is loaded from a
+# JSON/CSV file or a SQLite DB with a `symbols` table.
+SYMBOLS_PATH = os.environ.get('STOCKTRADER_SYMBOLS') or os.path.join(BASE_DIR, 'symbols.json')
+# The dashboard shows held symbols first, then the watchlist, up to this many rows.
+DASHBOARD_MARKET_ROWS = int(os.environ.get('STOCKTRADER_DASHBOARD_SYMBOLS', 20))
+SYMBOL_SEARCH_LIMIT = 20
 
 # Centralized constants
 DEFAULT_INITIAL_FUND = 1_000_000_000  # Default initial fund for trading
+
+# Quote cache: prices are fresh for QUOTE_TTL_SECONDS, then served stale (while a
+# background refresh runs) for up to QUOTE_STALE_SECONDS more.
+QUOTE_TTL_SECONDS = float(os.environ.get('STOCKTRADER_QUOTE_TTL', 60))
+QUOTE_STALE_SECONDS = float(os.environ.get('STOCKTRADER_QUOTE_STALE', 240))
+# A failed fetch keeps the last good price and is not retried for QUOTE_NEGATIVE_TTL seconds.
+QUOTE_NEGATIVE_TTL = float(os.environ.get('STOCKTRADER_QUOTE_NEGATIVE_TTL', 5))
+QUOTE_MAX_WORKERS = int(os.environ.get('STOCKTRADER_QUOTE_WORKERS', 8))
+# 'yahoo' for live data; 'fake' serves fixed local prices (load tests, offline demos).
+QUOTE_PROVIDER = os.environ.get('STOCKTRADER_QUOTE_PROVIDER', 'yahoo')
+
+# Market data collector: a background thread snapshots quotes every interval and
+# owns all writes to the market data store.
+MARKET_DATA_CSV = os.environ.get('STOCKTRADER_MARKET_DATA_CSV') or os.path.join(BASE_DIR, 'market_data.csv')  # legacy, migrated on startup
+MARKET_COLLECT_INTERVAL = float(os.environ.get('STOCKTRADER_COLLECT_INTERVAL', 60))
+MARKET_COLLECTOR_ENABLED = os.environ.get('STOCKTRADER_COLLECTOR', '1') != '0'
+# With several workers only the process holding this file lock runs the collector;
+# the others read the latest snapshot from the market store.
+COLLECTOR_LOCK_PATH = os.environ.get('STOCKTRADER_COLLECTOR_LOCK') or os.path.join(BASE_DIR, 'stock_trader', 'data', 'collector.lock')
+# Per-symbol snapshot fetches run concurrently: each attempt times out after
+# MARKET_FETCH_TIMEOUT seconds and is retried with exponential backoff.
+MARKET_FETCH_TIMEOUT = float(os.environ.get('STOCKTRADER_FETCH_TIMEOUT', 10))
+MARKET_FETCH_CONCURRENCY = int(os.environ.get('STOCKTRADER_FETCH_CONCURRENCY', 8))
+MARKET_FETCH_RETRIES = int(os.environ.get('STOCKTRADER_FETCH_RETRIES', 2))
+MARKET_FETCH_BACKOFF = float(os.environ.get('STOCKTRADER_FETCH_BACKOFF', 0.5))
+
+# Risk analytics: rolling returns, volatility, drawdown, Sharpe and correlation over
+# the last RISK_WINDOW market snapshots, updated as snapshots arrive. Annualized with
+# RISK_PERIODS_PER_YEAR (default: one snapshot per collect interval, around the clock).
+RISK_WINDOW = int(os.environ.get('STOCKTRADER_RISK_WINDOW', 60))
+RISK_PERIODS_PER_YEAR = float(os.environ.get('STOCKTRADER_RISK_PERIODS_PER_YEAR') or 365 * 24 * 3600 / MARKET_COLLECT_INTERVAL)
+RISK_MAX_SYMBOLS = int(os.environ.get('STOCKTRADER_RISK_MAX_SYMBOLS', 10))  # correlation matrix size
+
+# LLM prompt features: per-symbol rolling returns, volatility and volume z-scores over
+# the last FEATURE_WINDOW snapshots. Prompts are cut to PROMPT_TOKEN_BUDGET (estimated)
+# tokens, most unusual symbols first.
+FEATURE_WINDOW = int(os.environ.get('STOCKTRADER_FEATURE_WINDOW', 30))
+PROMPT_TOKEN_BUDGET = int(os.environ.get('STOCKTRADER_PROMPT_TOKEN_BUDGET', 1024))
+
+# Dashboard push channel (GET /events, server-sent events): fills, position deltas,
+# price ticks and log lines are appended to STATE_DB_PATH so every worker streams
+# events produced by any worker. Each process polls for new events once per interval.
+EVENTS_POLL_INTERVAL = float(os.environ.get('STOCKTRADER_EVENTS_POLL', 0.5))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('STOCKTRADER_EVENTS_HEARTBEAT', 15))
+EVENTS_RETAIN = int(os.environ.get('STOCKTRADER_EVENTS_RETAIN', 1000))
+# Each open /events stream holds a worker thread. At most EVENTS_MAX_STREAMS streams per
+# worker (default: half of the STOCKTRADER_THREADS threads); further tabs get 503 and
+# retry later, so dashboards can never take every thread away from normal requests.
+WEB_THREADS = int(os.environ.get('STOCKTRADER_THREADS', 16))
+EVENTS_MAX_STREAMS = int(os.environ.get('STOCKTRADER_EVENTS_MAX_STREAMS') or max(1, WEB_THREADS // 2))
+
+# LLM: model is loaded once per process; set STOCKTRADER_LLM_MODEL to a small local
+# model for development, and STOCKTRADER_LLM_WARMUP=1 to load it at startup.
+LLM_MODEL_NAME = os.environ.get('STOCKTRADER_LLM_MODEL') or "Qwen/Qwen3-235B-A22B-Instruct-2507"
+LLM_WARMUP = os.environ.get('STOCKTRADER_LLM_WARMUP', '0') == '1'
+# Heavy modules (transformers, matplotlib, yfinance) load on first use; set
+# STOCKTRADER_PRELOAD=1 to initialize storage and import them when app.py loads.
+PRELOAD = os.environ.get('STOCKTRADER_PRELOAD', '0') == '1'
+# Inference queue: concurrent prompts are coalesced into batched pipeline calls.
+LLM_MAX_BATCH_SIZE = int(os.environ.get('STOCKTRADER_LLM_BATCH_SIZE', 8))
+LLM_BATCH_WAIT_SECONDS = float(os.environ.get('STOCKTRADER_LLM_BATCH_WAIT', 0.05))
+LLM_MAX_QUEUE = int(os.environ.get('STOCKTRADER_LLM_MAX_QUEUE', 32))
+LLM_REQUEST_TIMEOUT = float(os.environ.get('STOCKTRADER_LLM_TIMEOUT', 300))
+# Response cache for auto analysis, keyed on snapshot + model + generation params.
+LLM_CACHE_TTL = float(os.environ.get('STOCKTRADER_LLM_CACHE_TTL', 3600))
+LLM_CACHE_SIZE = int(os.environ.get('STOCKTRADER_LLM_CACHE_SIZE', 128))
+LLM_CACHE_PATH = os.environ.get('STOCKTRADER_LLM_CACHE_PATH')  # 设置后改用进程内缓存并持久化到该 JSON 文件（单进程）
+# An identical LLM trade (action, symbol, quantity) is executed at most once per window:
+# the window is part of the order's idempotency key.
+LLM_TRADE_DEDUP_SECONDS = float(os.environ.get('STOCKTRADER_LLM_TRADE_DEDUP', 300))
+
+# Order queue: strategies and LLM trades are enqueued (orders + order_events tables in
+# the trades database) and executed in batches by a background worker in each process.
+# A claimed order that is not filled within ORDER_CLAIM_TIMEOUT seconds (its worker
+# died) is returned to the queue. Orders whose batch fails to record (e.g. database
+# locked) go back to the queue and are marked failed after ORDER_MAX_ATTEMPTS tries.
+ORDER_BATCH_SIZE = int(os.environ.get('STOCKTRADER_ORDER_BATCH_SIZE', 100))
+ORDER_POLL_INTERVAL = float(os.environ.get('STOCKTRADER_ORDER_POLL', 1.0))
+ORDER_CLAIM_TIMEOUT = float(os.environ.get('STOCKTRADER_ORDER_CLAIM_TIMEOUT', 60))
+ORDER_MAX_ATTEMPTS = int(os.environ.get('STOCKTRADER_ORDER_MAX_ATTEMPTS', 3))
+
+# Dashboard charts: rendered server-side ('server', memoized on input values and
+# served from /charts/...) or drawn in the browser from JSON series ('client').
+CHART_RENDER_MODE = os.environ.get('STOCKTRADER_CHART_MODE', 'server')
+CHART_FORMAT = os.environ.get('STOCKTRADER_CHART_FORMAT', 'svg')  # 'svg' 或 'png'
+CHART_CACHE_SIZE = int(os.environ.get('STOCKTRADER_CHART_CACHE_SIZE', 64))
+
+# Trading log: size-based rotation with gzip archives, plus an in-memory ring
+# buffer of recent lines for the dashboard. With several worker processes
+# (STOCKTRADER_WORKERS, exported by gunicorn.conf.py) every worker appends to the
+# same file, rotation is serialized by a file lock, and recent lines are read
+# from the file so all workers show the same log.
+LOG_DIR = os.environ.get('STOCKTRADER_LOG_DIR') or os.path.join(BASE_DIR, 'logs')
+WEB_WORKERS = int(os.environ.get('STOCKTRADER_WORKERS', 1))
+LOG_MAX_BYTES = int(os.environ.get('STOCKTRADER_LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('STOCKTRADER_LOG_BACKUPS', 5))
+LOG_BUFFER_SIZE = int(os.environ.get('STOCKTRADER_LOG_BUFFER', 500))
+
+# Trade table pagination on the dashboard and /api/trades.
+TRADES_PAGE_SIZE = int(os.environ.get('STOCKTRADER_TRADES_PAGE_SIZE', 50))
+TRADES_MAX_PAGE_SIZE = 500
+
+# Request instrumentation: per-stage spans feed /metrics and the Server-Timing
+# header. Set STOCKTRADER_PROFILE_THRESHOLD (seconds) to cProfile every request
+# and keep the .prof dump of those slower than the threshold.
+PROFILE_THRESHOLD = float(os.environ['STOCKTRADER_PROFILE_THRESHOLD']) if os.environ.get('STOCKTRADER_PROFILE_THRESHOLD') else None
+PROFILE_DIR = os.environ.get('STOCKTRADER_PROFILE_DIR') or os.path.join(LOG_DIR, 'profiles')
@@ -1,32 +1,196 @@
 
-import yfinance as yf
-from stock_trader.config import DB_PATH  # For future use if needed
-from functools import lru_cache
+import abc
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stock_trader.config import (
+    QUOTE_TTL_SECONDS, QUOTE_STALE_SECONDS, QUOTE_NEGATIVE_TTL, QUOTE_MAX_WORKERS, QUOTE_PROVIDER
+)
+from stock_trader.utils.instrumentation import instrumented
 
 """
 数据相关工具函数。
+
+行情通过 QuoteService 获取：一次批量请求所有 symbol，结果写入进程内 TTL 缓存。
+过期但仍在 stale 窗口内的价格会立即返回，同时在后台刷新（stale-while-revalidate）。
+取价失败（返回 None 或抛异常）不会覆盖已缓存的价格，只在 QUOTE_NEGATIVE_TTL 秒内暂停重试该 symbol。
+数据源可通过 set_quote_provider 替换，例如测试/基准中使用 FakeQuoteProvider。
 """
 
-# Cache stock prices for 60 seconds to reduce API calls
-@lru_cache(maxsize=64)
-def _cached_stock_price(symbol, _ts):
-    try:
-        ticker = yf.Ticker(symbol)
-        data = ticker.history(period='1d')
-        if not data.empty:
-            return round(data['Close'].iloc[-1], 2)
-    except Exception:
-        pass
-    return None
+
+class QuoteProvider(abc.ABC):
+    """行情数据源接口：fetch(symbols) 返回 {symbol: price or None}。"""
+
+    @abc.abstractmethod
+    def fetch(self, symbols):
+        ...
+
+
+class YahooQuoteProvider(QuoteProvider):
+    """Yahoo Finance 数据源：先用 yf.download 批量获取，缺失的 symbol 再用有界线程池逐个补取。"""
+
+    def __init__(self, max_workers=QUOTE_MAX_WORKERS):
+        self.max_workers = max_workers
+
+    def fetch(self, symbols):
+        import yfinance as yf  # 导入较慢（含 pandas），首次请求行情时再导入
+        symbols = list(symbols)
+        prices = {symbol: None for symbol in symbols}
+        try:
+            data = yf.download(symbols, period='1d', group_by='ticker', progress=False, threads=True, auto_adjust=False)
+            for symbol in symbols:
+                try:
+                    close = data[symbol]['Close'] if symbol in data.columns.get_level_values(0) else data['Close']
+                    close = close.dropna()
+                    if not close.empty:
+                        prices[symbol] = round(float(close.iloc[-1]), 2)
+                except Exception:
+                    pass
+        except Exception:
+            pass
+        missing = [symbol for symbol, price in prices.items() if price is None]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as pool:
+                for symbol, price in zip(missing, pool.map(self._fetch_one, missing)):
+                    prices[symbol] = price
+        return prices
+
+    @staticmethod
+    def _fetch_one(symbol):
+        import yfinance as yf
+        try:
+            data = yf.Ticker(symbol).history(period='1d')
+            if not data.empty:
+                return round(data['Close'].iloc[-1], 2)
+        except Exception:
+            pass
+        return None
+
+
+class FakeQuoteProvider(QuoteProvider):
+    """本地假数据源，用于测试和基准：固定价格表，未知 symbol 使用 default。记录调用次数。"""
+
+    def __init__(self, prices=None, default=100.0, latency=0.0):
+        self.prices = dict(prices or {})
+        self.default = default
+        self.latency = latency
+        self.calls = 0
+
+    def fetch(self, symbols):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {symbol: self.prices.get(symbol, self.default) for symbol in symbols}
+
+
+class QuoteService:
+    """批量行情 + 进程内 TTL 缓存（带 stale-while-revalidate）。线程安全。"""
+
+    def __init__(self, provider, ttl=QUOTE_TTL_SECONDS, stale_ttl=QUOTE_STALE_SECONDS, negative_ttl=QUOTE_NEGATIVE_TTL,
+                 clock=time.monotonic):
+        self.provider = provider
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._entries = {}  # symbol -> (price, fetched_at)，只保存取到的价格
+        self._failed = {}   # symbol -> 最近一次取价失败的时间
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get_prices(self, symbols):
+        """返回 {symbol: price}；新鲜数据直接返回，stale 数据返回后后台刷新，缺失/过期的同步批量获取。"""
+        now = self.clock()
+        result, stale, missing = {}, [], []
+        with self._lock:
+            for symbol in dict.fromkeys(symbols):
+                entry = self._entries.get(symbol)
+                age = now - entry[1] if entry else None
+                failed_at = self._failed.get(symbol)
+                backoff = failed_at is not None and now - failed_at < self.negative_ttl
+                if entry and age < self.ttl:
+                    result[symbol] = entry[0]
+                elif entry and age < self.ttl + self.stale_ttl:
+                    result[symbol] = entry[0]
+                    if not backoff and symbol not in self._refreshing:
+                        self._refreshing.add(symbol)
+                        stale.append(symbol)
+                elif backoff:
+                    result[symbol] = None  # 刚取价失败，短时间内不重复请求数据源
+                else:
+                    missing.append(symbol)
+        if stale:
+            threading.Thread(target=self._refresh, args=(stale,), daemon=True).start()
+        if missing:
+            result.update(self._fetch(missing))
+        return result
+
+    def get_price(self, symbol):
+        return self.get_prices([symbol]).get(symbol)
+
+    def invalidate(self, symbols=None):
+        with self._lock:
+            if symbols is None:
+                self._entries.clear()
+                self._failed.clear()
+            else:
+                for symbol in symbols:
+                    self._entries.pop(symbol, None)
+                    self._failed.pop(symbol, None)
+
+    def _fetch(self, symbols):
+        try:
+            prices = self.provider.fetch(symbols)
+        except Exception:
+            prices = {}
+        prices = {symbol: prices.get(symbol) for symbol in symbols}
+        fetched_at = self.clock()
+        with self._lock:
+            for symbol, price in prices.items():
+                if price is None:
+                    # 保留之前取到的价格（后台刷新失败时仍按 stale 返回），只记录失败时间
+                    self._failed[symbol] = fetched_at
+                else:
+                    self._entries[symbol] = (price, fetched_at)
+                    self._failed.pop(symbol, None)
+        return prices
+
+    def _refresh(self, symbols):
+        try:
+            self._fetch(symbols)
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(symbols)
+
+
+_quote_service = QuoteService(FakeQuoteProvider() if QUOTE_PROVIDER == 'fake' else YahooQuoteProvider())
+
+
+def get_quote_service():
+    return _quote_service
+
+
+def set_quote_provider(provider):
+    """替换行情数据源并清空缓存。"""
+    _quote_service.provider = provider
+    _quote_service.invalidate()
+
+
+@instrumented('quotes')
+def get_stock_prices(symbols):
+    """
+    批量获取多个股票/加密货币的最新收盘价。
+    返回: {symbol: float 或 None}
+    """
+    return _quote_service.get_prices(symbols)
 
 
+@instrumented('quotes')
 def get_stock_price(symbol):
     """
-    获取指定股票/加密货币的最新收盘价，缓存60秒。
+    获取指定股票/加密货币的最新收盘价，缓存 QUOTE_TTL_SECONDS 秒。
     symbol: 股票或加密货币代码，如 'AAPL' 或 'BTC-USD'
     返回: float 或 None
     """
-    # Use current minute as cache key, so cache is valid for 60 seconds
-    ts = int(time.time() // 60)
-    return _cached_stock_price(symbol, ts)
+    return _quote_service.get_price(symbol)
@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Union
+
+@dataclass
+class Position:
+    symbol: str
+    quantity: int = 0
+    cost_basis: float = 0.0  # Remaining cost of the open quantity (average-cost method)
+    first_buy_date: Optional[Union[datetime, str]] = None
+    buy_cost: float = 0.0  # Cumulative cash paid for buys
+    sell_income: float = 0.0  # Cumulative cash received from sells
+
+    def apply(self, trade_type: str, quantity: int, price: float, timestamp=None) -> None:
+        """
+        Fold one fill into the position. Sells reduce the open quantity at the
+        current average cost; the cash flow is always booked in full.
+        """
+        price = price or 0.0
+        if trade_type == 'Buy':
+            if self.quantity <= 0:
+                self.first_buy_date = timestamp
+            self.quantity += quantity
+            self.cost_basis += quantity * price
+            self.buy_cost += quantity * price
+        elif trade_type == 'Sell':
+            self.sell_income += quantity * price
+            sold = min(quantity, max(self.quantity, 0))
+            if sold:
+                self.cost_basis -= self.cost_basis / self.quantity * sold
+                self.quantity -= sold
+            if self.quantity <= 0:
+                self.quantity = 0
+                self.cost_basis = 0.0
+                self.first_buy_date = None
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    symbol: str
+    asset_class: str = 'stock'  # 'stock' or 'crypto'
+    exchange: Optional[str] = None
+    currency: str = 'USD'
+    name: Optional[str] = None
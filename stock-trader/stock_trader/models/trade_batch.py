@@ -0,0 +1,76 @@
+import numpy as np
+
+# 紧凑的成交记录表示：每笔成交一行结构化数组记录，symbol 用整数编码
+# side: 1 = Buy, -1 = Sell, 0 = 其它
+TRADE_DTYPE = np.dtype([
+    ('id', 'i8'),
+    ('symbol', 'i4'),
+    ('side', 'i1'),
+    ('quantity', 'i8'),
+    ('price', 'f8'),
+    ('timestamp', 'M8[us]'),
+])
+
+_RAW_DTYPE = np.dtype([
+    ('id', 'i8'),
+    ('symbol', 'U32'),
+    ('side', 'i1'),
+    ('quantity', 'i8'),
+    ('price', 'f8'),
+    ('timestamp', 'M8[us]'),
+])
+
+# 同 TRADE_DTYPE，但 timestamp 为 epoch 微秒整数（内存布局相同，可直接 view）
+_DB_DTYPE = np.dtype([(name, 'i8' if name == 'timestamp' else TRADE_DTYPE[name]) for name in TRADE_DTYPE.names])
+
+_SIDES = {'Buy': 1, 'Sell': -1}
+
+
+class TradeBatch:
+    """
+    以 NumPy 结构化数组存放的一批成交记录，适合百万级回测数据。
+    records: TRADE_DTYPE 数组；symbols: 编码到代码的映射（records['symbol'] 为其下标）。
+    """
+
+    def __init__(self, records, symbols):
+        self.records = records
+        self.symbols = list(symbols)
+
+    def __len__(self):
+        return len(self.records)
+
+    @classmethod
+    def _from_raw(cls, raw):
+        symbols, codes = np.unique(raw['symbol'], return_inverse=True)
+        records = np.empty(len(raw), dtype=TRADE_DTYPE)
+        for name in ('id', 'side', 'quantity', 'price', 'timestamp'):
+            records[name] = raw[name]
+        records['symbol'] = codes
+        return cls(records, symbols.tolist())
+
+    @classmethod
+    def from_trades(cls, trades):
+        """从 Trade 对象列表构建。"""
+        raw = np.fromiter(
+            ((t.id, t.symbol, _SIDES.get(t.type, 0), t.quantity, t.price or 0.0, t.timestamp) for t in trades),
+            dtype=_RAW_DTYPE, count=len(trades)
+        )
+        return cls._from_raw(raw)
+
+    @classmethod
+    def from_db(cls, conn):
+        """
+        直接从 SQLite 的 trades 表流式读入，不创建 Trade 对象。
+        symbol 编码、side 和 timestamp（epoch 微秒）都在 SQL 中算好，Python 侧不做逐行字符串处理。
+        """
+        symbols = [row[0] for row in conn.execute('SELECT DISTINCT symbol FROM trades ORDER BY symbol')]
+        cursor = conn.execute(
+            "WITH codes AS (SELECT symbol, ROW_NUMBER() OVER (ORDER BY symbol) - 1 AS code "
+            "               FROM (SELECT DISTINCT symbol FROM trades)) "
+            "SELECT t.id, codes.code, CASE t.type WHEN 'Buy' THEN 1 WHEN 'Sell' THEN -1 ELSE 0 END, "
+            "       t.quantity, COALESCE(t.price, 0), "
+            "       CAST(ROUND((julianday(t.timestamp) - 2440587.5) * 86400000000) AS INTEGER) "
+            "FROM trades t JOIN codes ON codes.symbol = t.symbol"
+        )
+        records = np.fromiter(cursor, dtype=_DB_DTYPE).view(TRADE_DTYPE)
+        return cls(records, symbols)
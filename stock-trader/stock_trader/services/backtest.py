@@ -0,0 +1,258 @@
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from stock_trader.config import DEFAULT_INITIAL_FUND
+from stock_trader.models.position import Position
+from stock_trader.services import trade_service
+from stock_trader.services.db import close_connections
+from stock_trader.services.market_history import read_rows
+from stock_trader.services.decision_parser import DecisionParser
+
+"""
+离线回测：按时间顺序回放行情快照，驱动可插拔策略下单。
+成交按快照价格经 trade_service.record_trades 写入隔离的交易库（默认内存库），
+与线上 trades/positions 表互不影响。
+"""
+
+logger = logging.getLogger(__name__)
+
+Snapshot = Tuple[str, Dict[str, float]]
+Order = Tuple[str, str, int]
+
+
+# ---- 行情来源 ----
+
+def snapshots_from_store(store, start=None, end=None) -> Iterable[Snapshot]:
+    """从 MarketHistoryStore 流式读取快照。"""
+    return store.iter_snapshots(start, end)
+
+
+def snapshots_from_rows(rows) -> Iterable[Snapshot]:
+    """把行 dict（date, symbol, price ...）按 date 排序并分组为快照，跳过没有价格的行。"""
+    rows = sorted((row for row in rows if row.get('price') not in (None, '')), key=lambda row: str(row['date']))
+    for date, group in groupby(rows, key=lambda row: str(row['date'])):
+        yield date, {row['symbol']: float(row['price']) for row in group}
+
+
+def snapshots_from_file(path) -> Iterable[Snapshot]:
+    """从旧的 market_data.csv / market_data.json 读取快照。"""
+    return snapshots_from_rows(read_rows(path))
+
+
+# ---- 账户 ----
+
+class Portfolio:
+    """回测中的现金和持仓（平均成本法，与持仓账本同一套 Position.apply）。"""
+
+    def __init__(self, initial_fund: float):
+        self.cash = float(initial_fund)
+        self.positions: Dict[str, Position] = {}
+        self.prices: Dict[str, float] = {}
+
+    def quantity(self, symbol: str) -> int:
+        position = self.positions.get(symbol)
+        return position.quantity if position else 0
+
+    def apply(self, symbol: str, trade_type: str, quantity: int, price: float, timestamp) -> None:
+        position = self.positions.get(symbol)
+        if position is None:
+            position = self.positions[symbol] = Position(symbol=symbol)
+        position.apply(trade_type, quantity, price, timestamp)
+        self.cash += quantity * price if trade_type == 'Sell' else -quantity * price
+        if position.quantity <= 0:
+            del self.positions[symbol]
+
+    def equity(self) -> float:
+        """现金 + 持仓按最近价格估值。"""
+        return self.cash + sum(p.quantity * self.prices.get(s, 0.0) for s, p in self.positions.items())
+
+
+# ---- 策略 ----
+
+class Strategy:
+    """回测策略接口：每个快照调用一次，返回要下的单 [(symbol, 'Buy'/'Sell', quantity)]。"""
+
+    def on_snapshot(self, date: str, prices: Dict[str, float], portfolio: Portfolio) -> List[Order]:
+        return []
+
+
+class MomentumStrategy(Strategy):
+    """
+    简单动量规则：价格相对 lookback 个快照之前上涨超过 threshold 时买入 quantity 股，
+    下跌超过 threshold 时清仓。
+    """
+
+    def __init__(self, lookback: int = 5, threshold: float = 0.01, quantity: int = 1):
+        self.threshold = threshold
+        self.quantity = quantity
+        self.history = defaultdict(lambda: deque(maxlen=lookback + 1))
+
+    def on_snapshot(self, date, prices, portfolio):
+        orders = []
+        for symbol, price in prices.items():
+            history = self.history[symbol]
+            history.append(price)
+            if len(history) < history.maxlen or not history[0]:
+                continue
+            change = price / history[0] - 1
+            if change > self.threshold:
+                orders.append((symbol, 'Buy', self.quantity))
+            elif change < -self.threshold and portfolio.quantity(symbol) > 0:
+                orders.append((symbol, 'Sell', portfolio.quantity(symbol)))
+        return orders
+
+
+class CachedLLMStrategy(Strategy):
+    """
+    回放事先缓存的大模型回答 {date: answer}，回测时不调用模型。
+    回答按 trading_executor 的同一规则（decision_parser）解析出全部交易意图，
+    未写明数量的意图交易 quantity 股。
+    """
+
+    def __init__(self, decisions: Dict[str, str], quantity: int = 1):
+        self.decisions = decisions
+        self.quantity = quantity
+
+    @classmethod
+    def from_file(cls, path, quantity: int = 1):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), quantity)
+
+    def on_snapshot(self, date, prices, portfolio):
+        answer = self.decisions.get(date)
+        if not answer:
+            return []
+        # prices 是 dict，直接作为 symbol 集合，不必每个快照复制一份
+        return [(symbol, action, quantity)
+                for action, symbol, quantity in DecisionParser(prices, self.quantity).parse(answer)]
+
+
+# ---- 回测 ----
+
+@dataclass
+class BacktestResult:
+    initial_fund: float
+    final_equity: float
+    equity_curve: List[Tuple[str, float]] = field(default_factory=list)
+    trade_count: int = 0
+    rejected_orders: int = 0
+    positions: List[Position] = field(default_factory=list)
+    snapshots: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def roi(self) -> float:
+        return (self.final_equity - self.initial_fund) / self.initial_fund if self.initial_fund else 0.0
+
+    @property
+    def snapshots_per_second(self) -> float:
+        return self.snapshots / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def max_drawdown(self) -> float:
+        peak, drawdown = float('-inf'), 0.0
+        for _, equity in self.equity_curve:
+            peak = max(peak, equity)
+            if peak > 0:
+                drawdown = max(drawdown, (peak - equity) / peak)
+        return drawdown
+
+    def summary(self) -> dict:
+        return {
+            'snapshots': self.snapshots,
+            'trades': self.trade_count,
+            'rejected_orders': self.rejected_orders,
+            'initial_fund': self.initial_fund,
+            'final_equity': round(self.final_equity, 2),
+            'roi': f"{self.roi * 100:.2f}%",
+            'max_drawdown': f"{self.max_drawdown * 100:.2f}%",
+            'elapsed_seconds': round(self.elapsed, 3),
+            'snapshots_per_second': round(self.snapshots_per_second, 1),
+        }
+
+
+@contextmanager
+def isolated_trade_db(db_path: str = ':memory:'):
+    """
+    在 db_path（默认内存库）建好交易表并返回该路径，退出时关闭连接。
+    回测显式地把路径传给 trade_service，不修改线上的 DB_NAME，也不会触发成交推送。
+    """
+    try:
+        trade_service.init_db(db_path)
+        yield db_path
+    finally:
+        close_connections(db_path)
+
+
+class Backtester:
+    """
+    回放快照并驱动策略。每个快照：更新估值价格 -> 策略下单 -> 按快照价格成交
+    （现金不足的买单、无持仓的卖单会被拒绝，卖单数量截断到持仓）-> 记录权益。
+    """
+
+    def __init__(self, strategy: Strategy, initial_fund: float = DEFAULT_INITIAL_FUND, db_path: str = ':memory:'):
+        self.strategy = strategy
+        self.initial_fund = initial_fund
+        self.db_path = db_path
+
+    def _fills(self, orders, prices, portfolio):
+        fills, cash, held, rejected = [], portfolio.cash, {}, 0
+        for symbol, trade_type, quantity in orders:
+            price = prices.get(symbol)
+            if not price or quantity <= 0:
+                rejected += 1
+                continue
+            if trade_type == 'Buy':
+                if quantity * price > cash:
+                    rejected += 1
+                    continue
+                cash -= quantity * price
+                held[symbol] = held.get(symbol, portfolio.quantity(symbol)) + quantity
+            elif trade_type == 'Sell':
+                available = held.get(symbol, portfolio.quantity(symbol))
+                quantity = min(quantity, available)
+                if quantity <= 0:
+                    rejected += 1
+                    continue
+                cash += quantity * price
+                held[symbol] = available - quantity
+            else:
+                rejected += 1
+                continue
+            fills.append((symbol, trade_type, quantity, price))
+        return fills, rejected
+
+    def run(self, snapshots: Iterable[Snapshot]) -> BacktestResult:
+        portfolio = Portfolio(self.initial_fund)
+        result = BacktestResult(initial_fund=self.initial_fund, final_equity=self.initial_fund)
+        start = time.perf_counter()
+        with isolated_trade_db(self.db_path) as db_path:
+            for date, prices in snapshots:
+                portfolio.prices.update(prices)
+                orders = self.strategy.on_snapshot(date, prices, portfolio)
+                if orders:
+                    fills, rejected = self._fills(orders, prices, portfolio)
+                    result.rejected_orders += rejected
+                    if fills and trade_service.record_trades(fills, timestamp=date, db_path=db_path):
+                        for symbol, trade_type, quantity, price in fills:
+                            portfolio.apply(symbol, trade_type, quantity, price, date)
+                        result.trade_count += len(fills)
+                result.equity_curve.append((date, portfolio.equity()))
+                result.snapshots += 1
+            result.positions = trade_service.get_positions(db_path)
+        result.elapsed = time.perf_counter() - start
+        result.final_equity = portfolio.equity()
+        logger.info("[Backtest] %s", result.summary())
+        return result
+
+
+def run_backtest(snapshots: Iterable[Snapshot], strategy: Optional[Strategy] = None,
+                 initial_fund: float = DEFAULT_INITIAL_FUND, db_path: str = ':memory:') -> BacktestResult:
+    """便捷入口：默认使用 MomentumStrategy。"""
+    return Backtester(strategy or MomentumStrategy(), initial_fund, db_path).run(snapshots)
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+"""
+SQLite 连接管理：每个线程对每个数据库文件复用一个连接（线程结束时随线程本地数据释放），
+首次打开时启用 WAL 并设置常用 pragma，让仪表盘读与自动交易写可以并发进行。
+"""
+
+# WAL 下 synchronous=NORMAL 仍保证数据库一致性，只是断电时可能丢失最后几个事务
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+)
+
+_local = threading.local()
+
+
+def _open(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path):
+    """返回当前线程到 db_path 的连接，不存在时新建。"""
+    pool = getattr(_local, 'connections', None)
+    if pool is None:
+        pool = _local.connections = {}
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = pool[db_path] = _open(db_path)
+    return conn
+
+
+@contextmanager
+def transaction(db_path):
+    """在当前线程的连接上开启事务：正常退出时提交，异常时回滚。"""
+    conn = get_connection(db_path)
+    with conn:
+        yield conn
+
+
+def close_connections(db_path=None):
+    """关闭当前线程持有的连接；给出 db_path 时只关闭该数据库的连接。"""
+    pool = getattr(_local, 'connections', None) or {}
+    for path in [db_path] if db_path is not None else list(pool):
+        conn = pool.pop(path, None)
+        if conn is not None:
+            conn.close()
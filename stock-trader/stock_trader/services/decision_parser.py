@@ -0,0 +1,206 @@
+"""
+大模型交易建议解析：把回答转换为全部 (action, symbol, quantity) 交易意图。
+
+优先读取回答中符合 DECISION_SCHEMA 的 JSON；没有合法 JSON 时对自由文本做一次扫描。
+扫描用一个预编译正则按位置依次识别动作词、数量、symbol 形态的词和句末标点，
+symbol 词按 ASCII 字母数字边界整体切出后查集合（O(1)），耗时只与文本长度有关，与 symbol 数量无关；
+"META" 不会在 "METAL"、"metadata" 中被误识别。
+
+自由文本规则：
+- 动作词（买入/卖出/buy/sell……）之后出现的 symbol 按该动作交易，直到句末或下一个动作词；
+  同一句中动作词之前出现的 symbol（如 "AAPL 表现强势，建议买入"）也归入该动作。
+- 否定词（不要/不建议/avoid……）之后的动作词被忽略。
+- 带单位的数量（"10股"、"5 shares"）属于下一个 symbol，紧跟在 symbol 后时属于该 symbol；
+  不带单位的数字只有夹在动作词和 symbol 之间、且前后没有其他内容（"buy 10 AAPL"）才算数量，
+  "sell at 200 MSFT" 中的 200 是价格，不是数量。
+- "long"/"short" 不作为动作词（"in the short term"、"as long as" 是常见的非交易用语）。
+- 同一 (action, symbol) 只保留第一次出现。
+"""
+import json
+import re
+from typing import Iterable, List, NamedTuple, Optional
+
+ACTIONS = ('Buy', 'Sell')
+
+# 约束模型输出的 JSON Schema；DECISION_INSTRUCTIONS 附在 prompt 末尾
+DECISION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'intents': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'action': {'type': 'string', 'enum': list(ACTIONS)},
+                    'symbol': {'type': 'string'},
+                    'quantity': {'type': 'integer', 'minimum': 1},
+                },
+                'required': ['action', 'symbol'],
+                'additionalProperties': False,
+            },
+        },
+    },
+    'required': ['intents'],
+}
+
+DECISION_INSTRUCTIONS = (
+    "最后另起一行，输出符合以下 JSON Schema 的交易意图（不操作时 intents 为空列表）：\n"
+    + json.dumps(DECISION_SCHEMA, ensure_ascii=False, separators=(',', ':'))
+)
+
+
+class TradeIntent(NamedTuple):
+    action: str  # 'Buy' or 'Sell'
+    symbol: str
+    quantity: int
+
+
+# 开头的前瞻字符集让正则引擎快速跳过不可能开始任何词的字符（大部分中文和小写字母）
+_TOKEN_RE = re.compile(r'''
+    (?=[不避暂买加卖减清出A-Z0-9bdasnBDSAN。！？!?;；\n.])
+    (?:
+    (?P<neg>不要|不建议|不宜|避免|暂不|(?<![A-Za-z])(?i:don't|do\ not|avoid|never)(?![A-Za-z]))
+  | (?P<buy>买入|买进|加仓|买|(?<![A-Za-z])(?i:buy)(?![A-Za-z]))
+  | (?P<sell>卖出|减仓|清仓|出售|卖|(?<![A-Za-z])(?i:sell)(?![A-Za-z]))
+  | (?<![A-Za-z0-9.])(?P<qty>\d+)(?![\d.])(?:\s*(?P<unit>股|手|(?i:shares?|units?)(?![A-Za-z])))?
+  | (?<![A-Za-z0-9])(?P<symbol>[A-Z0-9]+(?:[.\-][A-Z0-9]+)*)(?![A-Za-z0-9])
+  | (?P<stop>[。！？!?;；\n]|\.(?=\s|$))
+    )
+''', re.VERBOSE)
+
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+
+class DecisionParser:
+    """
+    symbols 为任意支持 in 的容器（set、dict、SymbolRegistry 等）；列表会转为 frozenset。
+    对同一组 symbol 反复解析时复用同一个实例。未写明数量的意图使用 default_quantity。
+    """
+
+    def __init__(self, symbols, default_quantity: int = 1):
+        if isinstance(symbols, (list, tuple)) or not hasattr(symbols, '__contains__'):
+            symbols = frozenset(symbols)
+        self.symbols = symbols
+        self.default_quantity = default_quantity
+
+    def parse(self, text: Optional[str]) -> List[TradeIntent]:
+        if not text:
+            return []
+        intents = self._parse_json(text)
+        return intents if intents is not None else self._scan(text)
+
+    def _parse_json(self, text) -> Optional[List[TradeIntent]]:
+        """回答中含合法 JSON（{"intents": [...]} 或单个 {"action", "symbol", "quantity"}）时返回其意图，否则 None。"""
+        match = _JSON_RE.search(text)
+        if match is None:
+            return None
+        try:
+            payload = json.loads(match.group())
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        if isinstance(payload.get('intents'), list):
+            items = payload['intents']
+        elif 'action' in payload and 'symbol' in payload:
+            items = [payload]
+        else:
+            return None
+        intents = _Intents()
+        for item in items:
+            intent = self._intent_from_json(item) if isinstance(item, dict) else None
+            if intent is not None:
+                intents.add(intent)
+        return intents.items
+
+    def _intent_from_json(self, item) -> Optional[TradeIntent]:
+        action = str(item.get('action', '')).capitalize()
+        symbol = str(item.get('symbol', '')).strip().upper()
+        try:
+            quantity = int(item.get('quantity') or self.default_quantity)
+        except (TypeError, ValueError):
+            return None
+        if action not in ACTIONS or symbol not in self.symbols or quantity <= 0:
+            return None
+        return TradeIntent(action, symbol, quantity)
+
+    def _scan(self, text) -> List[TradeIntent]:
+        intents = _Intents()
+        action = None          # 当前句中生效的动作；'' 表示被否定，其后的 symbol 忽略
+        negated = False        # 下一个动作词被否定
+        pending = []           # 本句动作词之前出现的 [symbol, quantity]
+        quantity = None        # 等待分配给下一个 symbol 的数量
+        bare = None            # (数字, 起始位置, 结束位置)：夹在动作词和 symbol 之间时才算数量
+        action_end = None      # 本句最后一个动作词的结束位置
+        last = None            # 刚出现、尚未写明数量的 symbol：('intent', 下标) 或 ('pending', 下标)
+        for match in _TOKEN_RE.finditer(text):
+            kind = match.lastgroup
+            if kind in ('qty', 'unit'):  # 带单位时 lastgroup 为内层的 unit
+                value = int(match.group('qty'))
+                if not match.group('unit'):
+                    bare = (value, match.start(), match.end())
+                elif last is not None:
+                    target, index = last
+                    if target == 'intent':
+                        intents.set_quantity(index, value)
+                    else:
+                        pending[index][1] = value
+                    last = None
+                else:
+                    quantity = value
+                continue
+            if kind == 'symbol':
+                symbol = match.group('symbol')
+                if symbol not in self.symbols:
+                    continue
+                if (bare is not None and action_end is not None and not text[action_end:bare[1]].strip()
+                        and not text[bare[2]:match.start()].strip()):
+                    quantity = bare[0]
+                bare, last = None, None
+                if action is None:
+                    pending.append([symbol, quantity])
+                    if quantity is None:
+                        last = ('pending', len(pending) - 1)
+                elif action:
+                    index = intents.add(TradeIntent(action, symbol, quantity or self.default_quantity))
+                    if index is not None and quantity is None:
+                        last = ('intent', index)
+                quantity = None
+                continue
+            bare, last = None, None
+            if kind == 'neg':
+                negated = True
+            elif kind in ('buy', 'sell'):
+                action = '' if negated else ('Buy' if kind == 'buy' else 'Sell')
+                negated, action_end = False, match.end()
+                for symbol, symbol_quantity in pending if action else ():
+                    intents.add(TradeIntent(action, symbol, symbol_quantity or self.default_quantity))
+                pending = []
+            elif kind == 'stop':
+                action, negated, pending, quantity, action_end = None, False, [], None, None
+        return intents.items
+
+
+class _Intents:
+    """按出现顺序保存意图，同一 (action, symbol) 只保留第一次。"""
+
+    def __init__(self):
+        self.items = []
+        self._index = {}
+
+    def add(self, intent):
+        """追加并返回下标；已存在时不追加，返回 None。"""
+        key = (intent.action, intent.symbol)
+        if key in self._index:
+            return None
+        self._index[key] = len(self.items)
+        self.items.append(intent)
+        return len(self.items) - 1
+
+    def set_quantity(self, index, quantity):
+        self.items[index] = self.items[index]._replace(quantity=quantity)
+
+
+def parse_decision(text: Optional[str], symbols: Iterable[str], default_quantity: int = 1) -> List[TradeIntent]:
+    """一次性解析：返回 text 中全部交易意图。对同一组 symbol 多次解析时请复用 DecisionParser。"""
+    return DecisionParser(symbols, default_quantity).parse(text)
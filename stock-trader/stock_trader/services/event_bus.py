@@ -0,0 +1,185 @@
+"""
+仪表盘推送通道。
+
+事件（成交 fills、行情 tick、日志 log）追加到共享状态库的 events 表，id 自增，
+因此任何 worker 产生的事件都能推给连接在任意 worker 上的浏览器。
+每个进程只有一个后台线程按 poll_interval 拉取新事件放入内存缓冲区并唤醒等待的连接；
+本进程发布的事件会立即唤醒该线程。断线重连时按 Last-Event-ID 补发，
+缓冲区里没有的旧事件从库中读取（库中只保留最近 retain 条）。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from stock_trader.config import STATE_DB_PATH, EVENTS_POLL_INTERVAL, EVENTS_HEARTBEAT_SECONDS, EVENTS_RETAIN
+from stock_trader.services.db import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    def __init__(self, db_path=STATE_DB_PATH, poll_interval=EVENTS_POLL_INTERVAL, retain=EVENTS_RETAIN):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.retain = retain
+        self._events = deque(maxlen=retain)  # (id, type, data JSON)
+        self._start_id = None  # 轮询线程启动时的最新 id，缓冲区包含其后的全部事件
+        self._last_id = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = get_connection(self.db_path)
+        if not self._initialized:
+            # 与 _lock 分开：_ensure_poller 持有 _lock 时会调用 latest_id()
+            with self._init_lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+                    with conn:
+                        conn.execute('''CREATE TABLE IF NOT EXISTS events (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            type TEXT NOT NULL,
+                            data TEXT NOT NULL,
+                            created_at REAL NOT NULL
+                        )''')
+                    self._initialized = True
+        return conn
+
+    def publish(self, event_type, data):
+        """追加一个事件（data 需可 JSON 序列化），返回事件 id。"""
+        conn = self._connect()
+        with conn:
+            event_id = conn.execute('INSERT INTO events (type, data, created_at) VALUES (?, ?, ?)',
+                                    (event_type, json.dumps(data, ensure_ascii=False), time.time())).lastrowid
+            if event_id % 100 == 0:
+                conn.execute('DELETE FROM events WHERE id <= ?', (event_id - self.retain,))
+        self._wake.set()
+        return event_id
+
+    def latest_id(self):
+        """当前最新事件 id（无事件时为 0）。页面渲染时记下，连接 /events 时从这里开始接收。"""
+        return self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def _read_after(self, last_id, limit=None):
+        return self._connect().execute('SELECT id, type, data FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                                       (last_id, limit or self.retain)).fetchall()
+
+    def poll(self):
+        """把库中新增的事件读入缓冲区并唤醒等待者。返回新事件数。"""
+        rows = self._read_after(self._last_id)
+        if rows:
+            with self._cond:
+                self._events.extend(rows)
+                self._last_id = rows[-1][0]
+                self._cond.notify_all()
+        return len(rows)
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("[Events] Poll failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _ensure_poller(self):
+        with self._lock:
+            if self._thread is None:
+                self._start_id = self._last_id = self.latest_id()
+                self._thread = threading.Thread(target=self._run, name='event-bus-poller', daemon=True)
+                self._thread.start()
+
+    def wait(self, last_id, timeout):
+        """返回 id 大于 last_id 的事件列表 [(id, type, data)]；timeout 秒内没有新事件时返回 []。"""
+        self._ensure_poller()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                full = len(self._events) == self._events.maxlen
+                floor = self._events[0][0] - 1 if full else self._start_id
+                if last_id < floor:
+                    break  # 缓冲区不含全部所需事件，从库中补读
+                events = [event for event in self._events if event[0] > last_id]
+                if events:
+                    return events
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+        return self._read_after(last_id)
+
+    def stream(self, last_id=None, heartbeat=EVENTS_HEARTBEAT_SECONDS):
+        """无限生成器：逐个产出 (id, type, data)；heartbeat 秒内没有事件时产出 None（用于保活）。"""
+        self._ensure_poller()
+        if last_id is None:
+            last_id = self._last_id
+        while True:
+            events = self.wait(last_id, heartbeat)
+            if not events:
+                yield None
+                continue
+            for event in events:
+                yield event
+            last_id = events[-1][0]
+
+
+def sse_messages(bus, last_id=None, heartbeat=EVENTS_HEARTBEAT_SECONDS):
+    """把事件流编码为 text/event-stream 消息；客户端断线 3 秒后重连。"""
+    yield 'retry: 3000\n\n'
+    for event in bus.stream(last_id, heartbeat):
+        if event is None:
+            yield ': keep-alive\n\n'
+            continue
+        event_id, event_type, data = event
+        yield f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+class EventLogHandler(logging.Handler):
+    """
+    把日志行作为 log 事件发布（仪表盘的操作日志实时追加）。每条记录写一次状态库，
+    只挂在成交/决策 logger（logger.DECISION_LOGGER）上，不挂在根 logger。
+    跳过 HTTP 访问日志和事件通道自身的日志。
+    """
+
+    IGNORED_LOGGERS = ('werkzeug', __name__)
+
+    def __init__(self, bus):
+        super().__init__(logging.INFO)
+        self.bus = bus
+        self._local = threading.local()
+
+    def emit(self, record):
+        if record.name in self.IGNORED_LOGGERS or getattr(self._local, 'active', False):
+            return
+        self._local.active = True
+        try:
+            self.bus.publish('log', {'lines': [line + '\n' for line in self.format(record).split('\n')]})
+        except Exception:
+            self.handleError(record)
+        finally:
+            self._local.active = False
+
+
+_bus = EventBus()
+
+
+def get_event_bus():
+    return _bus
+
+
+def publish_fills(fills):
+    """trade_service 的成交监听器：把一批成交及其持仓变化作为一个 fills 事件发布。"""
+    _bus.publish('fills', fills)
+
+
+def publish_ticks(snapshot):
+    """行情采集器的快照回调：发布 {symbol: price}。"""
+    _bus.publish('tick', {'prices': {symbol: info.get('price') for symbol, info in snapshot.items()}})
@@ -0,0 +1,243 @@
+"""
+大模型 prompt 的行情特征：对行情历史中的每个 symbol 增量维护最近 window 个快照的滚动统计
+（最新涨跌、区间涨跌、收益波动率、成交量 z 值），并渲染成不超过 token 预算的紧凑表格。
+
+每个新快照对每个 symbol 只做 O(1) 的累计量增减，不重新读取或重算历史；
+渲染结果按 (最新快照, 预算) 缓存，同一快照内的多次请求直接复用。
+超出预算时按异常程度（|成交量 z 值| + |最新涨跌 / 波动率|）保留最值得关注的 symbol，并注明省略数量。
+只写入最新快照中仍有价格的 symbol，价格用定点格式（与成交价一致）。
+token 数按字符估算（中日韩字符各计 1 个，其余每 3 个字符计 1 个），不依赖 tokenizer，偏保守。
+"""
+import math
+import re
+import threading
+import time
+from collections import deque
+from typing import List, NamedTuple, Optional
+
+from stock_trader.config import FEATURE_WINDOW, PROMPT_TOKEN_BUDGET
+from stock_trader.services.market_history import get_market_store
+from stock_trader.utils.cache import TTLCache
+from stock_trader.utils.instrumentation import instrumented
+
+_CJK_RE = re.compile('[\u3000-\u9fff\uff00-\uffef]')
+
+COLUMNS = "symbol|价格|最新涨跌|区间涨跌|收益波动率|成交量z值"
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + -(-(len(text) - cjk) // 3)
+
+
+class SymbolFeatures(NamedTuple):
+    symbol: str
+    price: float
+    ret: Optional[float]            # 最新一期收益
+    window_return: Optional[float]  # 窗口内首个价格到最新价格的收益
+    volatility: Optional[float]     # 窗口内单期收益的标准差
+    volume_z: Optional[float]       # 最新成交量相对窗口内此前成交量的 z 值
+
+    @property
+    def score(self):
+        surprise = abs(self.ret / self.volatility) if self.ret is not None and self.volatility else 0.0
+        return abs(self.volume_z or 0.0) + surprise
+
+    def render(self):
+        return '|'.join((self.symbol, _price(self.price), _pct(self.ret), _pct(self.window_return),
+                         _pct(self.volatility), '-' if self.volume_z is None else f'{self.volume_z:+.1f}'))
+
+
+class RenderedPrompt(NamedTuple):
+    text: str
+    tokens: int           # 估算的 token 数
+    symbols: List[str]    # 写入 prompt 的 symbol（按重要性排序）
+    omitted: int          # 因预算省略的 symbol 数
+    date: Optional[str]   # 最新快照日期
+    seconds: float        # 构造耗时（缓存命中时为首次构造的耗时）
+
+
+class _Rolling:
+    """定长窗口内的累计和/平方和，push 为 O(1)。每写满一轮重算一次，避免浮点误差累积。"""
+
+    __slots__ = ('values', 'total', 'total_sq', '_pushes')
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.total = self.total_sq = 0.0
+        self._pushes = 0
+
+    def push(self, value):
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+        self._pushes += 1
+        if self._pushes % self.values.maxlen == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+    def std(self):
+        n = len(self.values)
+        if n < 2:
+            return None
+        return math.sqrt(max(self.total_sq - self.total * self.total / n, 0.0) / (n - 1))
+
+
+class _SymbolState:
+    __slots__ = ('prices', 'returns', 'volumes', 'ret', 'volume_z', 'date')
+
+    def __init__(self, window):
+        self.prices = deque(maxlen=window + 1)
+        self.returns = _Rolling(window)
+        self.volumes = _Rolling(window)
+        self.ret = None
+        self.volume_z = None
+        self.date = None  # 最近一次出现的快照
+
+    def add(self, price, volume, date=None):
+        self.date = date
+        if self.prices:
+            self.ret = price / self.prices[-1] - 1
+            self.returns.push(self.ret)
+        self.prices.append(price)
+        if volume is not None:
+            # 与此前的成交量比较，因此先算 z 值再写入
+            mean, std = self.volumes.mean(), self.volumes.std()
+            self.volume_z = (volume - mean) / std if std else None
+            self.volumes.push(float(volume))
+
+    def features(self, symbol):
+        return SymbolFeatures(
+            symbol, self.prices[-1], self.ret,
+            self.prices[-1] / self.prices[0] - 1 if len(self.prices) > 1 else None,
+            self.returns.std(), self.volume_z,
+        )
+
+
+class FeaturePipeline:
+    def __init__(self, store=None, window=FEATURE_WINDOW, budget=PROMPT_TOKEN_BUDGET):
+        self.store = store  # None 表示 get_market_store()
+        self.window = window
+        self.budget = budget
+        self._symbols = {}
+        self._dates = deque(maxlen=window + 1)
+        self._source = None
+        self._lock = threading.RLock()
+        self._rendered = TTLCache(maxsize=8)
+
+    def add_snapshot(self, date, rows):
+        """写入一个快照 {symbol: (price, volatility, volume)}（须按时间顺序）。"""
+        with self._lock:
+            for symbol, (price, _, volume) in rows.items():
+                if price is None or price <= 0:
+                    continue
+                state = self._symbols.get(symbol)
+                if state is None:
+                    state = self._symbols[symbol] = _SymbolState(self.window)
+                state.add(price, volume, date)
+            self._dates.append(date)
+
+    def update(self):
+        """从行情库读取尚未写入的快照，返回新增快照数。"""
+        store = self.store or get_market_store()
+        with self._lock:
+            if store is not self._source:
+                # 行情库被替换（如测试中）时从头构建
+                self._symbols, self._source = {}, store
+                self._dates.clear()
+                self._rendered.clear()
+            latest = store.recent_dates(1)
+            if not latest or (self._dates and latest[0] <= self._dates[-1]):
+                return 0
+            start = self._dates[-1] if self._dates else store.recent_dates(self.window + 1)[0]
+            added = 0
+            for date, rows in store.iter_snapshot_rows(start=start):
+                if self._dates and date <= self._dates[-1]:
+                    continue
+                self.add_snapshot(date, rows)
+                added += 1
+            if added:
+                # 整个窗口内都未出现的 symbol 不再保留状态
+                oldest = self._dates[0]
+                self._symbols = {s: state for s, state in self._symbols.items() if state.date >= oldest}
+            return added
+
+    @property
+    def latest_date(self):
+        return self._dates[-1] if self._dates else None
+
+    def features(self):
+        """按重要性降序返回最新快照中各 symbol 的特征；不在最新快照中的（已下架、已移出关注）不返回。"""
+        with self._lock:
+            latest = self.latest_date
+            items = [state.features(symbol) for symbol, state in self._symbols.items() if state.date == latest]
+        return sorted(items, key=lambda f: (-f.score, f.symbol))
+
+    @instrumented('features')
+    def render(self, budget=None):
+        """
+        拉取新快照后渲染行情特征表，总 token 数（估算）不超过 budget。
+        无数据时 text 为空字符串。
+        """
+        budget = self.budget if budget is None else budget
+        with self._lock:
+            self.update()
+            key = (self.latest_date, budget)
+            cached = self._rendered.get(key)
+            if cached is not None:
+                return cached
+            start = time.perf_counter()
+            rendered = self._render(budget)
+            rendered = rendered._replace(seconds=time.perf_counter() - start)
+            self._rendered.set(key, rendered)
+            return rendered
+
+    def _render(self, budget):
+        features = self.features()
+        if not features:
+            return RenderedPrompt('', 0, [], 0, None, 0.0)
+        header = f"市场数据（最近 {len(self._dates)} 个快照，{self._dates[0]} 至 {self._dates[-1]}）：\n{COLUMNS}"
+        # 为省略说明预留的 token
+        footer_tokens = estimate_tokens(f"（另有 {len(features)} 个 symbol 因篇幅省略）") + 1
+        lines, symbols = [header], []
+        tokens = estimate_tokens(header)
+        for item in features:
+            line = item.render()
+            cost = estimate_tokens(line) + 1  # 换行
+            reserve = footer_tokens if len(symbols) + 1 < len(features) else 0
+            if tokens + cost + reserve > budget:
+                break
+            lines.append(line)
+            symbols.append(item.symbol)
+            tokens += cost
+        omitted = len(features) - len(symbols)
+        if omitted:
+            lines.append(f"（另有 {omitted} 个 symbol 因篇幅省略）")
+        text = '\n'.join(lines)
+        return RenderedPrompt(text, estimate_tokens(text), symbols, omitted, self._dates[-1], 0.0)
+
+
+def _price(value):
+    # 定点格式，与成交价一致（不用科学计数法）；不足 1 的价格保留 4 位有效数字
+    if value >= 1:
+        return f'{value:.2f}'
+    decimals = min(12, 3 - math.floor(math.log10(value)))
+    return f'{value:.{decimals}f}'.rstrip('0')
+
+
+def _pct(value):
+    return '-' if value is None else f'{value:+.2%}'
+
+
+_pipeline = FeaturePipeline()
+
+
+def get_feature_pipeline():
+    return _pipeline
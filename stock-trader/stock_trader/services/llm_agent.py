@@ -1,97 +1,464 @@
 import os
 import json
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+import gc
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from stock_trader.config import (
+    LLM_MODEL_NAME, LLM_MAX_BATCH_SIZE, LLM_BATCH_WAIT_SECONDS, LLM_MAX_QUEUE, LLM_REQUEST_TIMEOUT,
+    LLM_CACHE_TTL, LLM_CACHE_SIZE, LLM_CACHE_PATH, STATE_DB_PATH
+)
+from stock_trader.utils.cache import TTLCache, SharedCache, hash_key
+from stock_trader.utils.instrumentation import instrumented
 from stock_trader.utils.logger import log_llm_decision
+from stock_trader.services.decision_parser import DECISION_INSTRUCTIONS
+from stock_trader.services.market_history import get_market_store
+from stock_trader.services.feature_pipeline import get_feature_pipeline
 
-# 路径可根据实际情况调整
-MODEL_NAME = "Qwen/Qwen3-235B-A22B-Instruct-2507"
-MARKET_DATA_PATH = os.path.join(os.path.dirname(__file__), '../../market_data.csv')
+logger = logging.getLogger(__name__)
+
+# 模型名可通过环境变量 STOCKTRADER_LLM_MODEL 配置
+MODEL_NAME = LLM_MODEL_NAME
+GENERATION_PARAMS = {'max_new_tokens': 256}
 
 class LLMTraderAgent:
     def __init__(self, model_name=MODEL_NAME):
+        # transformers 导入需要数秒，只在真正加载模型时导入
+        from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
         self.tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
         self.model = AutoModelForCausalLM.from_pretrained(model_name, trust_remote_code=True, device_map="auto")
-        self.pipe = pipeline("text-generation", model=self.model, tokenizer=self.tokenizer, max_new_tokens=256)
+        # 批量生成需要左侧 padding
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = 'left'
+        self.pipe = pipeline("text-generation", model=self.model, tokenizer=self.tokenizer, **GENERATION_PARAMS)
+
+    def memory_footprint(self):
+        """模型参数和缓冲区占用的字节数。"""
+        if hasattr(self.model, 'get_memory_footprint'):
+            return self.model.get_memory_footprint()
+        return None
 
     def load_market_data(self):
-        import csv
-        if not os.path.exists(MARKET_DATA_PATH):
-            return []
-        with open(MARKET_DATA_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            return list(reader)
+        """返回最新快照的 (date, rows)，直接按索引读取，不扫描历史。"""
+        return get_market_store().latest_snapshot()
 
     def build_context(self):
-        data = self.load_market_data()
-        if not data:
-            return ""
-        # 只取最近一日期
-        latest_date = data[-1]['date']
-        latest_rows = [row for row in data if row['date'] == latest_date]
-        context = f"市场数据日期: {latest_date}\n"
-        for row in latest_rows:
-            context += f"{row['symbol']}: 价格={row['price']}, 波动={row['volatility']}, 成交量={row['volume']}\n"
-        return context
+        """最近若干快照的行情特征表，按 PROMPT_TOKEN_BUDGET 截断，同一快照内复用。"""
+        return get_feature_pipeline().render().text
 
-    def ask(self, user_question):
+    def build_prompt(self, user_question):
         context = self.build_context()
-        prompt = f"你是一个股票智能体。已知如下市场数据：\n{context}\n请根据这些数据回答：{user_question}"
-        result = self.pipe(prompt)
-        return result[0]['generated_text'].replace(prompt, '').strip()
+        return f"你是一个股票智能体。已知如下市场数据：\n{context}\n请根据这些数据回答：{user_question}"
+
+    def generate_batch(self, prompts):
+        """一次 pipeline 调用生成多个 prompt 的回答，返回与 prompts 等长的列表。"""
+        results = self.pipe(list(prompts), batch_size=len(prompts))
+        return [r[0]['generated_text'].replace(p, '').strip() for p, r in zip(prompts, results)]
+
+    def stream(self, prompt):
+        """逐段 yield 生成的文本（不含 prompt），生成在后台线程中进行。"""
+        from transformers import TextIteratorStreamer
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                        timeout=LLM_REQUEST_TIMEOUT)
+        errors = []
+
+        def generate():
+            try:
+                self.pipe(prompt, streamer=streamer)
+            except BaseException as e:
+                # 生成出错时 streamer 收不到结束信号，需手动结束，否则读取方会一直等到超时
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=generate, daemon=True)
+        thread.start()
+        for text in streamer:
+            if text:
+                yield text
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    def ask(self, user_question):
+        prompt = self.build_prompt(user_question)
+        return self.generate_batch([prompt])[0]
+
+
+class ModelRegistry:
+    """
+    进程内模型注册表：模型在首次使用（或启动预热）时加载一次，之后所有请求复用。
+    支持切换模型名、显式卸载，并记录加载耗时和内存占用供健康检查使用。
+    """
+
+    def __init__(self, model_name=MODEL_NAME, factory=None):
+        self.model_name = model_name
+        self.factory = factory or LLMTraderAgent
+        self._agent = None
+        self._lock = threading.Lock()
+        self._loading = False
+        self._load_seconds = None
+        self._loaded_at = None
+        self._error = None
+
+    def get_agent(self):
+        """返回已加载的 agent，未加载时在锁内加载（并发请求只加载一次）。"""
+        agent = self._agent
+        if agent is not None:
+            return agent
+        with self._lock:
+            if self._agent is None:
+                self._load()
+            return self._agent
+
+    def _load(self):
+        logger.info("[LLM] Loading model %s", self.model_name)
+        self._loading = True
+        start = time.perf_counter()
+        try:
+            self._agent = self.factory(self.model_name)
+            self._error = None
+        except Exception as e:
+            self._error = str(e)
+            raise
+        finally:
+            self._loading = False
+        self._load_seconds = time.perf_counter() - start
+        self._loaded_at = time.time()
+        logger.info("[LLM] Loaded model %s in %.1fs", self.model_name, self._load_seconds)
+
+    def warm_up(self, background=True):
+        """预热：提前加载模型。background=True 时在后台线程加载，不阻塞启动。"""
+        def _run():
+            try:
+                self.get_agent()
+            except Exception:
+                logger.exception("[LLM] Warm-up failed for %s", self.model_name)
+        if background:
+            threading.Thread(target=_run, name='llm-warmup', daemon=True).start()
+        else:
+            _run()
+
+    def unload(self):
+        """释放模型及其显存/内存。"""
+        with self._lock:
+            if self._agent is None:
+                return
+            self._agent = None
+            self._load_seconds = None
+            self._loaded_at = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        logger.info("[LLM] Unloaded model %s", self.model_name)
+
+    def set_model(self, model_name):
+        """切换模型名；已加载的旧模型会被卸载，新模型在下次使用时加载。"""
+        if model_name != self.model_name:
+            self.unload()
+            self.model_name = model_name
+
+    def status(self):
+        agent = self._agent
+        memory_bytes = None
+        if agent is not None and hasattr(agent, 'memory_footprint'):
+            try:
+                memory_bytes = agent.memory_footprint()
+            except Exception:
+                pass
+        return {
+            'model_name': self.model_name,
+            'loaded': agent is not None,
+            'loading': self._loading,
+            'load_seconds': self._load_seconds,
+            'loaded_at': self._loaded_at,
+            'memory_bytes': memory_bytes,
+            'process_max_rss_kb': _max_rss_kb(),
+            'error': self._error,
+        }
+
+
+def _max_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    return _registry
+
+
+class QueueFullError(RuntimeError):
+    """推理队列已满。"""
+
+
+class InferenceQueue:
+    """
+    有界推理队列：并发提交的 prompt 由单个后台线程合并成批（最多 max_batch_size 个，
+    最多等待 max_wait 秒凑批），一次调用 generate_batch，结果通过 Future 返回。
+    流式请求（stream）进入同一个队列，由同一线程单独执行 generate_stream，
+    因此模型任何时候只被一个线程使用。
+    队列满时立即拒绝，调用方超时后对应请求会被取消、不再进入后续批次。
+    """
+
+    def __init__(self, generate_batch, generate_stream=None, max_batch_size=LLM_MAX_BATCH_SIZE,
+                 max_wait=LLM_BATCH_WAIT_SECONDS, max_queue=LLM_MAX_QUEUE, timeout=LLM_REQUEST_TIMEOUT):
+        self.generate_batch = generate_batch
+        self.generate_stream = generate_stream
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._held = None  # 凑批时取到的流式请求，留到下一轮单独执行
+        self._worker = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.completed = 0
+
+    def submit(self, prompt, chunks=None):
+        """提交 prompt，返回 Future；队列满时抛出 QueueFullError。chunks 不为空时按流式请求执行。"""
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put_nowait((prompt, future, chunks))
+        except queue.Full:
+            raise QueueFullError(f"inference queue is full ({self._queue.maxsize})")
+        return future
+
+    def stream(self, prompt, timeout=None):
+        """
+        提交流式请求，返回逐段产出文本的生成器；排队和生成都计入同一个有界队列。
+        提交时队列满抛出 QueueFullError，timeout 秒内没有新文本时抛出 TimeoutError。
+        """
+        chunks = queue.Queue()
+        future = self.submit(prompt, chunks)
+        return self._iter_chunks(chunks, future, timeout or self.timeout)
+
+    def _iter_chunks(self, chunks, future, timeout):
+        try:
+            while True:
+                try:
+                    text = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError("inference request timed out")
+                if text is None:
+                    break
+                yield text
+            future.result()  # 生成出错时抛出原异常
+        finally:
+            future.cancel()  # 调用方提前放弃时，尚未开始的请求不再执行
+
+    def generate(self, prompt, timeout=None):
+        """提交并等待结果；超时抛出 TimeoutError。"""
+        future = self.submit(prompt)
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError("inference request timed out")
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='llm-inference', daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        if self._held is not None:
+            batch, self._held = [self._held], None
+        else:
+            batch = [self._queue.get()]
+        if batch[0][2] is None:
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item[2] is not None:
+                    self._held = item  # 流式请求不与批量请求合并
+                    break
+                batch.append(item)
+        # 跳过调用方已放弃（超时取消）的请求
+        return [item for item in batch if item[1].set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            if batch[0][2] is not None:
+                self._run_stream(*batch[0])
+                continue
+            try:
+                outputs = self.generate_batch([prompt for prompt, _, _ in batch])
+                for (_, future, _), output in zip(batch, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                logger.exception("[LLM] Batch generation failed")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batches += 1
+            self.completed += len(batch)
+
+    def _run_stream(self, prompt, future, chunks):
+        # 即使调用方已断开也要把生成跑完，保证模型不会与下一批并发执行
+        try:
+            parts = []
+            for text in self.generate_stream(prompt):
+                parts.append(text)
+                chunks.put(text)
+            future.set_result(''.join(parts))
+        except Exception as e:
+            logger.exception("[LLM] Stream generation failed")
+            future.set_exception(e)
+        finally:
+            chunks.put(None)
+        self.completed += 1
+
+
+_inference_queue = InferenceQueue(lambda prompts: get_model_registry().get_agent().generate_batch(prompts),
+                                  lambda prompt: get_model_registry().get_agent().stream(prompt))
+
+
+def get_inference_queue():
+    return _inference_queue
+
+
+# 默认存放在共享状态库中，多个 worker 共用一份分析结果；设置 LLM_CACHE_PATH 时改用进程内缓存 + JSON 文件
+if LLM_CACHE_PATH:
+    _response_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, path=LLM_CACHE_PATH)
+else:
+    _response_cache = SharedCache(STATE_DB_PATH, 'llm_response', maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+
+
+def get_response_cache():
+    return _response_cache
+
+
+@instrumented('llm')
+def _generate_answer(user_question):
+    agent = get_model_registry().get_agent()
+    llm_answer = get_inference_queue().generate(agent.build_prompt(user_question))
+    log_llm_decision(user_question, llm_answer)
+    return llm_answer
 
 
 def llm_analyze_question(user_question):
     """
     统一入口：处理用户问题，返回大模型分析结果。
+    模型按进程复用；并发请求经推理队列合并成批生成。
     """
     try:
-        agent = LLMTraderAgent()
-        llm_answer = agent.ask(user_question)
-        log_llm_decision(user_question, llm_answer)
-        return llm_answer
+        return _generate_answer(user_question)
+    except QueueFullError:
+        return "模型繁忙，请稍后再试。"
+    except TimeoutError:
+        return "模型推理超时，请稍后再试。"
     except Exception as e:
         return f"模型推理出错: {e}"
 
-# 自动智能分析，无需用户输入Prompt
-def auto_llm_analysis():
+def _auto_analysis_prompt():
     """
-    自动读取最新market_data.json，调用大模型生成格式化分析建议。
-    返回如：建议买入AAPL，xx天后出售，预计升值xxx
+    构造自动分析 prompt。行情数据由 build_prompt 附上的特征表（build_context）提供，这里只写要求，
+    避免同一份数据在 prompt 中出现两次。
+    返回 (prompt, cache_key, error)；读取失败或无数据时 prompt 为 None、error 为提示信息。
     """
-    import csv
-    market_data_path = MARKET_DATA_PATH
     try:
-        with open(market_data_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-        if not rows:
-            return "暂无市场数据，无法分析。"
-        # 取最近一条
-        latest_row = rows[-1]
-        latest_date = latest_row['date']
-        # 收集最近5天的日期
-        last_dates = [row['date'] for row in rows[-5:]]
-        # 收集最新日期的所有symbol数据
-        latest_symbols = [row for row in rows if row['date'] == latest_date]
-        latest_data_str = '\n'.join([
-            f"{r['symbol']}: 价格={r['price']}, 波动={r['volatility']}, 成交量={r['volume']}" for r in latest_symbols
-        ])
+        rendered = get_feature_pipeline().render()
     except Exception as e:
-        return f"读取市场数据失败: {e}"
+        return None, None, f"读取市场数据失败: {e}"
+    if not rendered.symbols:
+        return None, None, "暂无市场数据，无法分析。"
 
     prompt = (
-        "请根据以下最新市场数据和历史数据，自动分析并给出一个格式化建议，格式如："
+        "请根据以上市场数据（最新价格及区间涨跌、波动率和成交量异动），自动分析并给出一个格式化建议，格式如："
         "建议买入AAPL，xx天后出售，预计升值xxx。只输出建议，不要解释。\n"
-        f"最新数据:\n{latest_data_str}\n"
-        f"历史日期: {last_dates}"
+        # 自动交易按 JSON 中的意图下单（decision_parser），不必从自然语言中猜测
+        f"{DECISION_INSTRUCTIONS}"
     )
+    cache_key = hash_key(prompt, rendered.date, rendered.text, get_model_registry().model_name, GENERATION_PARAMS)
+    return prompt, cache_key, None
 
+
+# 自动智能分析，无需用户输入Prompt
+def auto_llm_analysis():
+    """
+    基于行情历史最近若干快照的特征表（见 build_context），调用大模型生成格式化分析建议。
+    返回如：建议买入AAPL，xx天后出售，预计升值xxx
+    """
+    prompt, cache_key, error = _auto_analysis_prompt()
+    if error:
+        return error
+    # 行情快照没有变化时直接返回缓存的分析结果
+    cached = _response_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        answer = llm_analyze_question(prompt)
-        return answer.strip()
+        answer = _generate_answer(prompt).strip()
+    except QueueFullError:
+        return "模型繁忙，请稍后再试。"
+    except TimeoutError:
+        return "模型推理超时，请稍后再试。"
     except Exception as e:
         return f"模型分析失败: {e}"
+    _response_cache.set(cache_key, answer)
+    return answer
+
+
+def stream_auto_llm_analysis():
+    """
+    流式版本的 auto_llm_analysis：逐段 yield 生成的文本。
+    缓存命中时一次性 yield 完整结果；生成完成后写入缓存。出错时 yield 错误信息。
+    """
+    prompt, cache_key, error = _auto_analysis_prompt()
+    if error:
+        yield error
+        return
+    cached = _response_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    try:
+        agent = get_model_registry().get_agent()
+        # 与批量生成共用推理队列：流在队列线程中执行，不会额外并发占用模型
+        for text in get_inference_queue().stream(agent.build_prompt(prompt)):
+            chunks.append(text)
+            yield text
+    except QueueFullError:
+        yield "模型繁忙，请稍后再试。"
+        return
+    except TimeoutError:
+        yield "模型推理超时，请稍后再试。"
+        return
+    except Exception as e:
+        yield f"模型分析失败: {e}"
+        return
+    answer = ''.join(chunks).strip()
+    log_llm_decision(prompt, answer)
+    _response_cache.set(cache_key, answer)
+
+
 # 用法示例：
-# agent = LLMTraderAgent()
+# agent = get_model_registry().get_agent()
 # answer = agent.ask("当前哪只股票有短期盈利潜力？")
 # print(answer)
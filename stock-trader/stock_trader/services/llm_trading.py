@@ -1,13 +1,13 @@
 import logging
 import json
-from flask import session, flash
 
-from stock_trader.data import get_stock_price
-from stock_trader.services.trade_service import record_trade
+from stock_trader.services.order_queue import get_order_queue
+from stock_trader.services.trading_executor import llm_order_key
 
 def llm_auto_trade(market_rows, position_rows, cash_balance):
     """
-    Handles LLM-based auto-trading logic. Returns a tuple (success, message).
+    Handles LLM-based auto-trading logic: a valid suggestion is submitted to the
+    order queue and executed by its worker. Returns a tuple (success, message).
     """
     try:
         llm_prompt = trading_prompt(market_rows, position_rows, cash_balance)
@@ -23,18 +23,16 @@ def llm_auto_trade(market_rows, position_rows, cash_balance):
         action = advice.get("action", "").capitalize()
         symbol = advice.get("symbol", "")
         quantity = int(advice.get("quantity", 0))
-        valid_symbols = [row["Symbol"] for row in market_rows]
+        valid_symbols = {row["Symbol"] for row in market_rows}
         if action in ["Buy", "Sell"] and symbol in valid_symbols and quantity > 0:
-            last_trade = session.get("last_llm_trade")
-            trade_key = f"{action}:{symbol}:{quantity}"
-            if last_trade != trade_key:
-                price = get_stock_price(symbol)
-                record_trade(symbol, action, quantity, price)
-                session["last_llm_trade"] = trade_key
-                flash(f"[LLM] {action} {quantity} {symbol} @ ${price} executed.", "success")
-                return True, f"[LLM] {action} {quantity} {symbol} @ ${price} executed."
+            # 幂等键在所有 worker 间去重：同一 (action, symbol, quantity) 在窗口期内只提交一个订单
+            order_id, created = get_order_queue().submit(symbol, action, quantity,
+                                                         idempotency_key=llm_order_key(action, symbol, quantity),
+                                                         source='llm', reason='LLM auto-trade')
+            if created:
+                return True, f"[LLM] {action} {quantity} {symbol} submitted as order #{order_id}."
+            return False, f"[LLM] {action} {quantity} {symbol} already submitted as order #{order_id}."
         return False, "No valid LLM trade executed."
     except Exception as e:
         logging.exception("[LLM] Auto-trading error")
-        flash(f"[LLM] Auto-trading error: {e}", "danger")
         return False, f"[LLM] Auto-trading error: {e}"
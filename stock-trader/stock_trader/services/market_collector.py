@@ -0,0 +1,163 @@
+import calendar
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有文件锁，每个进程各自采集
+    fcntl = None
+
+from stock_trader.config import MARKET_COLLECT_INTERVAL, COLLECTOR_LOCK_PATH
+from stock_trader.services.event_bus import publish_ticks
+from stock_trader.services.market_history import get_market_store
+from stock_trader.utils.market import get_symbols
+from stock_trader.utils.market_data import fetch_market_data
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataCollector:
+    """
+    后台行情采集器：按固定间隔抓取一次行情快照并写入市场数据存储。
+    同一间隔内只写一次（按时间桶去重），所有写操作都经过这里，仪表盘只读取最新快照。
+
+    给出 lock_path 时，多个 worker 进程中只有拿到该文件锁的一个真正采集；
+    其余进程的 latest_snapshot() 从行情存储读取最新快照（短时间缓存）。
+    on_snapshot(data) 在每次写入快照后调用（用于向仪表盘推送价格）。
+    """
+
+    def __init__(self, interval=MARKET_COLLECT_INTERVAL, symbols=get_symbols,
+                 fetcher=fetch_market_data, writer=None, clock=time.time, lock_path=None, reader=None,
+                 on_snapshot=None):
+        self.interval = interval
+        self.symbols = symbols
+        self.fetcher = fetcher
+        self.writer = writer or (lambda data: get_market_store().append_snapshot(data))
+        self.clock = clock
+        self.on_snapshot = on_snapshot
+        self._latest = None
+        self._latest_at = None
+        self._last_bucket = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.lock_path = lock_path
+        self.reader = reader or _read_latest_from_store
+        self._lock_file = None
+        self._next_lock_attempt = 0.0
+        self._shared = (None, None)
+        self._shared_read_at = None
+
+    def collect_once(self):
+        """抓取并写入一次快照；若当前时间桶已写过则跳过。返回是否写入。"""
+        bucket = int(self.clock() // self.interval)
+        with self._lock:
+            if bucket == self._last_bucket:
+                return False
+            try:
+                data = self.fetcher(self.symbols())
+            except Exception:
+                logger.exception("[Collector] Failed to fetch market data")
+                return False
+            data = {symbol: info for symbol, info in data.items() if info.get('price') is not None}
+            if not data:
+                return False
+            self.writer(data)
+            self._latest = data
+            self._latest_at = self.clock()
+            self._last_bucket = bucket
+        if self.on_snapshot is not None:
+            try:
+                self.on_snapshot(data)
+            except Exception:
+                logger.exception("[Collector] Snapshot callback failed")
+        return True
+
+    def latest_snapshot(self):
+        """
+        返回 (snapshot, collected_at)；尚未采集时为 (None, None)。
+        本进程没有在采集（另一个 worker 持有采集锁）时，从行情存储读取。
+        """
+        if self._latest is not None or not self.lock_path:
+            return self._latest, self._latest_at
+        now = self.clock()
+        if self._shared_read_at is None or now - self._shared_read_at >= min(self.interval, 5):
+            try:
+                self._shared = self.reader()
+            except Exception:
+                logger.exception("[Collector] Failed to read the latest snapshot")
+            self._shared_read_at = now
+        return self._shared
+
+    @property
+    def is_leader(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _acquire_lock(self):
+        """非阻塞地获取采集锁；持有锁的进程退出时锁自动释放。"""
+        if not self.lock_path or fcntl is None:
+            return True
+        if self._lock_file is not None:
+            return True
+        now = self.clock()
+        if now < self._next_lock_attempt:
+            return False
+        # 每个间隔最多尝试一次，持锁进程退出后由其它进程接管
+        self._next_lock_attempt = now + self.interval
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        if not self._acquire_lock():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='market-data-collector', daemon=True)
+        self._thread.start()
+        logger.info("[Collector] Started with interval=%ss", self.interval)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # 关闭即释放 flock
+            self._lock_file = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.collect_once()
+            self._stop.wait(self.interval)
+
+
+def _read_latest_from_store():
+    date, rows = get_market_store().latest_snapshot()
+    if date is None:
+        return None, None
+    data = {row['symbol']: row for row in rows if row.get('price') is not None}
+    # 快照日期为 UTC 的 '%Y-%m-%d %H:%M:%S'
+    return data or None, calendar.timegm(time.strptime(date, '%Y-%m-%d %H:%M:%S'))
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def get_market_collector():
+    """进程内唯一的采集器实例。"""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = MarketDataCollector(lock_path=COLLECTOR_LOCK_PATH, on_snapshot=publish_ticks)
+        return _collector
@@ -0,0 +1,177 @@
+import csv
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from stock_trader.config import MARKET_DB_PATH
+from stock_trader.services.db import get_connection
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('date', 'symbol', 'price', 'volatility', 'volume', 'timestamp')
+
+
+class MarketHistoryStore:
+    """
+    行情历史存储（SQLite）。每行对应一个快照中的一个 symbol：
+    date 为快照时间（同一快照内相同），timestamp 为该 symbol 的抓取时间。
+    (date, symbol) 唯一，按 (symbol, timestamp) 和 date 建索引，
+    取最新快照、按区间查询、取末尾 n 行都不需要扫描全表。
+    """
+
+    def __init__(self, db_path=MARKET_DB_PATH):
+        self.db_path = db_path
+
+    def _connect(self):
+        conn = get_connection(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init(self, migrate_from=None):
+        """建表建索引；表为空且给出旧 CSV/JSON 文件时，先做一次性迁移。"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS market_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                price REAL,
+                volatility REAL,
+                volume INTEGER,
+                timestamp TEXT,
+                UNIQUE (date, symbol)
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_market_symbol_ts ON market_history (symbol, timestamp)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_market_date ON market_history (date)')
+            empty = conn.execute('SELECT 1 FROM market_history LIMIT 1').fetchone() is None
+        if empty and migrate_from and os.path.exists(migrate_from):
+            count = self.migrate(migrate_from)
+            logger.info("[Market] Migrated %d rows from %s", count, migrate_from)
+
+    def append_snapshot(self, data, date_str=None):
+        """
+        写入一次快照。data: {symbol: {'price', 'volatility', 'volume', 'timestamp'}}。
+        同一 (date, symbol) 重复写入会被忽略。返回写入行数。
+        """
+        date_str = date_str or datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [
+            {'date': date_str, 'symbol': symbol, **{k: info.get(k) for k in ('price', 'volatility', 'volume', 'timestamp')}}
+            for symbol, info in data.items()
+        ]
+        return self.insert_rows(rows)
+
+    def insert_rows(self, rows):
+        """批量写入行（dict，键同 COLUMNS）。返回实际写入行数。"""
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO market_history (date, symbol, price, volatility, volume, timestamp) '
+                'VALUES (:date, :symbol, :price, :volatility, :volume, :timestamp)',
+                [{k: _clean(row.get(k)) for k in COLUMNS} for row in rows]
+            )
+            return conn.total_changes - before
+
+    def latest_snapshot(self):
+        """返回最新快照的 (date, rows)；无数据时为 (None, [])。"""
+        with self._connect() as conn:
+            latest = conn.execute('SELECT MAX(date) FROM market_history').fetchone()[0]
+            if latest is None:
+                return None, []
+            rows = conn.execute(
+                'SELECT date, symbol, price, volatility, volume, timestamp FROM market_history WHERE date = ? ORDER BY id',
+                (latest,)
+            ).fetchall()
+        return latest, [dict(row) for row in rows]
+
+    def range(self, symbol, start=None, end=None):
+        """返回 symbol 在 [start, end] 内的行（按 timestamp 升序）。start/end 可为 datetime 或 ISO 字符串。"""
+        sql = 'SELECT date, symbol, price, volatility, volume, timestamp FROM market_history WHERE symbol = ?'
+        params = [symbol]
+        if start is not None:
+            sql += ' AND timestamp >= ?'
+            params.append(_iso(start))
+        if end is not None:
+            sql += ' AND timestamp <= ?'
+            params.append(_iso(end))
+        with self._connect() as conn:
+            rows = conn.execute(sql + ' ORDER BY timestamp', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def tail(self, n):
+        """返回最后写入的 n 行（按写入顺序）。"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT date, symbol, price, volatility, volume, timestamp FROM market_history ORDER BY id DESC LIMIT ?',
+                (n,)
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def recent_dates(self, n):
+        """返回最近 n 个快照日期（升序）。"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT DISTINCT date FROM market_history ORDER BY date DESC LIMIT ?', (n,)).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def iter_snapshots(self, start=None, end=None):
+        """
+        按时间顺序逐个产出快照 (date, {symbol: price})，只含有价格的行。
+        游标流式读取，不把整段历史载入内存。
+        """
+        for date, rows in groupby(self._snapshot_cursor('price', start, end), key=itemgetter(0)):
+            yield date, {row[1]: row[2] for row in rows}
+
+    def iter_snapshot_rows(self, start=None, end=None):
+        """同 iter_snapshots，但每个 symbol 为 (price, volatility, volume)。"""
+        for date, rows in groupby(self._snapshot_cursor('price, volatility, volume', start, end), key=itemgetter(0)):
+            yield date, {row[1]: tuple(row[2:]) for row in rows}
+
+    def _snapshot_cursor(self, columns, start, end):
+        sql = f'SELECT date, symbol, {columns} FROM market_history WHERE price IS NOT NULL'
+        params = []
+        if start is not None:
+            sql += ' AND date >= ?'
+            params.append(_iso(start))
+        if end is not None:
+            sql += ' AND date <= ?'
+            params.append(_iso(end))
+        return self._connect().execute(sql + ' ORDER BY date, id', params)
+
+    def migrate(self, path):
+        """从旧的 market_data.csv / market_data.json 导入。"""
+        return self.insert_rows(read_rows(path))
+
+
+def read_rows(path):
+    """读取旧的 market_data.csv / market_data.json 为行 dict 列表。JSON 支持行列表或 {date: {symbol: info}}；内容为 CSV 也可。"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return list(csv.DictReader(text.splitlines()))
+    if isinstance(payload, dict):
+        return [
+            {'date': date, 'symbol': symbol, **info}
+            for date, snapshot in payload.items() for symbol, info in snapshot.items()
+        ]
+    return payload
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _clean(value):
+    # CSV 中的空字段按缺失处理
+    return None if value == '' else value
+
+
+_store = MarketHistoryStore()
+
+
+def get_market_store():
+    return _store
@@ -0,0 +1,320 @@
+"""
+订单队列：策略和大模型建议只提交订单，由后台 worker 批量取价、成交。
+
+订单按事件溯源方式保存在交易库中：order_events 表按顺序记录每个订单的
+submitted / claimed / filled / rejected / failed 事件，orders 表是这些事件折叠出的当前状态，
+两者总在同一事务内更新。submit() 写入一行即返回订单 id，HTTP 请求不再等待取价和写库。
+
+每个订单带唯一的幂等键：同一键重复提交只返回已有订单，不会重复成交。
+worker 先在短事务中认领一批待成交订单（带租约，认领者退出后超时归还队列），
+再一次批量取价，最后经 record_trades 把成交、订单状态和事件写入同一个事务，
+因此多个进程同时运行 worker 时，每个订单也只成交一次。
+批内有订单已被其他 worker 接管时，只用仍归本 worker 的订单重试；写库失败（如数据库被锁）时
+订单放回队列（released 事件），累计 max_attempts 次失败后才记为 failed。
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from stock_trader.config import ORDER_BATCH_SIZE, ORDER_POLL_INTERVAL, ORDER_CLAIM_TIMEOUT, ORDER_MAX_ATTEMPTS
+from stock_trader.data import get_stock_prices
+from stock_trader.services import trade_service
+from stock_trader.services.db import get_connection, transaction
+from stock_trader.utils.logger import log_trade_action
+
+logger = logging.getLogger(__name__)
+
+PENDING, CLAIMED, FILLED, REJECTED, FAILED = 'pending', 'claimed', 'filled', 'rejected', 'failed'
+SIDES = ('Buy', 'Sell')
+
+_ORDER_COLUMNS = ('id', 'idempotency_key', 'symbol', 'side', 'quantity', 'source', 'reason', 'status',
+                  'trade_id', 'price', 'error', 'attempts', 'created_at', 'updated_at')
+
+
+class OrderConflictError(RuntimeError):
+    """认领租约已过期，订单已被其他 worker 重新认领。"""
+
+
+class OrderQueue:
+    def __init__(self, db_path=None, batch_size=ORDER_BATCH_SIZE, poll_interval=ORDER_POLL_INTERVAL,
+                 claim_timeout=ORDER_CLAIM_TIMEOUT, max_attempts=ORDER_MAX_ATTEMPTS, clock=time.time):
+        # None 表示实时交易库（trade_service.DB_NAME），成交会通知成交监听器并推送到仪表盘
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._initialized = set()
+        self._init_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.batches = 0
+        self.filled = 0
+        self.released = 0
+
+    def _path(self):
+        return self.db_path or trade_service.DB_NAME
+
+    def _connect(self):
+        path = self._path()
+        conn = get_connection(path)
+        if path not in self._initialized:
+            with self._init_lock:
+                if path not in self._initialized:
+                    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                    with conn:
+                        conn.execute('''CREATE TABLE IF NOT EXISTS orders (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            idempotency_key TEXT NOT NULL UNIQUE,
+                            symbol TEXT NOT NULL,
+                            side TEXT NOT NULL,
+                            quantity INTEGER NOT NULL,
+                            source TEXT,
+                            reason TEXT,
+                            status TEXT NOT NULL,
+                            claim_token TEXT,
+                            claimed_at REAL,
+                            trade_id INTEGER,
+                            price REAL,
+                            error TEXT,
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            created_at REAL NOT NULL,
+                            updated_at REAL NOT NULL
+                        )''')
+                        conn.execute('''CREATE TABLE IF NOT EXISTS order_events (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            order_id INTEGER NOT NULL,
+                            type TEXT NOT NULL,
+                            data TEXT NOT NULL,
+                            created_at REAL NOT NULL
+                        )''')
+                        columns = {row[1] for row in conn.execute('PRAGMA table_info(orders)')}
+                        if 'attempts' not in columns:
+                            conn.execute('ALTER TABLE orders ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+                        conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, id)')
+                        conn.execute('CREATE INDEX IF NOT EXISTS idx_order_events_order ON order_events (order_id, id)')
+                    self._initialized.add(path)
+        return conn
+
+    @staticmethod
+    def _append_event(c, order_id, event_type, data, now):
+        c.execute('INSERT INTO order_events (order_id, type, data, created_at) VALUES (?, ?, ?, ?)',
+                  (order_id, event_type, json.dumps(data, ensure_ascii=False), now))
+
+    def submit(self, symbol, side, quantity, idempotency_key=None, source=None, reason=None):
+        """
+        提交订单，立即返回 (order_id, created)。idempotency_key 已存在时不新建订单，
+        返回已有订单的 id 和 created=False；不给出时每次提交都是新订单。
+        """
+        if side not in SIDES:
+            raise ValueError(f"side must be one of {SIDES}, got {side!r}")
+        if int(quantity) <= 0:
+            raise ValueError(f"quantity must be positive, got {quantity!r}")
+        key = idempotency_key or uuid.uuid4().hex
+        now = self.clock()
+        conn = self._connect()
+        with conn:
+            c = conn.cursor()
+            c.execute('INSERT OR IGNORE INTO orders (idempotency_key, symbol, side, quantity, source, reason, status, '
+                      'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                      (key, symbol, side, int(quantity), source, reason, PENDING, now, now))
+            created = c.rowcount == 1
+            if created:
+                order_id = c.lastrowid
+                self._append_event(c, order_id, 'submitted',
+                                   {'idempotency_key': key, 'symbol': symbol, 'side': side,
+                                    'quantity': int(quantity), 'source': source, 'reason': reason}, now)
+            else:
+                order_id = c.execute('SELECT id FROM orders WHERE idempotency_key = ?', (key,)).fetchone()[0]
+        if created:
+            self._wake.set()
+        return order_id, created
+
+    def get_order(self, order_id):
+        """返回订单当前状态 dict，不存在时返回 None。"""
+        row = self._connect().execute(f'SELECT {", ".join(_ORDER_COLUMNS)} FROM orders WHERE id = ?',
+                                      (order_id,)).fetchone()
+        return dict(zip(_ORDER_COLUMNS, row)) if row else None
+
+    def get_events(self, order_id):
+        """返回订单的事件列表 [{'type', 'data', 'created_at'}]，按发生顺序。"""
+        rows = self._connect().execute('SELECT type, data, created_at FROM order_events WHERE order_id = ? ORDER BY id',
+                                       (order_id,)).fetchall()
+        return [{'type': type_, 'data': json.loads(data), 'created_at': created_at} for type_, data, created_at in rows]
+
+    def counts(self):
+        """各状态的订单数，如 {'pending': 3, 'filled': 120}。"""
+        return dict(self._connect().execute('SELECT status, COUNT(*) FROM orders GROUP BY status').fetchall())
+
+    def depth(self):
+        """等待成交（未认领或已认领未完成）的订单数。"""
+        return self._connect().execute('SELECT COUNT(*) FROM orders WHERE status IN (?, ?)',
+                                       (PENDING, CLAIMED)).fetchone()[0]
+
+    def _claim(self):
+        """认领至多 batch_size 个待成交订单（含租约过期的），返回 (token, [order dict])。"""
+        now = self.clock()
+        token = uuid.uuid4().hex
+        stale = now - self.claim_timeout
+        conn = self._connect()
+        with conn:
+            c = conn.cursor()
+            ids = [row[0] for row in c.execute(
+                'SELECT id FROM orders WHERE status = ? OR (status = ? AND claimed_at < ?) ORDER BY id LIMIT ?',
+                (PENDING, CLAIMED, stale, self.batch_size))]
+            if not ids:
+                return token, []
+            placeholders = ', '.join('?' * len(ids))
+            # 在写事务中重新检查状态：其他进程刚认领的订单不会被重复认领
+            c.execute(f'UPDATE orders SET status = ?, claim_token = ?, claimed_at = ?, updated_at = ? '
+                      f'WHERE id IN ({placeholders}) AND (status = ? OR (status = ? AND claimed_at < ?))',
+                      (CLAIMED, token, now, now, *ids, PENDING, CLAIMED, stale))
+            rows = c.execute(f'SELECT {", ".join(_ORDER_COLUMNS)} FROM orders WHERE claim_token = ? ORDER BY id',
+                             (token,)).fetchall()
+            for row in rows:
+                self._append_event(c, row[0], 'claimed', {'token': token}, now)
+        return token, [dict(zip(_ORDER_COLUMNS, row)) for row in rows]
+
+    def _settle(self, c, order, token, status, now, **fields):
+        """把仍由 token 认领的订单置为终态并追加对应事件；租约已被他人接管时抛出 OrderConflictError。"""
+        c.execute('UPDATE orders SET status = ?, trade_id = ?, price = ?, error = ?, updated_at = ? '
+                  'WHERE id = ? AND status = ? AND claim_token = ?',
+                  (status, fields.get('trade_id'), fields.get('price'), fields.get('error'), now,
+                   order['id'], CLAIMED, token))
+        if c.rowcount != 1:
+            raise OrderConflictError(f"order {order['id']} is no longer claimed by this worker")
+        self._append_event(c, order['id'], status, fields, now)
+
+    def _execute(self, token, orders):
+        """批量取价并成交已认领的订单；取不到价格的订单被拒绝。返回结束的订单数。"""
+        prices = get_stock_prices(sorted({order['symbol'] for order in orders}))
+        fillable = [order for order in orders if prices.get(order['symbol']) is not None]
+        unpriced = [order for order in orders if prices.get(order['symbol']) is None]
+        settled = 0
+        if fillable:
+            settled += self._fill(token, fillable, prices)
+        if unpriced:
+            settled += self._finish(token, unpriced, REJECTED, error='no price')
+        self.batches += 1
+        return settled
+
+    def _fill(self, token, orders, prices):
+        """
+        在一个事务中成交 orders。有订单已被其他 worker 接管时整批回滚，只用仍归本 worker 的订单重试；
+        其他写入失败时把订单放回队列。返回成交或失败结束的订单数。
+        """
+        while orders:
+            def before_commit(c, trade_ids, orders=orders):
+                now = self.clock()
+                for order, trade_id in zip(orders, trade_ids):
+                    self._settle(c, order, token, FILLED, now, trade_id=trade_id, price=prices[order['symbol']])
+
+            batch = [(o['symbol'], o['side'], o['quantity'], prices[o['symbol']]) for o in orders]
+            if trade_service.record_trades(batch, db_path=self.db_path, before_commit=before_commit):
+                for order in orders:
+                    log_trade_action(order['side'], order['symbol'], order['quantity'], prices[order['symbol']],
+                                     reason=order['reason'] or f"order #{order['id']}")
+                self.filled += len(orders)
+                return len(orders)
+            owned = self._owned(token, orders)
+            if len(owned) == len(orders):
+                return self._release(token, orders, error='failed to record trades')
+            orders = owned
+        return 0
+
+    def _owned(self, token, orders):
+        """orders 中仍由 token 认领的订单。"""
+        placeholders = ', '.join('?' * len(orders))
+        ids = {row[0] for row in self._connect().execute(
+            f'SELECT id FROM orders WHERE claim_token = ? AND status = ? AND id IN ({placeholders})',
+            (token, CLAIMED, *[order['id'] for order in orders]))}
+        return [order for order in orders if order['id'] in ids]
+
+    def _release(self, token, orders, error):
+        """写库失败：把订单放回队列，失败次数达到 max_attempts 的记为 failed。返回记为 failed 的订单数。"""
+        now = self.clock()
+        failed = 0
+        with transaction(self._path()) as conn:
+            c = conn.cursor()
+            for order in orders:
+                attempts = order['attempts'] + 1
+                if attempts >= self.max_attempts:
+                    try:
+                        self._settle(c, order, token, FAILED, now, error=error, attempts=attempts)
+                        c.execute('UPDATE orders SET attempts = ? WHERE id = ?', (attempts, order['id']))
+                        failed += 1
+                    except OrderConflictError:
+                        pass
+                    continue
+                c.execute('UPDATE orders SET status = ?, claim_token = NULL, claimed_at = NULL, attempts = ?, '
+                          'error = ?, updated_at = ? WHERE id = ? AND status = ? AND claim_token = ?',
+                          (PENDING, attempts, error, now, order['id'], CLAIMED, token))
+                if c.rowcount == 1:
+                    self._append_event(c, order['id'], 'released', {'attempts': attempts, 'error': error}, now)
+        self.released += len(orders) - failed
+        logger.warning("[Orders] %d order(s) not recorded (%s): %d returned to the queue, %d failed",
+                       len(orders), error, len(orders) - failed, failed)
+        return failed
+
+    def _finish(self, token, orders, status, **fields):
+        now = self.clock()
+        finished = 0
+        with transaction(self._path()) as conn:
+            c = conn.cursor()
+            for order in orders:
+                try:
+                    self._settle(c, order, token, status, now, **fields)
+                    finished += 1
+                except OrderConflictError:
+                    pass
+        for order in orders:
+            logger.warning("[Orders] Order #%s %s %s %s %s: %s", order['id'], order['side'], order['quantity'],
+                           order['symbol'], status, fields.get('error'))
+        return finished
+
+    def process_once(self):
+        """认领并执行一批订单，返回本批认领的订单数（0 表示队列为空）。"""
+        token, orders = self._claim()
+        if orders:
+            self._execute(token, orders)
+        return len(orders)
+
+    def start(self):
+        """启动本进程的后台 worker（幂等）。启动后会先执行重启前遗留的待成交订单。"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='order-worker', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # 突发提交时连续执行，直到队列为空再等待；有订单因写库失败放回队列时先等待再重试
+                released = self.released
+                if self.process_once() and self.released == released:
+                    continue
+            except Exception:
+                logger.exception("[Orders] Order batch failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+_order_queue = OrderQueue()
+
+
+def get_order_queue():
+    return _order_queue
@@ -0,0 +1,232 @@
+"""
+组合风险指标：基于行情历史的最近 window 个快照和持仓台账，计算各 symbol 的区间收益、
+滚动波动率，以及按当前持仓加权的组合收益、波动率、Sharpe、最大回撤和持仓间的收益相关系数。
+
+增量更新：价格和单期收益保存在 numpy 环形缓冲区中（每个 symbol 一列），每个新快照只写入一行，
+并增减各列收益的累计和/平方和，波动率直接由累计量得到，不重新读取或重算整段历史。
+快照中缺少价格的 symbol 沿用上一价格（该期收益为 0）。
+每个进程在请求时从行情库拉取新增快照，因此非采集进程的结果同样是最新的；
+报告按 (最新快照, 持仓) 缓存，同一快照内的仪表盘请求直接命中。
+"""
+import threading
+from collections import deque
+
+import numpy as np
+
+from stock_trader.config import RISK_WINDOW, RISK_PERIODS_PER_YEAR, RISK_MAX_SYMBOLS
+from stock_trader.services.market_history import get_market_store
+from stock_trader.utils.cache import TTLCache, hash_key
+from stock_trader.utils.instrumentation import instrumented
+
+
+class RiskAnalytics:
+    def __init__(self, store=None, window=RISK_WINDOW, periods_per_year=RISK_PERIODS_PER_YEAR,
+                 max_symbols=RISK_MAX_SYMBOLS):
+        self.store = store  # None 表示 get_market_store()
+        self.window = window
+        self.periods_per_year = periods_per_year
+        self.max_symbols = max_symbols
+        self._columns = {}                           # symbol -> 列号
+        self._prices = np.full((window + 1, 0), np.nan)  # 最近 window+1 个快照的价格（环形）
+        self._returns = np.full((window, 0), np.nan)     # 最近 window 期收益（环形）
+        self._last = np.full(0, np.nan)              # 各 symbol 最新价格
+        self._sum = np.zeros(0)
+        self._sumsq = np.zeros(0)
+        self._count = np.zeros(0)
+        self._dates = deque(maxlen=window + 1)
+        self._n = 0                                  # 已写入的快照数
+        self._lock = threading.RLock()
+        self._cache = TTLCache(maxsize=16)
+
+    # ---- 增量写入 ----
+
+    def _grow(self, symbols):
+        new = [s for s in symbols if s not in self._columns]
+        if not new:
+            return
+        for symbol in new:
+            self._columns[symbol] = len(self._columns)
+        pad = len(new)
+        self._prices = np.hstack([self._prices, np.full((self._prices.shape[0], pad), np.nan)])
+        self._returns = np.hstack([self._returns, np.full((self._returns.shape[0], pad), np.nan)])
+        self._last = np.concatenate([self._last, np.full(pad, np.nan)])
+        self._sum = np.concatenate([self._sum, np.zeros(pad)])
+        self._sumsq = np.concatenate([self._sumsq, np.zeros(pad)])
+        self._count = np.concatenate([self._count, np.zeros(pad)])
+
+    def add_snapshot(self, date, prices):
+        """写入一个快照 {symbol: price}（须按时间顺序）。耗时与 symbol 数成正比，与历史长度无关。"""
+        with self._lock:
+            valid = {s: p for s, p in prices.items() if p is not None and p > 0}
+            self._grow(valid)
+            current = self._last.copy()
+            if valid:
+                current[[self._columns[s] for s in valid]] = list(valid.values())
+            if self._n:
+                slot = (self._n - 1) % self.window
+                old = self._returns[slot]
+                if self._n > self.window:
+                    seen = np.isfinite(old)
+                    self._sum -= np.where(seen, old, 0.0)
+                    self._sumsq -= np.where(seen, old * old, 0.0)
+                    self._count -= seen
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    ret = current / self._last - 1.0
+                self._returns[slot] = ret
+                seen = np.isfinite(ret)
+                self._sum += np.where(seen, ret, 0.0)
+                self._sumsq += np.where(seen, ret * ret, 0.0)
+                self._count += seen
+                if slot == self.window - 1:
+                    self._resync()
+            self._prices[self._n % (self.window + 1)] = current
+            self._last = current
+            self._dates.append(date)
+            self._n += 1
+
+    def _resync(self):
+        # 每写满一轮按缓冲区重算一次累计量，消除反复加减带来的浮点误差（摊销后仍为 O(symbols)）
+        seen = np.isfinite(self._returns)
+        values = np.where(seen, self._returns, 0.0)
+        self._sum = values.sum(axis=0)
+        self._sumsq = (values * values).sum(axis=0)
+        self._count = seen.sum(axis=0).astype(float)
+
+    def update(self):
+        """从行情库读取尚未写入的快照，返回新增快照数。"""
+        store = self.store or get_market_store()
+        with self._lock:
+            latest = store.recent_dates(1)
+            if not latest or (self._dates and latest[0] <= self._dates[-1]):
+                return 0
+            if self._dates:
+                start = self._dates[-1]
+            else:
+                start = store.recent_dates(self.window + 1)[0]
+            added = 0
+            for date, prices in store.iter_snapshots(start=start):
+                if self._dates and date <= self._dates[-1]:
+                    continue
+                self.add_snapshot(date, prices)
+                added += 1
+            return added
+
+    # ---- 查询 ----
+
+    @property
+    def latest_date(self):
+        return self._dates[-1] if self._dates else None
+
+    def _ordered(self, buffer, rows, columns):
+        """按时间顺序返回环形缓冲区中最近 rows 行、指定列的副本。"""
+        size = buffer.shape[0]
+        rows = min(rows, size)
+        end = self._n if buffer is self._prices else self._n - 1
+        index = [(end - rows + i) % size for i in range(rows)]
+        return buffer[np.ix_(index, columns)]
+
+    def symbol_stats(self, symbols):
+        """{symbol: {'price', 'return', 'window_return', 'volatility'}}，volatility 为年化滚动波动率。"""
+        with self._lock:
+            symbols = [s for s in symbols if s in self._columns]
+            if not symbols:
+                return {}
+            cols = [self._columns[s] for s in symbols]
+            prices = self._ordered(self._prices, min(self._n, self.window + 1), cols)
+            count = self._count[cols]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = self._sum[cols] / count
+                var = (self._sumsq[cols] - count * mean * mean) / (count - 1)
+            var = np.where(count >= 2, np.maximum(var, 0.0), np.nan)
+            last_return = self._ordered(self._returns, 1, cols)[-1] if self._n > 1 else np.full(len(cols), np.nan)
+            stats = {}
+            for i, symbol in enumerate(symbols):
+                series = prices[:, i][np.isfinite(prices[:, i])]
+                stats[symbol] = {
+                    'price': _num(series[-1]) if len(series) else None,
+                    'return': _num(last_return[i]),
+                    'window_return': _num(series[-1] / series[0] - 1) if len(series) > 1 else None,
+                    'volatility': _num(np.sqrt(var[i] * self.periods_per_year)),
+                }
+            return stats
+
+    def portfolio(self, holdings):
+        """
+        按当前持仓 {symbol: quantity} 加权的组合指标：假设这些数量在整个窗口内持有，
+        返回 value、window_return、volatility（年化）、sharpe（年化，无风险利率为 0）、
+        max_drawdown、drawdown（距窗口内最高点）以及按市值取前 max_symbols 个持仓的收益相关系数。
+        """
+        with self._lock:
+            held = [(s, q) for s, q in holdings.items() if q > 0 and s in self._columns]
+            empty = {'value': None, 'window_return': None, 'volatility': None, 'sharpe': None,
+                     'max_drawdown': None, 'drawdown': None, 'correlation': {'symbols': [], 'matrix': []}}
+            if not held:
+                return empty
+            cols = [self._columns[s] for s, _ in held]
+            quantities = np.array([q for _, q in held], dtype=float)
+            prices = self._ordered(self._prices, min(self._n, self.window + 1), cols)
+            values = prices @ quantities
+            values = values[np.isfinite(values)]  # 某个持仓尚无价格的早期快照不计入
+            if not len(values):
+                return empty
+            result = dict(empty, value=_num(values[-1]))
+            if len(values) > 1:
+                returns = values[1:] / values[:-1] - 1.0
+                peak = np.maximum.accumulate(values)
+                std = returns.std(ddof=1) if len(returns) > 1 else np.nan
+                result.update(
+                    window_return=_num(values[-1] / values[0] - 1),
+                    volatility=_num(std * np.sqrt(self.periods_per_year)),
+                    sharpe=_num(returns.mean() / std * np.sqrt(self.periods_per_year)) if std > 0 else None,
+                    max_drawdown=_num(np.max(1.0 - values / peak)),
+                    drawdown=_num(1.0 - values[-1] / peak[-1]),
+                )
+            result['correlation'] = self._correlation(held, prices[-1] * quantities)
+            return result
+
+    def _correlation(self, held, market_values):
+        order = np.argsort(-np.nan_to_num(market_values))[:self.max_symbols]
+        symbols = [held[i][0] for i in order]
+        if len(symbols) < 2 or self._n < 3:
+            return {'symbols': symbols, 'matrix': []}
+        returns = self._ordered(self._returns, min(self._n - 1, self.window), [self._columns[s] for s in symbols])
+        returns = returns[np.isfinite(returns).all(axis=1)]
+        if len(returns) < 2:
+            return {'symbols': symbols, 'matrix': []}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matrix = np.corrcoef(returns, rowvar=False)
+        return {'symbols': symbols, 'matrix': [[_num(v, 4) for v in row] for row in matrix]}
+
+    @instrumented('risk')
+    def report(self, holdings):
+        """
+        拉取新快照后返回 {'date', 'snapshots', 'portfolio', 'symbols'}；
+        同一快照、同一持仓的重复请求直接返回缓存结果。
+        """
+        with self._lock:
+            self.update()
+            key = hash_key(self.latest_date, sorted(holdings.items()))
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+            report = {
+                'date': self.latest_date,
+                'snapshots': len(self._dates),
+                'portfolio': self.portfolio(holdings),
+                'symbols': self.symbol_stats(sorted(holdings)),
+            }
+            self._cache.set(key, report)
+            return report
+
+
+def _num(value, digits=6):
+    """numpy 标量转为可 JSON 序列化的 float；NaN/inf 为 None。"""
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
+
+
+_analytics = RiskAnalytics()
+
+
+def get_risk_analytics():
+    return _analytics
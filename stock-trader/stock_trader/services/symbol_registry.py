@@ -0,0 +1,110 @@
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+
+from stock_trader.config import SYMBOLS_PATH, SYMBOL_SEARCH_LIMIT
+from stock_trader.models.symbol import SymbolInfo
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('symbol', 'asset_class', 'exchange', 'currency', 'name')
+
+
+class SymbolRegistry:
+    """
+    交易标的注册表：symbol -> SymbolInfo 的字典，保留配置中的顺序。
+    成员判断、元数据和资产类别查询都是 O(1)；按前缀搜索用有序列表二分，
+    耗时与返回条数有关而与注册表大小基本无关。
+    """
+
+    def __init__(self, infos=()):
+        self._by_symbol = {}
+        for info in infos:
+            self._by_symbol.setdefault(info.symbol, info)
+        self._symbols = list(self._by_symbol)
+        self._by_class = {}
+        for info in self._by_symbol.values():
+            self._by_class.setdefault(info.asset_class, []).append(info.symbol)
+        self._sorted = sorted(self._by_symbol)
+
+    def __len__(self):
+        return len(self._by_symbol)
+
+    def __contains__(self, symbol):
+        return symbol in self._by_symbol
+
+    def __iter__(self):
+        return iter(self._by_symbol.values())
+
+    def get(self, symbol):
+        return self._by_symbol.get(symbol)
+
+    def symbols(self):
+        """按配置顺序返回所有 symbol（返回副本）。"""
+        return list(self._symbols)
+
+    def asset_class(self, symbol):
+        info = self._by_symbol.get(symbol)
+        return info.asset_class if info else None
+
+    def by_asset_class(self, asset_class):
+        return list(self._by_class.get(asset_class, ()))
+
+    def search(self, prefix, limit=SYMBOL_SEARCH_LIMIT):
+        """返回以 prefix 开头（不区分大小写）的前 limit 个 SymbolInfo，按 symbol 排序。"""
+        prefix = (prefix or '').upper()
+        results = []
+        for symbol in self._sorted[bisect_left(self._sorted, prefix):]:
+            if not symbol.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(self._by_symbol[symbol])
+        return results
+
+    @classmethod
+    def load(cls, path):
+        """从 JSON（对象列表）、CSV（表头含 symbol 列）或 SQLite 库（symbols 表）加载。"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext in ('.db', '.sqlite', '.sqlite3'):
+            conn = sqlite3.connect(path)
+            try:
+                conn.row_factory = sqlite3.Row
+                rows = [dict(row) for row in conn.execute('SELECT * FROM symbols ORDER BY rowid')]
+            finally:
+                conn.close()
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f)) if ext == '.csv' else json.load(f)
+        return cls(_to_info(row) for row in rows if row.get('symbol'))
+
+
+def _to_info(row):
+    values = {field: row.get(field) or None for field in FIELDS}
+    values['symbol'] = values['symbol'].strip().upper()
+    values['asset_class'] = (values['asset_class'] or 'stock').lower()
+    values['currency'] = values['currency'] or 'USD'
+    return SymbolInfo(**values)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_symbol_registry():
+    """进程内唯一的注册表，首次使用时从 SYMBOLS_PATH 加载。"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SymbolRegistry.load(SYMBOLS_PATH)
+            logger.info("[Symbols] Loaded %d symbols from %s", len(_registry), SYMBOLS_PATH)
+        return _registry
+
+
+def set_symbol_registry(registry):
+    """替换注册表（测试或运行时重新加载配置）。"""
+    global _registry
+    with _registry_lock:
+        _registry = registry
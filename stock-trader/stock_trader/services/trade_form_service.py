@@ -1,24 +1,34 @@
-from flask import flash, redirect, url_for
+from flask import flash, redirect, url_for, jsonify
 from stock_trader.data import get_stock_price
-from stock_trader.services.trade_service import record_trade
+from stock_trader.services.trade_service import record_trades
 
-def handle_trade_form(form):
+def handle_trade_form(form, as_json=False):
     """
-    Handle trade form submission logic. Returns a Flask redirect response.
+    Handle trade form submission logic. Returns a Flask redirect response,
+    or a small JSON response when as_json is set (the dashboard then applies
+    the fill from the /events stream instead of reloading the page).
     """
     symbol = form.symbol.data
     trade_type = form.trade_type.data
     quantity = form.quantity.data
     price = get_stock_price(symbol)
     if price is None:
-        flash("Failed to fetch price for symbol.", "danger")
-        return redirect(url_for('dashboard'))
-    record_trade(symbol, trade_type, quantity, price)
-    flash(f"{trade_type} {quantity} {symbol} @ ${price} recorded", "success")
+        return _respond(as_json, False, "Failed to fetch price for symbol.")
+    trade_ids = record_trades([(symbol, trade_type, quantity, price)])
+    if not trade_ids:
+        return _respond(as_json, False, f"Failed to record {trade_type} {quantity} {symbol}.")
+    return _respond(as_json, True, f"{trade_type} {quantity} {symbol} @ ${price} recorded", trade_id=trade_ids[0])
+
+def handle_trade_form_errors(form, as_json=False):
+    messages = [f"{field}: {error}" for field, errors in form.errors.items() for error in errors]
+    if as_json:
+        return jsonify({'ok': False, 'messages': messages}), 400
+    for message in messages:
+        flash(message, "danger")
     return redirect(url_for('dashboard'))
 
-def handle_trade_form_errors(form):
-    for field, errors in form.errors.items():
-        for error in errors:
-            flash(f"{field}: {error}", "danger")
+def _respond(as_json, ok, message, **extra):
+    if as_json:
+        return jsonify({'ok': ok, 'messages': [message], **extra}), (200 if ok else 400)
+    flash(message, "success" if ok else "danger")
     return redirect(url_for('dashboard'))
@@ -1,8 +1,12 @@
 from stock_trader.models.trade import Trade
-from typing import List
-import sqlite3
+from stock_trader.models.position import Position
+from typing import List, Iterable, Optional, Tuple
+import os
 from datetime import datetime
-from stock_trader.config import DB_PATH
+from stock_trader.config import DB_PATH, DEFAULT_INITIAL_FUND
+from stock_trader.data import get_stock_price, get_stock_prices
+from stock_trader.services.db import transaction
+from stock_trader.utils.instrumentation import instrumented
 
 DB_NAME = DB_PATH
 
@@ -21,12 +25,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def init_db() -> None:
+def init_db(db_path: Optional[str] = None) -> None:
     """
-    Initialize the trades database table if it does not exist.
+    Initialize the trades and positions tables if they do not exist.
+    The positions ledger is rebuilt from trade history when it is empty.
+    db_path defaults to the live database (DB_NAME); backtests pass their own.
     """
+    db_path = db_path or DB_NAME
     try:
-        with sqlite3.connect(DB_NAME) as conn:
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with transaction(db_path) as conn:
             c = conn.cursor()
             c.execute('''CREATE TABLE IF NOT EXISTS trades (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,31 +45,234 @@ def init_db() -> None:
                 price REAL,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )''')
-            conn.commit()
+            c.execute('''CREATE TABLE IF NOT EXISTS positions (
+                symbol TEXT PRIMARY KEY,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                cost_basis REAL NOT NULL DEFAULT 0,
+                first_buy_date DATETIME,
+                buy_cost REAL NOT NULL DEFAULT 0,
+                sell_income REAL NOT NULL DEFAULT 0,
+                last_trade_id INTEGER
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_trades_symbol_timestamp ON trades (symbol, timestamp)')
+            has_positions = c.execute('SELECT 1 FROM positions LIMIT 1').fetchone()
+            has_trades = c.execute('SELECT 1 FROM trades LIMIT 1').fetchone()
+            if has_trades and not has_positions:
+                _rebuild_ledger(c)
     except Exception as e:
         logger.exception("[DB] Failed to initialize database: %s", e)
 
+def _load_position(c, symbol: str) -> Position:
+    row = c.execute(
+        'SELECT symbol, quantity, cost_basis, first_buy_date, buy_cost, sell_income FROM positions WHERE symbol = ?',
+        (symbol,)
+    ).fetchone()
+    return Position(*row) if row else Position(symbol)
+
+def _save_position(c, position: Position, last_trade_id: int) -> None:
+    first_buy_date = position.first_buy_date
+    if isinstance(first_buy_date, datetime):
+        first_buy_date = first_buy_date.strftime('%Y-%m-%d %H:%M:%S')
+    c.execute(
+        '''INSERT OR REPLACE INTO positions
+           (symbol, quantity, cost_basis, first_buy_date, buy_cost, sell_income, last_trade_id)
+           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+        (position.symbol, position.quantity, position.cost_basis, first_buy_date,
+         position.buy_cost, position.sell_income, last_trade_id)
+    )
+
+def _fold_trade_rows(rows) -> dict:
+    """Fold (id, symbol, type, quantity, price, timestamp) rows, in execution order, into positions."""
+    positions = {}
+    for _id, symbol, type_, quantity, price, timestamp in rows:
+        positions.setdefault(symbol, Position(symbol)).apply(type_, quantity, price, timestamp)
+    return positions
+
+def _rebuild_ledger(c) -> int:
+    rows = c.execute('SELECT id, symbol, type, quantity, price, timestamp FROM trades ORDER BY id').fetchall()
+    positions = _fold_trade_rows(rows)
+    last_ids = {row[1]: row[0] for row in rows}
+    c.execute('DELETE FROM positions')
+    for symbol, position in positions.items():
+        _save_position(c, position, last_ids[symbol])
+    return len(positions)
+
+# 成交监听器：record_trades 提交后以一个 dict 调用，含本批成交、受影响 symbol 的最新持仓和账本累计买卖金额
+_trade_listeners = []
+
+def add_trade_listener(listener) -> None:
+    if listener not in _trade_listeners:
+        _trade_listeners.append(listener)
+
+def remove_trade_listener(listener) -> None:
+    if listener in _trade_listeners:
+        _trade_listeners.remove(listener)
+
+def _fills_event(trade_ids, batch, timestamp, positions, totals) -> dict:
+    return {
+        'version': trade_ids[-1],
+        'trades': [{'id': trade_id, 'symbol': symbol, 'type': trade_type, 'quantity': quantity,
+                    'price': price, 'timestamp': _db_time(timestamp)}
+                   for trade_id, (symbol, trade_type, quantity, price) in zip(trade_ids, batch)],
+        'positions': [{'symbol': p.symbol, 'quantity': p.quantity, 'cost_basis': p.cost_basis,
+                       'first_buy_date': _db_time(p.first_buy_date)} for p in positions.values()],
+        'buy_cost': totals[0],
+        'sell_income': totals[1],
+    }
+
+def _notify_trade_listeners(event) -> None:
+    for listener in list(_trade_listeners):
+        try:
+            listener(event)
+        except Exception:
+            logger.exception("[Trade] Trade listener %r failed", listener)
+
 def record_trade(symbol: str, trade_type: str, quantity: int, price: float) -> None:
     """
-    Record a trade in the database.
+    Record a trade in the database and apply it to the positions ledger
+    in the same transaction.
     """
+    record_trades([(symbol, trade_type, quantity, price)])
+
+@instrumented('db')
+def record_trades(batch: Iterable[Tuple[str, str, int, float]], timestamp: Optional[str] = None,
+                  db_path: Optional[str] = None, before_commit=None) -> List[int]:
+    """
+    Record a batch of (symbol, trade_type, quantity, price) trades in one transaction,
+    updating each affected ledger row once. Returns the new trade ids
+    (empty list if the batch failed and was rolled back).
+    timestamp defaults to the database's CURRENT_TIMESTAMP; backtests pass the snapshot time.
+    before_commit(cursor, trade_ids), if given, runs inside the same transaction so
+    related rows (e.g. order status) commit atomically with the trades; raising
+    from it rolls the whole batch back.
+    Registered trade listeners are notified after the commit, only for the
+    live database (db_path not given); backtests write to their own db_path.
+    """
+    batch = list(batch)
+    if not batch:
+        return []
+    notify = db_path is None and bool(_trade_listeners)
     try:
-        with sqlite3.connect(DB_NAME) as conn:
+        with transaction(db_path or DB_NAME) as conn:
             c = conn.cursor()
-            c.execute('INSERT INTO trades (symbol, type, quantity, price) VALUES (?, ?, ?, ?)', (symbol, trade_type, quantity, price))
-            conn.commit()
+            if timestamp is None:
+                timestamp = c.execute('SELECT CURRENT_TIMESTAMP').fetchone()[0]
+            positions, last_ids, trade_ids = {}, {}, []
+            for symbol, trade_type, quantity, price in batch:
+                c.execute('INSERT INTO trades (symbol, type, quantity, price, timestamp) VALUES (?, ?, ?, ?, ?)',
+                          (symbol, trade_type, quantity, price, timestamp))
+                trade_ids.append(c.lastrowid)
+                if symbol not in positions:
+                    positions[symbol] = _load_position(c, symbol)
+                positions[symbol].apply(trade_type, quantity, price, timestamp)
+                last_ids[symbol] = c.lastrowid
+            for symbol, position in positions.items():
+                _save_position(c, position, last_ids[symbol])
+            if before_commit is not None:
+                before_commit(c, trade_ids)
+            event = None
+            if notify:
+                # 在同一事务内读取累计值，事件中的现金与这批成交一致
+                totals = c.execute('SELECT COALESCE(SUM(buy_cost), 0), COALESCE(SUM(sell_income), 0) FROM positions').fetchone()
+                event = _fills_event(trade_ids, batch, timestamp, positions, totals)
+        if event is not None:
+            _notify_trade_listeners(event)
+        return trade_ids
     except Exception as e:
-        logger.error("[DB] Failed to record trade: symbol=%s, type=%s, quantity=%s, price=%s, error=%s", symbol, trade_type, quantity, price, e)
+        logger.error("[DB] Failed to record %d trade(s) %s: %s", len(batch), batch[:3], e)
+        return []
+
+def rebuild_positions() -> int:
+    """
+    Rebuild the positions ledger from the full trade history.
+    Returns the number of symbols in the rebuilt ledger.
+    """
+    with transaction(DB_NAME) as conn:
+        count = _rebuild_ledger(conn.cursor())
+    logger.info("[DB] Rebuilt positions ledger for %d symbols", count)
+    return count
 
-def get_trades() -> List[Trade]:
+def verify_positions(tolerance: float = 1e-6) -> List[str]:
     """
-    Fetch all trades from the database, ordered by timestamp descending.
+    Compare the positions ledger against a full recompute from trade history.
+    Returns the symbols whose ledger row does not match (empty list if consistent).
+    """
+    with transaction(DB_NAME) as conn:
+        c = conn.cursor()
+        rows = c.execute('SELECT id, symbol, type, quantity, price, timestamp FROM trades ORDER BY id').fetchall()
+        expected = _fold_trade_rows(rows)
+        actual = {p.symbol: p for p in (Position(*row) for row in c.execute(
+            'SELECT symbol, quantity, cost_basis, first_buy_date, buy_cost, sell_income FROM positions'))}
+    mismatched = []
+    for symbol in sorted(set(expected) | set(actual)):
+        exp, act = expected.get(symbol), actual.get(symbol)
+        if exp is None or act is None:
+            mismatched.append(symbol)
+            continue
+        if (exp.quantity != act.quantity or exp.first_buy_date != act.first_buy_date
+                or any(abs(a - b) > tolerance * max(1.0, abs(a))
+                       for a, b in ((exp.cost_basis, act.cost_basis), (exp.buy_cost, act.buy_cost),
+                                    (exp.sell_income, act.sell_income)))):
+            mismatched.append(symbol)
+    return mismatched
+
+@instrumented('db')
+def get_positions(db_path: Optional[str] = None) -> List[Position]:
+    """
+    Fetch the materialized per-symbol positions ledger (of db_path, default the live database).
     Returns an empty list if an error occurs.
     """
     try:
-        with sqlite3.connect(DB_NAME) as conn:
+        with transaction(db_path or DB_NAME) as conn:
+            rows = conn.execute(
+                'SELECT symbol, quantity, cost_basis, first_buy_date, buy_cost, sell_income FROM positions ORDER BY symbol'
+            ).fetchall()
+        return [Position(*row) for row in rows]
+    except Exception as e:
+        logger.error("[DB] Failed to fetch positions: %s", e)
+        return []
+
+def _db_time(value):
+    # 数据库中的 timestamp 为 'YYYY-MM-DD HH:MM:SS'（CURRENT_TIMESTAMP 格式）
+    return value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value
+
+@instrumented('db')
+def get_trades(after_id: Optional[int] = None, limit: Optional[int] = None, symbol: Optional[str] = None,
+               start=None, end=None) -> List[Trade]:
+    """
+    Fetch trades ordered by timestamp descending (newest first).
+    Args:
+        after_id: keyset cursor; only trades older than this trade id are returned.
+        limit: maximum number of trades to return (None for all).
+        symbol: only trades for this symbol.
+        start, end: inclusive timestamp bounds (datetime or 'YYYY-MM-DD HH:MM:SS').
+    Returns an empty list if an error occurs.
+    """
+    sql = 'SELECT id, symbol, type, quantity, price, timestamp FROM trades'
+    conditions, params = [], []
+    if symbol is not None:
+        conditions.append('symbol = ?')
+        params.append(symbol)
+    if start is not None:
+        conditions.append('timestamp >= ?')
+        params.append(_db_time(start))
+    if end is not None:
+        conditions.append('timestamp <= ?')
+        params.append(_db_time(end))
+    if after_id is not None:
+        conditions.append('(timestamp, id) < (SELECT timestamp, id FROM trades WHERE id = ?)')
+        params.append(after_id)
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY timestamp DESC, id DESC'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    try:
+        with transaction(DB_NAME) as conn:
             c = conn.cursor()
-            c.execute('SELECT id, symbol, type, quantity, price, timestamp FROM trades ORDER BY timestamp DESC')
+            c.execute(sql, params)
             rows = c.fetchall()
         trades = []
         for row in rows:
@@ -77,42 +289,40 @@ def get_trades() -> List[Trade]:
         logger.error("[DB] Failed to fetch trades: %s", e)
         return []
 
+def get_trades_page(after_id: Optional[int] = None, limit: int = 50, **filters) -> Tuple[List[Trade], Optional[int]]:
+    """
+    Fetch one page of trades. Returns (trades, next_after_id); next_after_id is None
+    when there are no older trades.
+    """
+    trades = get_trades(after_id=after_id, limit=limit + 1, **filters)
+    if len(trades) > limit:
+        trades = trades[:limit]
+        return trades, trades[-1].id
+    return trades, None
 
-from stock_trader.config import DB_PATH, DEFAULT_INITIAL_FUND
-
-def calculate_positions_and_pnl(trades: list, initial_fund: float = DEFAULT_INITIAL_FUND):
+def summarize_positions(positions: list, initial_fund: float = DEFAULT_INITIAL_FUND):
     """
-    Calculate positions, P&L, and related metrics.
+    Turn per-symbol positions into dashboard rows and portfolio metrics.
     Args:
-        trades (list[Trade]): List of trade records.
+        positions (list[Position]): Per-symbol ledger entries.
         initial_fund (float): Initial fund amount.
     Returns:
         tuple: (position_rows, cash_balance, position_value, total_asset_value, pnl, roi_str)
     """
-    from collections import defaultdict
-    from stock_trader.data import get_stock_price
     total_buy_cost = 0.0
     total_sell_income = 0.0
-    positions = {}
-    for t in trades:
-        if t.type == 'Buy':
-            positions.setdefault(t.symbol, []).append(t)
-            total_buy_cost += t.quantity * t.price
-        elif t.type == 'Sell':
-            total_sell_income += t.quantity * t.price
     position_value = 0.0
     position_rows = []
-    merged = defaultdict(lambda: {"total_qty":0, "total_cost":0.0, "first_date":None})
-    for symbol, trade_list in positions.items():
-        for trade in trade_list:
-            merged[symbol]["total_qty"] += trade.quantity
-            merged[symbol]["total_cost"] += trade.quantity * trade.price
-            if merged[symbol]["first_date"] is None or trade.timestamp < merged[symbol]["first_date"]:
-                merged[symbol]["first_date"] = trade.timestamp
-    for symbol, data in merged.items():
-        qty = data["total_qty"]
-        avg_price = data["total_cost"] / qty if qty else 0.0
-        buy_date = data["first_date"]
+    # 批量预取持仓行情，下面逐个读取时命中缓存
+    get_stock_prices([p.symbol for p in positions if p.quantity > 0])
+    for position in positions:
+        total_buy_cost += position.buy_cost
+        total_sell_income += position.sell_income
+        qty = position.quantity
+        if qty <= 0:
+            continue
+        avg_price = position.cost_basis / qty
+        buy_date = position.first_buy_date
         try:
             if isinstance(buy_date, str):
                 buy_date = datetime.fromisoformat(buy_date)
@@ -120,38 +330,72 @@ def calculate_positions_and_pnl(trades: list, initial_fund: float = DEFAULT_INIT
         except Exception as ex:
             logger.warning("[P&L] Failed to format buy_date '%s': %s", buy_date, ex)
             buy_date_str = str(buy_date)
-        current_price = get_stock_price(symbol)
+        current_price = get_stock_price(position.symbol)
         if current_price is None:
-            logger.warning("[Market] Failed to get current price for symbol '%s'", symbol)
+            logger.warning("[Market] Failed to get current price for symbol '%s'", position.symbol)
             current_price = 0.0
         market_value = qty * current_price
         position_value += market_value
         position_rows.append({
-            "Symbol": symbol,
+            "Symbol": position.symbol,
             "Buy Date": buy_date_str,
             "Buy Price": round(avg_price, 2),
             "Current Price": current_price,
             "Quantity": qty,
             "Market Value": market_value,
-            "P&L": market_value - data["total_cost"]
+            "P&L": market_value - position.cost_basis
         })
     cash_balance = initial_fund - total_buy_cost + total_sell_income
     total_asset_value = cash_balance + position_value
-    if not trades:
-        cash_balance = initial_fund
-        position_value = 0.0
-        total_asset_value = initial_fund
     pnl = total_asset_value - initial_fund
     roi = (pnl / initial_fund) * 100 if initial_fund else 0.0
     roi_str = f"{roi:.4f}%"
     return position_rows, cash_balance, position_value, total_asset_value, pnl, roi_str
 
+def calculate_positions_and_pnl(trades: list, initial_fund: float = DEFAULT_INITIAL_FUND):
+    """
+    Calculate positions, P&L, and related metrics by replaying the given trades.
+    Prefer calculate_positions_from_ledger for the live portfolio.
+    Args:
+        trades (list[Trade]): List of trade records (any order).
+        initial_fund (float): Initial fund amount.
+    Returns:
+        tuple: (position_rows, cash_balance, position_value, total_asset_value, pnl, roi_str)
+    """
+    ordered = sorted(trades, key=lambda t: t.id)
+    positions = _fold_trade_rows((t.id, t.symbol, t.type, t.quantity, t.price, t.timestamp) for t in ordered)
+    return summarize_positions(list(positions.values()), initial_fund)
+
+def calculate_positions_from_ledger(initial_fund: float = DEFAULT_INITIAL_FUND):
+    """
+    Same output as calculate_positions_and_pnl, computed from the materialized
+    positions ledger in O(number of symbols).
+    """
+    return summarize_positions(get_positions(), initial_fund)
+
 def execute_trade(symbol: str, trade_type: str, quantity: int, price: float = None) -> None:
     """
     执行一笔模拟交易，自动补充当前价格（如未指定），并写入数据库。
     """
     if price is None:
         # 这里可集成实时价格获取逻辑
-        from stock_trader.data import get_stock_price
         price = get_stock_price(symbol)
-    record_trade(symbol, trade_type, quantity, price)
\ No newline at end of file
+    record_trade(symbol, trade_type, quantity, price)
+
+def execute_trades(orders: Iterable[Tuple[str, str, int]]) -> List[Tuple[int, str, str, int, float]]:
+    """
+    批量执行 (symbol, trade_type, quantity) 模拟交易：一次批量取价，一个事务写入。
+    无法取得价格的订单会被跳过。返回实际成交 [(trade_id, symbol, trade_type, quantity, price)]，
+    日志应使用这里的成交价，而不是事后重新查询的行情。
+    """
+    orders = list(orders)
+    prices = get_stock_prices([symbol for symbol, _, _ in orders])
+    batch = []
+    for symbol, trade_type, quantity in orders:
+        price = prices.get(symbol)
+        if price is None:
+            logger.warning("[Trade] Skip %s %s %s: no price", trade_type, quantity, symbol)
+            continue
+        batch.append((symbol, trade_type, quantity, price))
+    trade_ids = record_trades(batch)
+    return [(trade_id, *fill) for trade_id, fill in zip(trade_ids, batch)]
\ No newline at end of file
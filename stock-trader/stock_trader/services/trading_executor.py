@@ -1,24 +1,47 @@
-import os
-from stock_trader.utils.logger import log_trade_action, log_llm_decision
-from stock_trader.services.trade_service import execute_trade
+import uuid
+from stock_trader.config import STATE_DB_PATH, LLM_TRADE_DEDUP_SECONDS
+from stock_trader.services.decision_parser import parse_decision
+from stock_trader.services.order_queue import get_order_queue
+from stock_trader.utils.cache import SharedCache, hash_key
 
-def auto_trade_by_llm_decision(llm_answer, symbols):
+# 跨 worker 的去重记录：建议内容 -> 首次提交时生成的幂等键，LLM_TRADE_DEDUP_SECONDS 秒后过期
+_recent_llm_orders = SharedCache(STATE_DB_PATH, 'llm_orders', maxsize=1024, ttl=LLM_TRADE_DEDUP_SECONDS)
+
+def llm_order_key(*parts, claims=None):
+    """
+    大模型订单的幂等键：相同的建议在首次提交后的 LLM_TRADE_DEDUP_SECONDS 秒内返回同一个键
+    （重试、重复点击、多个 worker 收到同一回答都不会重复成交），之后再出现时生成新键。
+    窗口从首次提交起算，不按固定时间段切分，跨越时间段边界的重复建议同样去重。
+    """
+    claims = claims if claims is not None else _recent_llm_orders
+    content = hash_key(*parts)
+    while True:
+        key = f"llm:{content}:{uuid.uuid4().hex}"
+        # add() 在所有 worker 间原子地占用该建议；已被占用时复用首次提交的键
+        if claims.add(content, key):
+            return key
+        existing = claims.get(content)
+        if existing is not None:
+            return existing
+
+def auto_trade_by_llm_decision(llm_answer, symbols, idempotency_key=None):
     """
-    解析大模型输出，若建议买/卖，自动执行模拟交易。
-    llm_answer: str, symbols: list
+    解析大模型输出中的全部交易意图，每个意图提交一笔模拟交易订单并立即返回（由订单队列的 worker 成交）。
+    llm_answer: str, symbols: list 或支持 in 的容器；未写明数量时交易1股。
+    idempotency_key 默认由回答内容和意图生成；给出时按意图序号派生各订单的键。
+    返回提交结果的说明，没有交易意图时返回 None。
     """
-    # 简单规则：如果模型建议买/卖某只已知股票，则自动下单
-    for symbol in symbols:
-        if symbol in llm_answer:
-            if '买' in llm_answer or 'buy' in llm_answer.lower():
-                # 假设买1股，价格用当前市场价
-                price = None  # 你可以集成实时价格
-                execute_trade(symbol, 'Buy', 1, price)
-                log_trade_action('Buy', symbol, 1, price, reason='LLM建议')
-                return f"已根据智能体建议买入1股 {symbol}"
-            if '卖' in llm_answer or 'sell' in llm_answer.lower():
-                price = None
-                execute_trade(symbol, 'Sell', 1, price)
-                log_trade_action('Sell', symbol, 1, price, reason='LLM建议')
-                return f"已根据智能体建议卖出1股 {symbol}"
-    return None
+    intents = parse_decision(llm_answer, symbols)
+    if not intents:
+        return None
+    messages = []
+    for i, (action, symbol, quantity) in enumerate(intents):
+        key = f"{idempotency_key}:{i}" if idempotency_key else llm_order_key(llm_answer, action, symbol, quantity)
+        order_id, created = get_order_queue().submit(symbol, action, quantity, idempotency_key=key,
+                                                     source='llm', reason='LLM建议')
+        label = '买入' if action == 'Buy' else '卖出'
+        if created:
+            messages.append(f"已提交智能体建议：{label}{quantity}股 {symbol}（订单 #{order_id}）")
+        else:
+            messages.append(f"智能体建议{label}{quantity}股 {symbol} 已提交过（订单 #{order_id}）")
+    return '；'.join(messages)
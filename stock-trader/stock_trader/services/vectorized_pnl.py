@@ -0,0 +1,86 @@
+import numpy as np
+
+from stock_trader.config import DEFAULT_INITIAL_FUND
+from stock_trader.models.position import Position
+from stock_trader.models.trade_batch import TradeBatch
+from stock_trader.services.trade_service import summarize_positions
+
+"""
+向量化持仓/P&L 计算，结果与 trade_service.calculate_positions_and_pnl 相同（平均成本法）。
+
+按 (symbol, id) 排序后分组累加数量；持仓成本满足线性递推
+    买入: C = C + q*p        卖出: C = C * Q_after / Q_before
+只有最后一次清仓之后的成交会影响最终成本，因此对每个 symbol 只在该区段内
+用对数累加求解递推。
+"""
+
+
+def compute_positions(batch: TradeBatch):
+    """返回 {symbol: Position}，按各 symbol 首笔成交的先后排列（与逐笔计算一致）。"""
+    rec = batch.records
+    n_symbols = len(batch.symbols)
+    if len(rec) == 0:
+        return {}
+    order = np.lexsort((rec['id'], rec['symbol']))
+    rec = rec[order]
+    codes = rec['symbol']
+    side = rec['side'].astype(np.int64)
+    qty = rec['quantity']
+    notional = qty * rec['price']
+
+    buy_cost = np.bincount(codes, weights=np.where(side == 1, notional, 0.0), minlength=n_symbols)
+    sell_income = np.bincount(codes, weights=np.where(side == -1, notional, 0.0), minlength=n_symbols)
+
+    # 分组边界和组内持仓数量。卖出超过持仓时数量截断为 0（与逐笔计算一致），
+    # 截断后的累计和等于 S_k - min(0, min_{j<=k} S_j)，S 为组内原始累计和
+    idx = np.arange(len(rec))
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(rec)] - 1
+    sizes = ends - starts + 1
+    group = np.repeat(np.arange(len(starts)), sizes)
+    total = np.cumsum(side * qty)
+    raw = total - np.r_[0, total][starts][group]
+    # 每组整体下移，使组内的累计最小值不受前面各组影响
+    shift = int(raw.max() - raw.min()) + 1
+    running_min = np.minimum.accumulate(raw - group * shift) + group * shift
+    held = raw - np.minimum(running_min, 0)
+    held_before = np.r_[0, held[:-1]]
+    held_before[starts] = 0
+
+    # 最后一次清仓（数量归零）之后的区段
+    last_zero = np.maximum.accumulate(np.where(held == 0, idx, -1))
+    segment_start = np.maximum(last_zero[ends] + 1, starts)
+    in_segment = idx >= segment_start[group]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where((side == -1) & in_segment, held / held_before, 1.0)
+        log_factor = np.where(in_segment, np.log(factor), 0.0)
+    cum_log = np.cumsum(log_factor)
+    contrib = np.where(in_segment & (side == 1), notional * np.exp(cum_log[ends][group] - cum_log), 0.0)
+    cost_basis = np.bincount(codes, weights=contrib, minlength=n_symbols)
+
+    positions = {}
+    for g in np.argsort(rec['id'][starts], kind='stable'):
+        start, end = starts[g], ends[g]
+        code = codes[start]
+        symbol = batch.symbols[code]
+        quantity = int(held[end])
+        first_buy_date = rec['timestamp'][segment_start[g]].astype(object) if quantity > 0 else None
+        positions[symbol] = Position(
+            symbol=symbol,
+            quantity=quantity,
+            cost_basis=float(cost_basis[code]) if quantity > 0 else 0.0,
+            first_buy_date=first_buy_date,
+            buy_cost=float(buy_cost[code]),
+            sell_income=float(sell_income[code]),
+        )
+    return positions
+
+
+def calculate_positions_and_pnl_vectorized(batch: TradeBatch, initial_fund: float = DEFAULT_INITIAL_FUND):
+    """
+    与 calculate_positions_and_pnl 输出相同的元组：
+    (position_rows, cash_balance, position_value, total_asset_value, pnl, roi_str)
+    """
+    positions = compute_positions(batch)
+    return summarize_positions(list(positions.values()), initial_fund)
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def hash_key(*parts):
+    """把任意可 JSON 序列化的参数稳定地哈希成缓存键。"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTLCache:
+    """
+    线程安全的 LRU + TTL 缓存。超过 maxsize 时淘汰最久未使用的条目，过期条目在读取时丢弃。
+    给出 path 时以 JSON 文件持久化（值需可 JSON 序列化），进程重启后仍可命中。
+    """
+
+    def __init__(self, maxsize=128, ttl=None, path=None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > self.clock()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, self.clock() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self.path:
+                self._save()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = self.clock()
+        for key, value, expires_at in entries[-self.maxsize:]:
+            if expires_at is None or expires_at > now:
+                self._data[key] = (value, expires_at)
+
+    def _save(self):
+        # 先写临时文件再替换，避免写到一半的文件被读到
+        tmp_path = f"{self.path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([[key, value, expires_at] for key, (value, expires_at) in self._data.items()], f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class SharedCache:
+    """
+    多进程共享的 TTL 缓存：条目存放在 SQLite（WAL）中，同一主机上的所有 worker 看到同一份数据。
+    接口与 TTLCache 相同；值需可 JSON 序列化。超过 maxsize 时淘汰最久未访问的条目。
+    add() 只在键不存在（或已过期）时写入并返回 True，可用作跨进程的“只执行一次”判断。
+    """
+
+    _initialized = set()
+    _init_lock = threading.Lock()
+
+    def __init__(self, db_path, namespace='default', maxsize=128, ttl=None, clock=time.time):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        # 延迟导入：utils.cache 也被不需要数据库的模块使用
+        from stock_trader.services.db import get_connection
+        conn = get_connection(self.db_path)
+        with SharedCache._init_lock:
+            if self.db_path not in SharedCache._initialized:
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+                with conn:
+                    conn.execute('''CREATE TABLE IF NOT EXISTS shared_cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT,
+                        expires_at REAL,
+                        accessed_at REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )''')
+                    conn.execute('CREATE INDEX IF NOT EXISTS idx_shared_cache_accessed ON shared_cache (namespace, accessed_at)')
+                SharedCache._initialized.add(self.db_path)
+        return conn
+
+    def _expires_at(self, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        return self.clock() + ttl if ttl else None
+
+    def get(self, key, default=None):
+        now = self.clock()
+        conn = self._connect()
+        with conn:
+            row = conn.execute('SELECT value, expires_at FROM shared_cache WHERE namespace = ? AND key = ?',
+                               (self.namespace, key)).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                conn.execute('UPDATE shared_cache SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                             (now, self.namespace, key))
+                self.hits += 1
+                return json.loads(row[0])
+            if row is not None:
+                conn.execute('DELETE FROM shared_cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO shared_cache (namespace, key, value, expires_at, accessed_at) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (self.namespace, key, json.dumps(value, ensure_ascii=False), self._expires_at(ttl), self.clock()))
+            self._evict(conn)
+
+    def add(self, key, value=True, ttl=None):
+        """键不存在或已过期时写入并返回 True；否则不修改、返回 False。多进程并发调用时只有一个返回 True。"""
+        now = self.clock()
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM shared_cache WHERE namespace = ? AND key = ? AND expires_at IS NOT NULL AND expires_at <= ?',
+                         (self.namespace, key, now))
+            added = conn.execute('INSERT OR IGNORE INTO shared_cache (namespace, key, value, expires_at, accessed_at) '
+                                 'VALUES (?, ?, ?, ?, ?)',
+                                 (self.namespace, key, json.dumps(value, ensure_ascii=False), self._expires_at(ttl), now)
+                                 ).rowcount == 1
+            if added:
+                self._evict(conn)
+        return added
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM shared_cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def _evict(self, conn):
+        conn.execute('DELETE FROM shared_cache WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?',
+                     (self.namespace, self.clock()))
+        conn.execute('DELETE FROM shared_cache WHERE namespace = ? AND key IN ('
+                     '  SELECT key FROM shared_cache WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                     (self.namespace, self.namespace, self.maxsize))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM shared_cache WHERE namespace = ?', (self.namespace,))
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM shared_cache WHERE namespace = ?',
+                                       (self.namespace,)).fetchone()[0]
+
+    def stats(self):
+        """命中/未命中为本进程的计数，size 为共享的条目数。"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -1,13 +1,66 @@
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend for server environments
-import matplotlib.pyplot as plt
 import io
 import base64
+import threading
 
-def generate_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market):
+from stock_trader.config import CHART_CACHE_SIZE
+from stock_trader.utils.cache import TTLCache, hash_key
+from stock_trader.utils.instrumentation import instrumented
+
+# 渲染结果按输入内容哈希缓存：输入不变时不再调用 matplotlib
+_chart_cache = TTLCache(maxsize=CHART_CACHE_SIZE)
+
+# pyplot 不是线程安全的，多线程 worker 下串行绘图
+_render_lock = threading.Lock()
+
+MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+_plt = None
+
+
+def get_pyplot():
+    """首次绘图时才导入 matplotlib（约 0.5s），缓存命中和客户端绘图模式都不需要它。"""
+    global _plt
+    if _plt is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Use non-GUI backend for server environments
+        import matplotlib.pyplot as plt
+        _plt = plt
+    return _plt
+
+
+def get_chart_cache():
+    return _chart_cache
+
+
+def asset_chart_key(stock_buy, stock_market, crypto_buy, crypto_market, fmt='png'):
+    return hash_key('asset_bar', stock_buy, stock_market, crypto_buy, crypto_market, fmt)
+
+
+def position_chart_key(position_rows, fmt='png'):
+    return hash_key('position_pie', [(row['Symbol'], row['Market Value']) for row in position_rows or []], fmt)
+
+
+@instrumented('chart')
+def _render_cached(key, draw, fmt):
+    data = _chart_cache.get(key)
+    if data is None:
+        with _render_lock:
+            fig = draw()
+            if fig is None:
+                return None
+            buf = io.BytesIO()
+            fig.savefig(buf, format=fmt, bbox_inches="tight", transparent=True)
+            get_pyplot().close(fig)
+        data = buf.getvalue()
+        _chart_cache.set(key, data)
+    return data
+
+
+def _draw_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market):
     labels = ["Stock", "Crypto"]
     buy_values = [stock_buy, crypto_buy]
     market_values = [stock_market, crypto_market]
+    plt = get_pyplot()
     fig, ax = plt.subplots(figsize=(6, 3.5), dpi=120)
     bar_width = 0.35
     x = range(len(labels))
@@ -28,22 +81,17 @@ def generate_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market)
         percent = (market / buy * 100) if buy else 0
         ax.text(i + bar_width/2, max(buy, market) * 1.02, f"{percent:.2f}%", ha='center', fontsize=11, color="#195ca7", fontweight="bold")
     fig.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight", transparent=True)
-    plt.close(fig)
-    return base64.b64encode(buf.getvalue()).decode()
+    return fig
 
-def generate_position_pie_chart(position_rows):
-    """
-    生成持仓分布饼图，输入为position_rows（每项需有'Symbol'和'Market Value'）。
-    返回base64编码的PNG图片。
-    """
+
+def _draw_position_pie_chart(position_rows):
     if not position_rows:
         return None
     labels = [row['Symbol'] for row in position_rows]
     sizes = [row['Market Value'] for row in position_rows]
     if not any(sizes):
         return None
+    plt = get_pyplot()
     fig, ax = plt.subplots(figsize=(3.5,3.5), dpi=120)
     colors = plt.cm.Paired(range(len(labels)))
     wedges, texts, autotexts = ax.pie(
@@ -54,7 +102,45 @@ def generate_position_pie_chart(position_rows):
     plt.setp(autotexts, size=9, weight='bold', color='#195ca7')
     ax.axis('equal')
     fig.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', transparent=True)
-    plt.close(fig)
-    return base64.b64encode(buf.getvalue()).decode()
+    return fig
+
+
+def render_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market, fmt='png'):
+    """返回资产柱状图的图片字节（fmt 为 'png' 或 'svg'），按输入值缓存。"""
+    key = asset_chart_key(stock_buy, stock_market, crypto_buy, crypto_market, fmt)
+    return _render_cached(key, lambda: _draw_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market), fmt)
+
+
+def render_position_pie_chart(position_rows, fmt='png'):
+    """返回持仓饼图的图片字节；无持仓或市值全为 0 时返回 None。按输入值缓存。"""
+    key = position_chart_key(position_rows, fmt)
+    return _render_cached(key, lambda: _draw_position_pie_chart(position_rows), fmt)
+
+
+def generate_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market):
+    data = render_asset_bar_chart(stock_buy, stock_market, crypto_buy, crypto_market)
+    return base64.b64encode(data).decode()
+
+
+def generate_position_pie_chart(position_rows):
+    """
+    生成持仓分布饼图，输入为position_rows（每项需有'Symbol'和'Market Value'）。
+    返回base64编码的PNG图片。
+    """
+    data = render_position_pie_chart(position_rows)
+    return base64.b64encode(data).decode() if data else None
+
+
+def chart_series(stock_buy, stock_market, crypto_buy, crypto_market, position_rows):
+    """图表的 JSON 数据，供浏览器端直接绘制（服务器不做任何绘图）。"""
+    return {
+        'asset_bar': {
+            'labels': ['Stock', 'Crypto'],
+            'buy_total': [stock_buy, crypto_buy],
+            'market_value': [stock_market, crypto_market],
+        },
+        'position_pie': {
+            'labels': [row['Symbol'] for row in position_rows],
+            'market_value': [row['Market Value'] for row in position_rows],
+        },
+    }
@@ -0,0 +1,250 @@
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from stock_trader.config import PROFILE_THRESHOLD, PROFILE_DIR
+
+"""
+请求级耗时统计。
+
+每个请求在当前线程上开启一个 RequestTrace，代码中用 span('db') / @instrumented('quotes')
+标记的阶段把耗时累加到该请求上（没有进行中的请求时只有一次 perf_counter 的开销）。
+请求结束时：各阶段耗时写入 Server-Timing 响应头，并计入进程内的 Prometheus 直方图，
+由 /metrics 以文本格式导出。可选地对慢请求保存 cProfile 结果。
+"""
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+
+
+class RequestTrace:
+    """一个请求内各阶段的耗时：{stage: [总秒数, 次数]}。同名阶段多次出现时累加。"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.start = clock()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def elapsed(self):
+        return self.clock() - self.start
+
+    def server_timing(self, total=None):
+        """Server-Timing 头：各阶段毫秒数，最后是 total。"""
+        parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, (seconds, _) in self.stages.items()]
+        parts.append(f"total;dur={(self.elapsed() if total is None else total) * 1000:.2f}")
+        return ', '.join(parts)
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def start_trace():
+    _local.trace = RequestTrace()
+    return _local.trace
+
+
+def end_trace():
+    trace = current_trace()
+    _local.trace = None
+    return trace
+
+
+@contextmanager
+def span(stage):
+    """把 with 块的耗时计入当前请求的 stage 阶段。嵌套的 span 各自计时。"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - start)
+
+
+def instrumented(stage):
+    """装饰器形式的 span。"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---- Prometheus 指标 ----
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = _labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{{{base},le=\"{bound}\"}} {count}")
+            lines.append(f"{self.name}_bucket{{{base},le=\"+Inf\"}} {series[-1]}")
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Metrics:
+    """进程内指标：请求计数、请求耗时和各阶段耗时直方图，以及按需求值的 gauge。线程安全。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.request_duration = Histogram('stocktrader_request_duration_seconds',
+                                          'Request latency in seconds.', ('endpoint', 'method'))
+        self.stage_duration = Histogram('stocktrader_stage_duration_seconds',
+                                        'Time spent per request stage in seconds.', ('endpoint', 'stage'))
+        self._gauges = {}  # name -> (help, fn)
+
+    def observe_request(self, endpoint, method, status, trace, total):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.request_duration.observe((endpoint, method), total)
+            for stage, (seconds, _) in trace.stages.items():
+                self.stage_duration.observe((endpoint, stage), seconds)
+
+    def register_gauge(self, name, help_text, fn):
+        """注册一个导出时才求值的 gauge；fn 返回数值或 None（None 时不导出）。"""
+        self._gauges[name] = (help_text, fn)
+
+    def render(self):
+        """Prometheus 文本格式（version 0.0.4）。"""
+        with self._lock:
+            lines = ['# HELP stocktrader_requests_total Requests handled.', '# TYPE stocktrader_requests_total counter']
+            for key, count in sorted(self.requests.items()):
+                lines.append(f"stocktrader_requests_total{{{_labels(('endpoint', 'method', 'status'), key)}}} {count}")
+            lines += self.request_duration.render()
+            lines += self.stage_duration.render()
+        for name, (help_text, fn) in sorted(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                logger.exception("[Metrics] Gauge %s failed", name)
+                continue
+            if value is not None:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+# ---- 慢请求 profile ----
+
+def dump_profile(profiler, endpoint, seconds, directory=PROFILE_DIR):
+    """把 profiler 结果写到 directory/<时间>-<endpoint>-<毫秒>ms.prof（可用 pstats / snakeviz 查看）。"""
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)
+    path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}-{seconds * 1000:.0f}ms.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+# ---- Flask 集成 ----
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def init_app(app, metrics=None, profile_threshold=PROFILE_THRESHOLD, profile_dir=PROFILE_DIR):
+    """
+    给 Flask 应用挂上请求计时：每个响应带 Server-Timing 头，GET /metrics 导出指标。
+    profile_threshold 不为 None 时对每个请求开启 cProfile，耗时超过阈值的请求保存 profile。
+    """
+    from flask import Response, request
+
+    metrics = metrics or _metrics
+
+    @app.before_request
+    def _start_request_trace():
+        trace = start_trace()
+        trace.profiler = None
+        if profile_threshold is not None:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                trace.profiler = profiler
+            except ValueError:
+                # 同一线程上已有其它 profiler 在运行
+                pass
+
+    @app.after_request
+    def _finish_request_trace(response):
+        trace = end_trace()
+        if trace is None:
+            return response
+        total = trace.elapsed()
+        endpoint = request.endpoint or 'unknown'
+        response.headers['Server-Timing'] = trace.server_timing(total)
+        metrics.observe_request(endpoint, request.method, response.status_code, trace, total)
+        if trace.profiler is not None:
+            trace.profiler.disable()
+            if total >= profile_threshold:
+                path = dump_profile(trace.profiler, endpoint, total, profile_dir)
+                logger.info("[Profile] %s took %.1fms, profile saved to %s", endpoint, total * 1000, path)
+        return response
+
+    @app.teardown_request
+    def _discard_request_trace(exc):
+        # after_request 未执行（异常）时清理，避免下一个请求沿用
+        trace = end_trace()
+        if trace is not None and trace.profiler is not None:
+            trace.profiler.disable()
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    return metrics
@@ -1,32 +1,157 @@
 import os
+import gzip
+import shutil
 import logging
+import threading
+from collections import deque
 from datetime import datetime
+from logging.handlers import WatchedFileHandler
+
+try:
+    import fcntl
+except ImportError:  # Windows：不加锁
+    fcntl = None
+
+from stock_trader.config import LOG_DIR, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_BUFFER_SIZE, WEB_WORKERS
+from stock_trader.utils.instrumentation import instrumented
 
-LOG_DIR = os.path.join(os.path.dirname(__file__), '../../logs')
 LOG_PATH = os.path.join(LOG_DIR, 'trading.log')
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+# 成交和大模型决策日志（log_trade_action / log_llm_decision）单独使用这个 logger，
+# 仪表盘只推送它的日志行；记录仍会传播到根 logger 写入日志文件
+DECISION_LOGGER = 'stock_trader.decisions'
 
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
-logging.basicConfig(
-    filename=LOG_PATH,
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(message)s',
-    encoding='utf-8'
-)
+
+class RingBufferHandler(logging.Handler):
+    """在内存中保留最近 capacity 行日志（多行记录按行拆分）。"""
+
+    def __init__(self, capacity=LOG_BUFFER_SIZE):
+        super().__init__()
+        self.lines = deque(maxlen=capacity)
+        self._buffer_lock = threading.Lock()
+
+    def emit(self, record):
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._buffer_lock:
+            self.lines.extend(line + '\n' for line in text.split('\n'))
+
+    def tail(self, n):
+        with self._buffer_lock:
+            if n >= len(self.lines):
+                return list(self.lines)
+            return list(self.lines)[-n:]
+
+
+class SharedRotatingFileHandler(WatchedFileHandler):
+    """
+    可由多个 worker 进程同时追加的按大小轮转日志。
+    每次写入前检查文件是否已被其它进程轮转（WatchedFileHandler 会重新打开）；
+    超过 max_bytes 时在文件锁内轮转，只有一个进程执行：trading.log -> trading.log.1。
+    刚轮转出的 .1 不立即压缩（其它进程可能还在写最后一行），下次轮转时才压缩为 .2.gz，
+    更早的依次为 .3.gz ... .<backup_count>.gz。
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, encoding='utf-8'):
+        super().__init__(filename, encoding=encoding)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lock_path = filename + '.lock'
+
+    def emit(self, record):
+        super().emit(record)
+        if self.max_bytes and self.stream is not None and os.fstat(self.stream.fileno()).st_size >= self.max_bytes:
+            self._rollover()
+
+    def _rollover(self):
+        base = self.baseFilename
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # 等锁期间可能已被其它进程轮转
+            if os.path.exists(base) and os.stat(base).st_size >= self.max_bytes:
+                for i in range(self.backup_count - 1, 1, -1):
+                    if os.path.exists(f"{base}.{i}.gz"):
+                        os.replace(f"{base}.{i}.gz", f"{base}.{i + 1}.gz")
+                if os.path.exists(f"{base}.1"):
+                    if self.backup_count >= 2:
+                        _gzip_file(f"{base}.1", f"{base}.2.gz")
+                    else:
+                        os.remove(f"{base}.1")
+                os.replace(base, f"{base}.1")
+            self.reopenIfNeeded()
+
+
+def _gzip_file(source, dest):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _make_file_handler():
+    return SharedRotatingFileHandler(LOG_PATH)
+
+
+_ring_buffer = RingBufferHandler()
+
+
+def _configure():
+    root = logging.getLogger()
+    if getattr(root, '_stock_trader_handlers', False):
+        return
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in (_make_file_handler(), _ring_buffer):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    if root.level == logging.NOTSET or root.level > logging.INFO:
+        root.setLevel(logging.INFO)
+    root._stock_trader_handlers = True
+
+
+_configure()
+_decisions = logging.getLogger(DECISION_LOGGER)
 
 def log_trade_action(action, symbol, quantity, price, reason=None):
     msg = f"TRADE: {action} {quantity} {symbol} @ {price}"
     if reason:
         msg += f" | Reason: {reason}"
-    logging.info(msg)
+    _decisions.info(msg)
 
 def log_llm_decision(question, answer):
-    logging.info(f"LLM: Q: {question} | A: {answer}")
+    _decisions.info(f"LLM: Q: {question} | A: {answer}")
 
-def get_recent_logs(n=50):
-    if not os.path.exists(LOG_PATH):
+def tail_lines(path, n, block_size=8192):
+    """从文件末尾按固定大小块反向读取，返回最后 n 行（保留换行符），耗时与文件大小无关。"""
+    if n <= 0 or not os.path.exists(path):
         return []
-    with open(LOG_PATH, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # 需要 n 个完整行，即至少 n+1 个换行（最后一行可能以换行结尾）
+        while position > 0 and data.count(b'\n') <= n:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    lines = data.decode('utf-8', errors='replace').splitlines(keepends=True)
     return lines[-n:]
+
+@instrumented('logs')
+def get_recent_logs(n=50):
+    """
+    返回最近 n 行日志：单进程时内存环形缓冲区足够即直接返回，否则从日志文件末尾读取。
+    多个 worker 时缓冲区只有本进程的日志，总是读文件。
+    """
+    if WEB_WORKERS > 1:
+        return tail_lines(LOG_PATH, n)
+    lines = _ring_buffer.tail(n)
+    if len(lines) >= n:
+        return lines
+    return tail_lines(LOG_PATH, n)
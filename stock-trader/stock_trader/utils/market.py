@@ -1,33 +1,53 @@
-from stock_trader.data import get_stock_price
+from stock_trader.config import DASHBOARD_MARKET_ROWS
+from stock_trader.data import get_stock_prices
+from stock_trader.services.symbol_registry import get_symbol_registry
 
 def get_symbols():
-    """Return the list of supported stock and crypto symbols."""
-    return [
-        "AAPL", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "TSLA", "BTC-USD", "ETH-USD"
-    ]
+    """Return the list of supported stock and crypto symbols from the symbol registry."""
+    return get_symbol_registry().symbols()
 
-def get_market_rows(symbols):
-    """Return a list of dicts with symbol and current price."""
-    return [{"Symbol": symbol, "Price": get_stock_price(symbol)} for symbol in symbols]
+def get_watchlist(position_rows=(), limit=DASHBOARD_MARKET_ROWS):
+    """
+    Return the symbols shown on the dashboard: held symbols first, then the
+    registry in configured order, capped at limit so rendering and quote
+    fetches do not grow with the size of the registry.
+    """
+    watchlist = dict.fromkeys(row["Symbol"] for row in position_rows)
+    for symbol in get_symbol_registry().symbols():
+        if len(watchlist) >= limit:
+            break
+        watchlist.setdefault(symbol)
+    return list(watchlist)
+
+def get_market_rows(symbols, snapshot=None):
+    """
+    Return a list of dicts with symbol and current price.
+    Prices come from the collector snapshot when given; any missing symbols
+    are filled with one batched quote request.
+    """
+    prices = {symbol: info.get('price') for symbol, info in (snapshot or {}).items()}
+    missing = [symbol for symbol in symbols if prices.get(symbol) is None]
+    if missing:
+        prices.update(get_stock_prices(missing))
+    return [{"Symbol": symbol, "Price": prices.get(symbol)} for symbol in symbols]
 
 def get_asset_categories():
     """Return stock and crypto symbol categories as tuple."""
-    stock_symbols = ["AAPL", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "TSLA"]
-    crypto_symbols = ["BTC-USD", "ETH-USD"]
-    return stock_symbols, crypto_symbols
+    registry = get_symbol_registry()
+    return registry.by_asset_class('stock'), registry.by_asset_class('crypto')
 
 def summarize_asset_values(position_rows):
     """Calculate buy and market values for stocks and cryptos."""
-    stock_symbols, crypto_symbols = get_asset_categories()
+    registry = get_symbol_registry()
     stock_buy = stock_market = crypto_buy = crypto_market = 0
     for row in position_rows:
-        symbol = row["Symbol"]
+        asset_class = registry.asset_class(row["Symbol"])
         buy_cost = row["Buy Price"] * row["Quantity"]
         market_value = row["Market Value"]
-        if symbol in stock_symbols:
+        if asset_class == 'stock':
             stock_buy += buy_cost
             stock_market += market_value
-        elif symbol in crypto_symbols:
+        elif asset_class == 'crypto':
             crypto_buy += buy_cost
             crypto_market += market_value
     return stock_buy, stock_market, crypto_buy, crypto_market
@@ -1,23 +1,199 @@
-
+import abc
 import os
 import csv
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import yfinance as yf
 
-def fetch_market_data(symbols):
-    data = {}
-    for symbol in symbols:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        data[symbol] = {
+from stock_trader.utils.instrumentation import instrumented
+from stock_trader.config import (
+    MARKET_FETCH_TIMEOUT, MARKET_FETCH_CONCURRENCY, MARKET_FETCH_RETRIES, MARKET_FETCH_BACKOFF, QUOTE_PROVIDER,
+)
+
+"""
+行情快照抓取。
+
+每个 symbol 的数据源调用是阻塞的（yfinance 的 ticker.info），这里用 asyncio 调度、
+经专用线程池执行：并发数有上限，每次请求有超时，失败按指数退避重试，
+单个 symbol 失败或超时只会让它缺席本次快照，不会拖住其余 symbol。
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataProvider(abc.ABC):
+    """快照数据源接口：fetch_one(symbol) 返回 {'price', 'volatility', 'volume'}，失败时抛异常。阻塞调用。"""
+
+    @abc.abstractmethod
+    def fetch_one(self, symbol):
+        ...
+
+
+class YahooMarketDataProvider(MarketDataProvider):
+    def fetch_one(self, symbol):
+        import yfinance as yf  # 导入较慢（含 pandas），首次抓取时再导入
+        info = yf.Ticker(symbol).info
+        return {
             'price': info.get('regularMarketPrice'),
             'volatility': info.get('regularMarketDayHigh', 0) - info.get('regularMarketDayLow', 0),
             'volume': info.get('regularMarketVolume'),
-            'timestamp': datetime.utcnow().isoformat()
         }
-    return data
 
 
+class FakeMarketDataProvider(MarketDataProvider):
+    """
+    本地假数据源，用于测试和基准。latency 可为秒数或 {symbol: 秒数}；
+    failures 为 {symbol: 前几次调用失败的次数}（负数表示一直失败）。记录调用次数和最大并发。
+    """
+
+    def __init__(self, prices=None, default=100.0, latency=0.0, failures=None):
+        self.prices = dict(prices or {})
+        self.default = default
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.calls = {}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def fetch_one(self, symbol):
+        with self._lock:
+            attempt = self.calls[symbol] = self.calls.get(symbol, 0) + 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            latency = self.latency.get(symbol, 0.0) if isinstance(self.latency, dict) else self.latency
+            if latency:
+                time.sleep(latency)
+            failures = self.failures.get(symbol, 0)
+            if failures < 0 or attempt <= failures:
+                raise RuntimeError(f"fake failure for {symbol}")
+            price = self.prices.get(symbol, self.default)
+            return {'price': price, 'volatility': 0.0, 'volume': 0}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class FetchResult:
+    """一次抓取的结果：data 为成功的 symbol，errors 为失败原因，latencies 为各 symbol 最后一次尝试的耗时（秒）。"""
+
+    def __init__(self):
+        self.data = {}
+        self.errors = {}
+        self.latencies = {}
+
+    @property
+    def complete(self):
+        return not self.errors
+
+
+class AsyncMarketDataFetcher:
+    """
+    并发抓取多个 symbol 的快照。asyncio 负责超时、并发上限和退避，
+    阻塞的数据源调用在线程池中执行。超时的调用无法中断，会继续占用线程直到返回，
+    因此线程池比并发上限多留出一倍的线程。
+    """
+
+    def __init__(self, provider=None, timeout=MARKET_FETCH_TIMEOUT, max_concurrency=MARKET_FETCH_CONCURRENCY,
+                 retries=MARKET_FETCH_RETRIES, backoff=MARKET_FETCH_BACKOFF):
+        self.provider = provider or YahooMarketDataProvider()
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = None
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency * 2,
+                                                    thread_name_prefix='market-fetch')
+            return self._executor
+
+    def fetch(self, symbols):
+        """同步入口（供采集线程调用）：返回 FetchResult。"""
+        return asyncio.run(self.fetch_async(symbols))
+
+    async def fetch_async(self, symbols):
+        result = FetchResult()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        symbols = list(dict.fromkeys(symbols))
+        await asyncio.gather(*(self._fetch_symbol(symbol, semaphore, result) for symbol in symbols))
+        if result.errors:
+            logger.warning("[Market] Fetched %d/%d symbols; failed: %s", len(result.data), len(symbols), result.errors)
+        return result
+
+    async def _fetch_symbol(self, symbol, semaphore, result):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    info = await asyncio.wait_for(loop.run_in_executor(executor, self.provider.fetch_one, symbol),
+                                                  self.timeout)
+                    error = None
+                except asyncio.TimeoutError:
+                    info, error = None, f"timeout after {self.timeout}s"
+                except Exception as e:
+                    info, error = None, str(e) or type(e).__name__
+                latency = time.perf_counter() - start
+            result.latencies[symbol] = latency
+            self._record(symbol, latency, error)
+            if error is None:
+                result.data[symbol] = {**info, 'timestamp': datetime.utcnow().isoformat()}
+                result.errors.pop(symbol, None)
+                return
+            result.errors[symbol] = error
+
+    def _record(self, symbol, latency, error):
+        with self._lock:
+            stats = self._stats.setdefault(symbol, {'requests': 0, 'failures': 0, 'total_latency': 0.0,
+                                                    'max_latency': 0.0, 'last_latency': 0.0, 'last_error': None})
+            stats['requests'] += 1
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            stats['last_latency'] = latency
+            if error is not None:
+                stats['failures'] += 1
+                stats['last_error'] = error
+
+    def stats(self):
+        """各 symbol 的请求次数、失败次数和延迟（秒）。"""
+        with self._lock:
+            return {
+                symbol: {**stats, 'avg_latency': stats['total_latency'] / stats['requests']}
+                for symbol, stats in self._stats.items()
+            }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False)
+
+
+_fetcher = AsyncMarketDataFetcher(FakeMarketDataProvider() if QUOTE_PROVIDER == 'fake' else None)
+
+
+def get_market_fetcher():
+    return _fetcher
+
+
+def fetch_market_data(symbols):
+    """抓取 symbols 的快照，返回 {symbol: {...}}；失败或超时的 symbol 不在结果中。"""
+    return _fetcher.fetch(symbols).data
+
+
+@instrumented('csv')
 def append_market_data_csv(new_data, file_path):
     """
     Appends new market data to a CSV file. Each row: date, symbol, price, volatility, volume, timestamp
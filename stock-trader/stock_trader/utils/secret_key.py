@@ -0,0 +1,38 @@
+import os
+import secrets
+import time
+
+from stock_trader.config import SECRET_KEY_PATH
+
+
+def load_secret_key(path=SECRET_KEY_PATH):
+    """
+    返回 Flask secret key：优先使用环境变量 FLASK_SECRET_KEY；否则读取 path，
+    文件不存在时生成一次并以 0600 权限写入。多个 worker 同时启动时只有一个能创建文件，
+    其余读取同一个 key，因此 session 和 CSRF token 在各 worker 间通用。
+    """
+    key = os.environ.get('FLASK_SECRET_KEY')
+    if key:
+        return key
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return _read_key(path)
+    key = secrets.token_urlsafe(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+        f.flush()
+        os.fsync(f.fileno())
+    return key
+
+
+def _read_key(path, attempts=50):
+    # 另一个进程可能刚创建文件还没写完
+    for _ in range(attempts):
+        with open(path, 'r') as f:
+            key = f.read().strip()
+        if key:
+            return key
+        time.sleep(0.01)
+    raise RuntimeError(f"Secret key file {path} is empty")
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+# 测试期间的日志、共享状态库和 secret key 写到临时目录，不改动仓库中的文件（需在导入 stock_trader 之前设置）
+_tmp_dir = tempfile.mkdtemp(prefix='stocktrader-tests-')
+os.environ.setdefault('STOCKTRADER_LOG_DIR', os.path.join(_tmp_dir, 'logs'))
+os.environ.setdefault('STOCKTRADER_STATE_DB_PATH', os.path.join(_tmp_dir, 'state.db'))
+os.environ.setdefault('STOCKTRADER_SECRET_KEY_FILE', os.path.join(_tmp_dir, 'secret_key'))
+
+import pytest
+from stock_trader import data
+
+
+@pytest.fixture(autouse=True)
+def fake_quotes():
+    """所有测试使用本地假行情，避免访问网络。"""
+    provider = data.FakeQuoteProvider()
+    original = data.get_quote_service().provider
+    data.set_quote_provider(provider)
+    yield provider
+    data.set_quote_provider(original)
@@ -0,0 +1,97 @@
+import pytest
+
+from stock_trader.services import trade_service
+from stock_trader.services.backtest import (
+    Backtester, CachedLLMStrategy, MomentumStrategy, Strategy, snapshots_from_rows, snapshots_from_store,
+)
+from stock_trader.services.market_history import MarketHistoryStore
+
+
+class ScriptedStrategy(Strategy):
+    def __init__(self, orders):
+        self.orders = orders
+
+    def on_snapshot(self, date, prices, portfolio):
+        return self.orders.get(date, [])
+
+
+SNAPSHOTS = [
+    ('2024-01-01 09:30:00', {'AAPL': 100.0, 'MSFT': 50.0}),
+    ('2024-01-01 09:31:00', {'AAPL': 110.0, 'MSFT': 50.0}),
+    ('2024-01-01 09:32:00', {'AAPL': 120.0, 'MSFT': 40.0}),
+]
+
+
+def test_backtest_records_fills_in_isolated_db(tmp_path, monkeypatch):
+    live_db = str(tmp_path / 'live.db')
+    monkeypatch.setattr(trade_service, 'DB_NAME', live_db)
+    strategy = ScriptedStrategy({
+        '2024-01-01 09:30:00': [('AAPL', 'Buy', 10), ('MSFT', 'Buy', 100)],
+        '2024-01-01 09:31:00': [('AAPL', 'Sell', 4)],
+    })
+    events = []
+    trade_service.add_trade_listener(events.append)
+    try:
+        result = Backtester(strategy, initial_fund=2000).run(SNAPSHOTS)
+    finally:
+        trade_service.remove_trade_listener(events.append)
+
+    # MSFT 买单超出现金被拒绝；AAPL 买 10 @100，卖 4 @110，剩 6 股按 120 估值
+    assert result.trade_count == 2
+    assert result.rejected_orders == 1
+    assert [equity for _, equity in result.equity_curve] == [2000, 2100, 2160]
+    assert result.final_equity == 2160
+    assert result.roi == pytest.approx(0.08)
+    assert result.snapshots == 3 and result.snapshots_per_second > 0
+    assert [(p.symbol, p.quantity, p.cost_basis) for p in result.positions] == [('AAPL', 6, 600.0)]
+    # 线上库不受影响
+    assert trade_service.DB_NAME == live_db
+    assert trade_service.get_trades() == []
+    # 回测成交不推送到线上 /events
+    assert events == []
+
+
+def test_sells_are_clamped_to_holdings():
+    strategy = ScriptedStrategy({
+        '2024-01-01 09:30:00': [('AAPL', 'Sell', 1), ('AAPL', 'Buy', 2)],
+        '2024-01-01 09:31:00': [('AAPL', 'Sell', 5)],
+    })
+    result = Backtester(strategy, initial_fund=1000).run(SNAPSHOTS)
+    assert result.rejected_orders == 1
+    assert result.trade_count == 2
+    assert [(p.symbol, p.quantity, p.sell_income) for p in result.positions] == [('AAPL', 0, 220.0)]
+    assert result.final_equity == 1000 - 200 + 220
+
+
+def test_cached_llm_strategy_replays_decisions():
+    strategy = CachedLLMStrategy({
+        '2024-01-01 09:30:00': '建议买入 AAPL',
+        '2024-01-01 09:32:00': 'Sell AAPL now',
+    })
+    result = Backtester(strategy, initial_fund=1000).run(SNAPSHOTS)
+    assert result.trade_count == 2
+    assert result.final_equity == 1000 - 100 + 120
+
+
+def test_momentum_strategy_and_store_replay(tmp_path):
+    store = MarketHistoryStore(str(tmp_path / 'market.db'))
+    store.init()
+    for date, prices in SNAPSHOTS:
+        store.append_snapshot({s: {'price': p} for s, p in prices.items()}, date_str=date)
+    store.append_snapshot({'AAPL': {'price': None}}, date_str='2024-01-01 09:33:00')
+
+    snapshots = list(snapshots_from_store(store))
+    assert snapshots == SNAPSHOTS
+    result = Backtester(MomentumStrategy(lookback=1, threshold=0.05), initial_fund=1000).run(snapshots)
+    # 09:31 AAPL 涨 10% 买入；09:32 再涨买入；MSFT 跌 20% 但无持仓不卖
+    assert result.trade_count == 2
+    assert result.positions[0].quantity == 2
+
+
+def test_snapshots_from_rows_sorts_and_skips_missing_prices():
+    rows = [
+        {'date': '2024-01-02', 'symbol': 'AAPL', 'price': '101.5'},
+        {'date': '2024-01-01', 'symbol': 'AAPL', 'price': '100'},
+        {'date': '2024-01-01', 'symbol': 'MSFT', 'price': ''},
+    ]
+    assert list(snapshots_from_rows(rows)) == [('2024-01-01', {'AAPL': 100.0}), ('2024-01-02', {'AAPL': 101.5})]
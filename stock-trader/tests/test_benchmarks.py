@@ -0,0 +1,39 @@
+import importlib.util
+import json
+import os
+
+from stock_trader.services import trade_service
+from stock_trader.utils import chart
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'benchmark_hot_paths.py')
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location('benchmark_hot_paths', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_compare_flags_only_meaningful_slowdowns():
+    bench = load_script()
+    baseline = {'a': {'median_ms': 10.0}, 'b': {'median_ms': 0.01}, 'c': {'median_ms': 10.0}}
+    results = {'a': {'median_ms': 14.0}, 'b': {'median_ms': 0.05}, 'c': {'median_ms': 11.0}, 'new': {'median_ms': 1.0}}
+    assert [r[0] for r in bench.compare(results, baseline, threshold=0.25)] == ['a']
+
+
+def test_suite_runs_and_detects_regression(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', trade_service.DB_NAME)
+    monkeypatch.setattr(chart, '_chart_cache', chart._chart_cache)
+    bench = load_script()
+    baseline_path = tmp_path / 'baseline.json'
+    only = ['--only', 'calculate_positions_and_pnl', 'get_trades_page', 'record_trade']
+    assert bench.main(['--size', '200', '--repeat', '1', '--save-baseline', str(baseline_path)] + only) == 0
+    stored = json.loads(baseline_path.read_text())
+    assert stored['size'] == 200 and set(stored['results']) == {'calculate_positions_and_pnl', 'get_trades_page', 'record_trade'}
+
+    for result in stored['results'].values():
+        result['median_ms'] = 0.0001
+    baseline_path.write_text(json.dumps(stored))
+    assert bench.main(['--size', '200', '--repeat', '1', '--compare', str(baseline_path),
+                       '--min-delta-ms', '0'] + only) == 1
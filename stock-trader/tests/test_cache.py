@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+
+from stock_trader.utils.cache import SharedCache, TTLCache, hash_key
+from stock_trader.utils.secret_key import load_secret_key
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # 'b' 最久未使用，被淘汰
+    assert cache.get('b') is None
+    now[0] = 11
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+def test_ttl_cache_persists_to_disk(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    key = hash_key('prompt', '2025-01-01', ['AAPL'], 'model', {'max_new_tokens': 256})
+    TTLCache(ttl=60, path=path).set(key, '建议买入AAPL')
+    assert TTLCache(ttl=60, path=path).get(key) == '建议买入AAPL'
+
+def test_shared_cache_ttl_eviction_and_claims(tmp_path):
+    now = [0.0]
+    path = str(tmp_path / 'state.db')
+    cache = SharedCache(path, 'test', maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set('a', {'answer': 1})
+    now[0] = 1
+    cache.set('b', 2)
+    now[0] = 2
+    assert cache.get('a') == {'answer': 1}
+    now[0] = 3
+    cache.set('c', 3)  # 'b' 最久未访问，被淘汰
+    assert cache.get('b') is None
+    # 另一个实例（模拟另一个 worker）看到同一份数据，命名空间互不影响
+    assert SharedCache(path, 'test', clock=lambda: now[0]).get('c') == 3
+    assert SharedCache(path, 'other').get('c') is None
+
+    assert cache.add('trade') is True
+    assert SharedCache(path, 'test', ttl=10, clock=lambda: now[0]).add('trade') is False
+    now[0] = 20
+    assert cache.get('a') is None
+    assert cache.add('trade') is True  # 过期后可重新占用
+
+
+def _claim(path, key, results):
+    results.put(SharedCache(path, 'claims', ttl=60).add(key))
+
+
+def test_shared_cache_add_is_exclusive_across_processes(tmp_path):
+    path = str(tmp_path / 'state.db')
+    SharedCache(path, 'claims').clear()
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_claim, args=(path, 'AAPL-Buy', results)) for _ in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(60)
+    assert sorted(results.get(timeout=5) for _ in processes) == [False, False, False, True]
+
+
+def test_secret_key_is_created_once_and_shared(tmp_path, monkeypatch):
+    monkeypatch.delenv('FLASK_SECRET_KEY', raising=False)
+    path = str(tmp_path / 'secret_key')
+    key = load_secret_key(path)
+    assert key and load_secret_key(path) == key
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    monkeypatch.setenv('FLASK_SECRET_KEY', 'from-env')
+    assert load_secret_key(path) == 'from-env'
@@ -0,0 +1,22 @@
+from stock_trader.utils import chart
+from stock_trader.utils.cache import TTLCache
+
+
+def test_chart_rendering_is_memoized_on_inputs(monkeypatch):
+    monkeypatch.setattr(chart, '_chart_cache', TTLCache(maxsize=8))
+    draws = []
+    original = chart._draw_asset_bar_chart
+    monkeypatch.setattr(chart, '_draw_asset_bar_chart', lambda *args: draws.append(args) or original(*args))
+    first = chart.render_asset_bar_chart(100.0, 120.0, 50.0, 40.0, fmt='svg')
+    second = chart.render_asset_bar_chart(100.0, 120.0, 50.0, 40.0, fmt='svg')
+    assert first == second and first.lstrip().startswith(b'<?xml')
+    assert len(draws) == 1
+    chart.render_asset_bar_chart(100.0, 121.0, 50.0, 40.0, fmt='svg')
+    assert len(draws) == 2
+
+def test_position_pie_chart_empty_and_series():
+    rows = [{'Symbol': 'AAPL', 'Market Value': 0}]
+    assert chart.render_position_pie_chart(rows) is None
+    assert chart.generate_position_pie_chart([]) is None
+    series = chart.chart_series(1, 2, 3, 4, [{'Symbol': 'AAPL', 'Market Value': 10}])
+    assert series['position_pie'] == {'labels': ['AAPL'], 'market_value': [10]}
@@ -0,0 +1,66 @@
+import time
+import pytest
+from stock_trader.data import QuoteService, FakeQuoteProvider
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_quote_service_batches_and_caches():
+    provider = FakeQuoteProvider({'AAPL': 200.0, 'MSFT': 400.0})
+    service = QuoteService(provider, ttl=60, stale_ttl=0, clock=FakeClock())
+    assert service.get_prices(['AAPL', 'MSFT', 'AAPL']) == {'AAPL': 200.0, 'MSFT': 400.0}
+    assert service.get_price('MSFT') == 400.0
+    assert provider.calls == 1
+
+def test_quote_service_expires_after_ttl():
+    provider = FakeQuoteProvider({'AAPL': 200.0})
+    clock = FakeClock()
+    service = QuoteService(provider, ttl=60, stale_ttl=0, clock=clock)
+    service.get_price('AAPL')
+    provider.prices['AAPL'] = 210.0
+    clock.now = 61
+    assert service.get_price('AAPL') == 210.0
+    assert provider.calls == 2
+
+def test_quote_service_serves_stale_while_revalidating():
+    provider = FakeQuoteProvider({'AAPL': 200.0})
+    clock = FakeClock()
+    service = QuoteService(provider, ttl=60, stale_ttl=120, clock=clock)
+    service.get_price('AAPL')
+    provider.prices['AAPL'] = 210.0
+    clock.now = 90
+    assert service.get_price('AAPL') == 200.0
+    for _ in range(100):
+        if not service._refreshing:
+            break
+        time.sleep(0.01)
+    assert service.get_price('AAPL') == 210.0
+
+def test_failed_refresh_keeps_cached_price_and_backs_off():
+    provider = FakeQuoteProvider({'AAPL': 200.0, 'BAD': None})
+    clock = FakeClock()
+    service = QuoteService(provider, ttl=60, stale_ttl=120, negative_ttl=5, clock=clock)
+    assert service.get_prices(['AAPL', 'BAD']) == {'AAPL': 200.0, 'BAD': None}
+    assert service.get_price('BAD') is None
+    assert provider.calls == 1  # 失败结果在 negative_ttl 内不重试
+    provider.prices['AAPL'] = None  # 数据源故障
+    clock.now = 61
+    service._refresh(['AAPL'])
+    assert service.get_price('AAPL') == 200.0  # 刷新失败不覆盖已缓存的价格
+    clock.now = 67
+    provider.prices['BAD'] = 5.0
+    assert service.get_price('BAD') == 5.0
+
+def test_providers_are_abstract():
+    from stock_trader.data import QuoteProvider
+    from stock_trader.utils.market_data import MarketDataProvider
+    with pytest.raises(TypeError):
+        QuoteProvider()
+    with pytest.raises(TypeError):
+        MarketDataProvider()
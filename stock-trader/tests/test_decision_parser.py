@@ -0,0 +1,66 @@
+import json
+
+from stock_trader.services.decision_parser import DECISION_SCHEMA, DecisionParser, TradeIntent, parse_decision
+
+SYMBOLS = ['AAPL', 'MSFT', 'META', 'BTC-USD', 'BRK.B']
+
+
+def test_symbols_match_on_word_boundaries_only():
+    assert parse_decision('Buy METAL futures, the metadata looks good', SYMBOLS) == []
+    assert parse_decision('Buy META, not XMETA', SYMBOLS) == [TradeIntent('Buy', 'META', 1)]
+    assert parse_decision('建议买入BTC-USD和BRK.B。', SYMBOLS) == [
+        TradeIntent('Buy', 'BTC-USD', 1), TradeIntent('Buy', 'BRK.B', 1)]
+
+
+def test_returns_every_intent_with_quantities():
+    text = '买入10股AAPL，卖出 MSFT 3 shares。META 表现强势，建议加仓。buy 2 BRK.B'
+    assert parse_decision(text, SYMBOLS) == [
+        TradeIntent('Buy', 'AAPL', 10), TradeIntent('Sell', 'MSFT', 3),
+        TradeIntent('Buy', 'META', 1), TradeIntent('Buy', 'BRK.B', 2)]
+
+
+def test_sentences_and_negation_limit_actions():
+    assert parse_decision('建议买入AAPL，5天后出售，预计升值100。MSFT 一般。', SYMBOLS) == [TradeIntent('Buy', 'AAPL', 1)]
+    assert parse_decision('不要卖出AAPL，买入MSFT', SYMBOLS) == [TradeIntent('Buy', 'MSFT', 1)]
+    assert parse_decision('Buy AAPL. Buy AAPL again!', SYMBOLS) == [TradeIntent('Buy', 'AAPL', 1)]
+
+
+def test_hold_wording_and_prices_are_not_trades():
+    assert parse_decision('In the short term, AAPL looks strong; I would hold.', SYMBOLS) == []
+    assert parse_decision('As long as MSFT stays above support, hold.', SYMBOLS) == []
+    # 价格不是数量；只有夹在动作词和 symbol 之间的裸数字才是数量
+    assert parse_decision('sell at 200 MSFT', SYMBOLS) == [TradeIntent('Sell', 'MSFT', 1)]
+    assert parse_decision('目标价 150 AAPL，建议买入', SYMBOLS) == [TradeIntent('Buy', 'AAPL', 1)]
+    assert parse_decision('Buy AAPL 20 MSFT', SYMBOLS) == [TradeIntent('Buy', 'AAPL', 1), TradeIntent('Buy', 'MSFT', 1)]
+    assert parse_decision('sell 200 MSFT', SYMBOLS) == [TradeIntent('Sell', 'MSFT', 200)]
+
+
+def test_json_output_takes_precedence_and_is_validated():
+    payload = {'intents': [{'action': 'sell', 'symbol': 'msft', 'quantity': 4},
+                           {'action': 'Buy', 'symbol': 'UNKNOWN'},
+                           {'action': 'Hold', 'symbol': 'AAPL'}]}
+    text = '建议买入AAPL。\n```json\n' + json.dumps(payload) + '\n```'
+    assert parse_decision(text, SYMBOLS) == [TradeIntent('Sell', 'MSFT', 4)]
+    assert parse_decision('{"intents": []} 买入AAPL', SYMBOLS) == []
+    assert parse_decision('{"action": "buy", "symbol": "AAPL", "quantity": 2}', SYMBOLS) == [TradeIntent('Buy', 'AAPL', 2)]
+    # 不符合 schema 的 JSON 回退到文本扫描
+    assert parse_decision('{"note": "x"} Sell AAPL', SYMBOLS) == [TradeIntent('Sell', 'AAPL', 1)]
+    assert DECISION_SCHEMA['properties']['intents']['items']['required'] == ['action', 'symbol']
+
+
+def test_parser_accepts_any_container_and_default_quantity():
+    parser = DecisionParser({'AAPL': 1.0}, default_quantity=5)
+    assert parser.parse('Sell AAPL now') == [TradeIntent('Sell', 'AAPL', 5)]
+    assert parser.parse(None) == []
+
+
+def test_benchmark_script_runs(capsys):
+    import importlib.util
+    import os
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts',
+                        'benchmark_decision_parser.py')
+    spec = importlib.util.spec_from_file_location('benchmark_decision_parser', path)
+    bench = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench)
+    assert bench.main(['--symbols', '200', '--chars', '300', '--repeat', '1']) == 0
+    assert '5/5' in capsys.readouterr().out
@@ -0,0 +1,109 @@
+import logging
+import os
+import subprocess
+import sys
+
+from stock_trader.services import trade_service
+from stock_trader.services.event_bus import EventBus, EventLogHandler, sse_messages
+from stock_trader.services.market_collector import MarketDataCollector
+
+
+def test_events_reach_other_processes_and_resume_after_id(tmp_path):
+    path = str(tmp_path / 'state.db')
+    publisher = EventBus(path, poll_interval=0.01)
+    subscriber = EventBus(path, poll_interval=0.01)  # 另一个 worker 上的实例
+    start = subscriber.latest_id()
+    first = publisher.publish('tick', {'prices': {'AAPL': 101.0}})
+    events = subscriber.wait(start, timeout=5)
+    assert [(e[0], e[1]) for e in events] == [(first, 'tick')]
+    second = publisher.publish('log', {'lines': ['hello\n']})
+    assert [e[0] for e in subscriber.wait(first, timeout=5)] == [second]
+    # 重连：Last-Event-ID 早于本进程缓冲区时从库中补读
+    late = EventBus(path, poll_interval=0.01)
+    assert [e[0] for e in late.wait(0, timeout=0)] == [first, second]
+    assert late.wait(second, timeout=0.05) == []
+
+
+def test_sse_messages_encode_events_and_heartbeats(tmp_path):
+    bus = EventBus(str(tmp_path / 'state.db'), poll_interval=0.01)
+    event_id = bus.publish('fills', {'version': 1})
+    messages = sse_messages(bus, last_id=0, heartbeat=0.01)
+    assert next(messages) == 'retry: 3000\n\n'
+    assert next(messages) == f'id: {event_id}\nevent: fills\ndata: {{"version": 1}}\n\n'
+    assert next(messages) == ': keep-alive\n\n'
+
+
+def test_record_trades_notifies_listeners_with_positions_and_cash(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    trade_service.init_db()
+    events = []
+    trade_service.add_trade_listener(events.append)
+    try:
+        trade_service.record_trades([('AAPL', 'Buy', 10, 100.0), ('AAPL', 'Sell', 4, 120.0)])
+    finally:
+        trade_service.remove_trade_listener(events.append)
+    trade_service.record_trade('AAPL', 'Buy', 1, 1.0)  # 已移除监听器
+    assert len(events) == 1
+    event = events[0]
+    assert [t['type'] for t in event['trades']] == ['Buy', 'Sell']
+    assert event['version'] == event['trades'][-1]['id']
+    assert event['positions'] == [{'symbol': 'AAPL', 'quantity': 6, 'cost_basis': 600.0,
+                                   'first_buy_date': event['trades'][0]['timestamp']}]
+    assert (event['buy_cost'], event['sell_income']) == (1000.0, 480.0)
+
+
+def test_collector_publishes_ticks_and_log_handler_publishes_lines(tmp_path):
+    bus = EventBus(str(tmp_path / 'state.db'))
+    snapshots = []
+    collector = MarketDataCollector(interval=60, symbols=lambda: ['AAPL'],
+                                    fetcher=lambda symbols: {'AAPL': {'price': 10.0}},
+                                    writer=lambda data: None, clock=lambda: 0.0, on_snapshot=snapshots.append)
+    assert collector.collect_once()
+    assert snapshots == [{'AAPL': {'price': 10.0}}]
+
+    handler = EventLogHandler(bus)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler.handle(logging.LogRecord('stock_trader.test', logging.INFO, __file__, 1, 'line1\nline2', None, None))
+    handler.handle(logging.LogRecord('werkzeug', logging.INFO, __file__, 1, 'GET /events', None, None))
+    assert [e[1:] for e in bus.wait(0, timeout=0)] == [('log', '{"lines": ["line1\\n", "line2\\n"]}')]
+
+
+def test_only_decision_log_lines_are_published(tmp_path):
+    from stock_trader.utils.logger import DECISION_LOGGER, log_trade_action
+    bus = EventBus(str(tmp_path / 'state.db'))
+    handler = EventLogHandler(bus)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.getLogger(DECISION_LOGGER).addHandler(handler)
+    try:
+        log_trade_action('Buy', 'AAPL', 1, 10.0)
+        logging.getLogger('stock_trader.data').info('quote refresh')  # 普通模块日志不写状态库
+    finally:
+        logging.getLogger(DECISION_LOGGER).removeHandler(handler)
+    assert [e[2] for e in bus.wait(0, timeout=0)] == ['{"lines": ["TRADE: Buy 1 AAPL @ 10.0\\n"]}']
+
+
+def test_events_streams_are_capped_per_worker(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ,
+               STOCKTRADER_DB_PATH=str(tmp_path / 'trades.db'),
+               STOCKTRADER_MARKET_DB_PATH=str(tmp_path / 'market.db'),
+               STOCKTRADER_STATE_DB_PATH=str(tmp_path / 'state.db'),
+               STOCKTRADER_SECRET_KEY_FILE=str(tmp_path / 'secret_key'),
+               STOCKTRADER_LOG_DIR=str(tmp_path / 'logs'),
+               STOCKTRADER_COLLECTOR='0', STOCKTRADER_PRELOAD='0',
+               STOCKTRADER_EVENTS_MAX_STREAMS='1')
+    code = (
+        "import app\n"
+        "client = app.app.test_client()\n"
+        "first = client.get('/events')\n"
+        "assert first.status_code == 200\n"
+        "full = client.get('/events')\n"
+        "assert full.status_code == 503 and full.headers['Retry-After'] == '10'\n"
+        "assert full.get_data(as_text=True).startswith('retry:')\n"
+        "assert client.get('/api/symbols').status_code == 200  # 普通请求不受影响\n"
+        "first.close()  # 断开后释放名额\n"
+        "second = client.get('/events')\n"
+        "assert second.status_code == 200\n"
+        "second.close()\n"
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True, check=True)
@@ -0,0 +1,90 @@
+import statistics
+
+import pytest
+
+from stock_trader.services.feature_pipeline import FeaturePipeline, estimate_tokens
+from stock_trader.services.market_history import MarketHistoryStore
+
+
+def make_store(tmp_path, snapshots):
+    store = MarketHistoryStore(str(tmp_path / 'market.db'))
+    store.init()
+    for i, snapshot in enumerate(snapshots):
+        store.append_snapshot(snapshot, f'2025-01-01 00:00:{i:02d}')
+    return store
+
+
+def test_rolling_features_match_direct_computation(tmp_path):
+    prices = [100, 101, 99, 102, 104, 103, 107]
+    volumes = [10, 12, 11, 13, 12, 11, 40]
+    store = make_store(tmp_path, [{'AAPL': {'price': p, 'volume': v}} for p, v in zip(prices, volumes)])
+    pipeline = FeaturePipeline(store=store, window=4)
+    assert pipeline.update() == 5  # 只读取最近 window+1 个快照
+
+    (features,) = pipeline.features()
+    tail = prices[-5:]
+    returns = [b / a - 1 for a, b in zip(tail, tail[1:])]
+    assert features.price == 107
+    assert features.ret == pytest.approx(107 / 103 - 1)
+    assert features.window_return == pytest.approx(tail[-1] / tail[0] - 1)
+    assert features.volatility == pytest.approx(statistics.stdev(returns))
+    # 最新成交量与此前（窗口内）的成交量比较
+    previous = volumes[-5:-1]
+    assert features.volume_z == pytest.approx((40 - statistics.mean(previous)) / statistics.stdev(previous))
+
+
+def test_render_respects_budget_and_orders_by_surprise(tmp_path):
+    quiet = {f'S{i:03d}': {'price': 10.0, 'volume': 100} for i in range(200)}
+    snapshots = [dict(quiet, HOT={'price': 10.0 + i % 2, 'volume': 100 + i}) for i in range(5)]
+    snapshots.append(dict(quiet, HOT={'price': 20.0, 'volume': 10_000}))
+    pipeline = FeaturePipeline(store=make_store(tmp_path, snapshots), window=10)
+
+    rendered = pipeline.render(budget=200)
+    assert rendered.tokens == estimate_tokens(rendered.text) <= 200
+    assert rendered.symbols[0] == 'HOT'
+    assert rendered.omitted == 201 - len(rendered.symbols) > 0
+    assert f'另有 {rendered.omitted} 个 symbol' in rendered.text
+    assert pipeline.render(budget=200) is rendered  # 同一快照命中缓存
+
+    full = pipeline.render(budget=100_000)
+    assert full.omitted == 0 and len(full.symbols) == 201
+    assert full.text.count('\n') == 201 + 1  # 表头两行 + 每个 symbol 一行
+
+
+def test_render_picks_up_new_snapshots(tmp_path):
+    store = make_store(tmp_path, [{'AAPL': {'price': 1.0}}])
+    pipeline = FeaturePipeline(store=store)
+    assert pipeline.render().date == '2025-01-01 00:00:00'
+    store.append_snapshot({'AAPL': {'price': 2.0}}, '2025-01-02 00:00:00')
+    rendered = pipeline.render()
+    assert rendered.date == '2025-01-02 00:00:00'
+    assert 'AAPL|2.00|+100.00%|+100.00%' in rendered.text
+    assert FeaturePipeline(store=make_store(tmp_path / 'x', [])).render().text == ''
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('价格') == 2
+    assert estimate_tokens('AAPL|1.0') == 3
+
+
+def test_prompt_benchmark_script_runs(capsys):
+    import importlib.util
+    import os
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'benchmark_prompt.py')
+    spec = importlib.util.spec_from_file_location('benchmark_prompt', path)
+    bench = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench)
+    assert bench.main(['--symbols', '50', '--snapshots', '5', '--budget', '300']) == 0
+    assert 'legacy' in capsys.readouterr().out
+
+
+def test_prices_keep_fixed_point_and_absent_symbols_are_dropped(tmp_path):
+    store = make_store(tmp_path, [{'BTC-USD': {'price': 67234.5}, 'AAPL': {'price': 1234.56}, 'SHIB': {'price': 0.0000123},
+                                   'OLD': {'price': 5.0}},
+                                  {'BTC-USD': {'price': 67234.5}, 'AAPL': {'price': 1234.56}, 'SHIB': {'price': 0.0000123}}])
+    rendered = FeaturePipeline(store=store).render()
+    assert 'BTC-USD|67234.50|' in rendered.text
+    assert 'AAPL|1234.56|' in rendered.text
+    assert 'SHIB|0.0000123|' in rendered.text
+    assert 'OLD' not in rendered.text and sorted(rendered.symbols) == ['AAPL', 'BTC-USD', 'SHIB']
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# app.py 的导入耗时预算（秒），可用环境变量放宽（如慢速 CI）
+IMPORT_BUDGET_SECONDS = float(os.environ.get('STOCKTRADER_IMPORT_BUDGET', 1.0))
+HEAVY_MODULES = ('transformers', 'torch', 'matplotlib', 'yfinance', 'pandas')
+
+
+def run_python(tmp_path, code, *flags):
+    env = dict(os.environ,
+               STOCKTRADER_DB_PATH=str(tmp_path / 'trades.db'),
+               STOCKTRADER_MARKET_DB_PATH=str(tmp_path / 'market.db'),
+               STOCKTRADER_STATE_DB_PATH=str(tmp_path / 'state.db'),
+               STOCKTRADER_SECRET_KEY_FILE=str(tmp_path / 'secret_key'),
+               STOCKTRADER_LOG_DIR=str(tmp_path / 'logs'),
+               STOCKTRADER_COLLECTOR='0',
+               STOCKTRADER_PRELOAD='0')
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def test_app_import_is_lazy_and_within_budget(tmp_path):
+    result = run_python(tmp_path, 'import app', '-X', 'importtime')
+    # 每行格式：import time: self [us] | cumulative | imported package
+    timings = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                timings[name.strip()] = int(cumulative)
+    assert 'app' in timings
+    loaded_heavy = [name for name in timings if name.split('.')[0] in HEAVY_MODULES]
+    assert loaded_heavy == []
+    assert timings['app'] / 1e6 < IMPORT_BUDGET_SECONDS, f"import app took {timings['app'] / 1e6:.2f}s"
+
+
+def test_storage_is_initialized_on_first_request(tmp_path):
+    code = (
+        "import os, app\n"
+        "db = os.environ['STOCKTRADER_DB_PATH']\n"
+        "assert not os.path.exists(db)\n"
+        "assert app.app.test_client().get('/health/llm').status_code == 200\n"
+        "assert os.path.exists(db)\n"
+    )
+    run_python(tmp_path, code)
@@ -0,0 +1,55 @@
+import time
+
+from flask import Flask
+
+from stock_trader.utils import instrumentation
+from stock_trader.utils.instrumentation import Metrics, instrumented, span
+
+
+def make_app(**kwargs):
+    app = Flask(__name__)
+    metrics = instrumentation.init_app(app, metrics=Metrics(), **kwargs)
+
+    @instrumented('db')
+    def query():
+        time.sleep(0.002)
+
+    @app.route('/page')
+    def page():
+        query()
+        query()
+        with span('template'):
+            return 'ok'
+
+    return app, metrics
+
+
+def test_server_timing_and_prometheus_metrics():
+    app, metrics = make_app()
+    client = app.test_client()
+    response = client.get('/page')
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('db;dur=') and ', template;dur=' in timing and timing.split(', ')[-1].startswith('total;dur=')
+    assert float(timing.split(', ')[0].split('=')[1]) >= 4.0  # 两次 db 调用累加
+    metrics.register_gauge('stocktrader_test_gauge', 'Test gauge.', lambda: 3)
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'stocktrader_requests_total{endpoint="page",method="GET",status="200"} 1' in text
+    assert 'stocktrader_request_duration_seconds_count{endpoint="page",method="GET"} 1' in text
+    assert 'stocktrader_stage_duration_seconds_bucket{endpoint="page",stage="db",le="+Inf"} 1' in text
+    assert 'stocktrader_test_gauge 3' in text
+    # 请求之外的 span 不记录任何东西
+    with span('db'):
+        pass
+    assert instrumentation.current_trace() is None
+
+
+def test_slow_requests_are_profiled(tmp_path):
+    app, _ = make_app(profile_threshold=0.0, profile_dir=str(tmp_path))
+    app.test_client().get('/page')
+    dumps = list(tmp_path.glob('*-page-*ms.prof'))
+    assert len(dumps) == 1
+
+    app, _ = make_app(profile_threshold=60.0, profile_dir=str(tmp_path / 'fast'))
+    app.test_client().get('/page')
+    assert not (tmp_path / 'fast').exists()
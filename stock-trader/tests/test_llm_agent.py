@@ -0,0 +1,157 @@
+import threading
+import time
+import pytest
+from stock_trader.services.llm_agent import ModelRegistry, InferenceQueue, QueueFullError
+
+
+class FakeAgent:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def memory_footprint(self):
+        return 1024
+
+
+def test_registry_loads_model_once_across_threads():
+    created = []
+    registry = ModelRegistry('tiny-model', factory=lambda name: created.append(name) or FakeAgent(name))
+    agents = []
+    threads = [threading.Thread(target=lambda: agents.append(registry.get_agent())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert created == ['tiny-model']
+    assert len({id(a) for a in agents}) == 1
+    status = registry.status()
+    assert status['loaded'] is True
+    assert status['memory_bytes'] == 1024
+    assert status['load_seconds'] is not None
+
+def test_registry_unload_and_switch_model():
+    registry = ModelRegistry('a', factory=FakeAgent)
+    registry.get_agent()
+    registry.set_model('b')
+    assert registry.status()['loaded'] is False
+    assert registry.get_agent().model_name == 'b'
+    registry.unload()
+    assert registry.status()['loaded'] is False
+
+def test_inference_queue_coalesces_concurrent_prompts():
+    batches = []
+    def generate_batch(prompts):
+        batches.append(list(prompts))
+        return [p.upper() for p in prompts]
+    q = InferenceQueue(generate_batch, max_batch_size=4, max_wait=0.2, max_queue=16)
+    futures = [q.submit(f'p{i}') for i in range(4)]
+    assert [f.result(timeout=5) for f in futures] == ['P0', 'P1', 'P2', 'P3']
+    assert batches == [['p0', 'p1', 'p2', 'p3']]
+
+def test_inference_queue_rejects_when_full_and_times_out():
+    release = threading.Event()
+    def generate_batch(prompts):
+        release.wait(5)
+        return prompts
+    q = InferenceQueue(generate_batch, max_batch_size=1, max_wait=0, max_queue=1)
+    q.submit('running')
+    while q.depth():
+        pass
+    q.submit('queued')
+    with pytest.raises(QueueFullError):
+        q.submit('overflow')
+    release.set()
+    with pytest.raises(TimeoutError):
+        InferenceQueue(lambda prompts: time.sleep(1) or prompts, max_wait=0).generate('slow', timeout=0.05)
+
+def test_inference_queue_runs_streams_on_worker_without_overlap():
+    active, peak, batches = [0], [0], []
+    lock = threading.Lock()
+    def busy(fn):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            return fn()
+        finally:
+            with lock:
+                active[0] -= 1
+    def generate_batch(prompts):
+        batches.append(list(prompts))
+        return busy(lambda: time.sleep(0.05) or [p.upper() for p in prompts])
+    def generate_stream(prompt):
+        for ch in prompt:
+            yield busy(lambda: time.sleep(0.01) or ch)
+    q = InferenceQueue(generate_batch, generate_stream, max_batch_size=4, max_wait=0.1, max_queue=16)
+    futures = [q.submit('a')]
+    streams = [q.stream('xyz'), q.stream('uv')]
+    futures.append(q.submit('b'))
+    results = []
+    threads = [threading.Thread(target=lambda s=s: results.append(''.join(s))) for s in streams]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [f.result(timeout=5) for f in futures] == ['A', 'B']
+    assert sorted(results) == ['uv', 'xyz']
+    assert peak[0] == 1
+    assert all(len(b) == 1 for b in batches)
+    release = threading.Event()
+    full = InferenceQueue(lambda prompts: release.wait(5) and prompts, generate_stream, max_wait=0, max_queue=1)
+    full.submit('running')
+    while full.depth():
+        pass
+    full.submit('queued')
+    with pytest.raises(QueueFullError):
+        full.stream('x')
+    release.set()
+
+def test_auto_llm_analysis_reuses_cached_answer(tmp_path, monkeypatch):
+    from stock_trader.services import llm_agent, market_history
+    from stock_trader.utils.cache import TTLCache
+    store = market_history.MarketHistoryStore(str(tmp_path / 'market.db'))
+    store.init()
+    store.append_snapshot({'AAPL': {'price': 1.0, 'volatility': 0.1, 'volume': 10}}, '2025-01-01 00:00:00')
+    monkeypatch.setattr(market_history, '_store', store)
+    monkeypatch.setattr(llm_agent, '_response_cache', TTLCache(maxsize=4, ttl=60))
+    calls = []
+    monkeypatch.setattr(llm_agent, '_generate_answer', lambda prompt: calls.append(prompt) or '建议买入AAPL')
+    assert llm_agent.auto_llm_analysis() == '建议买入AAPL'
+    assert llm_agent.auto_llm_analysis() == '建议买入AAPL'
+    assert len(calls) == 1
+    assert llm_agent.get_response_cache().stats()['hits'] == 1
+
+def test_stream_auto_llm_analysis_yields_chunks_and_caches(tmp_path, monkeypatch):
+    from stock_trader.services import llm_agent, market_history
+    from stock_trader.utils.cache import TTLCache
+
+    class StreamingAgent(FakeAgent):
+        def build_prompt(self, question):
+            return question
+
+        def stream(self, prompt):
+            yield '建议'
+            yield '买入AAPL'
+
+    store = market_history.MarketHistoryStore(str(tmp_path / 'market.db'))
+    store.init()
+    store.append_snapshot({'AAPL': {'price': 1.0, 'volatility': 0.1, 'volume': 10}}, '2025-01-01 00:00:00')
+    monkeypatch.setattr(market_history, '_store', store)
+    monkeypatch.setattr(llm_agent, '_registry', ModelRegistry('fake', factory=StreamingAgent))
+    monkeypatch.setattr(llm_agent, '_response_cache', TTLCache(maxsize=4, ttl=60))
+    assert list(llm_agent.stream_auto_llm_analysis()) == ['建议', '买入AAPL']
+    assert list(llm_agent.stream_auto_llm_analysis()) == ['建议买入AAPL']
+
+def test_agent_stream_raises_pipe_errors_without_waiting_for_timeout():
+    pytest.importorskip('transformers')
+    from stock_trader.services.llm_agent import LLMTraderAgent
+
+    def failing_pipe(prompt, streamer):
+        raise RuntimeError('CUDA out of memory')
+
+    agent = object.__new__(LLMTraderAgent)  # 不加载模型
+    agent.tokenizer = None
+    agent.pipe = failing_pipe
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match='out of memory'):
+        list(agent.stream('prompt'))
+    assert time.monotonic() - start < 30  # 远小于 LLM_REQUEST_TIMEOUT
@@ -0,0 +1,40 @@
+import gzip
+import logging
+from stock_trader.utils import logger
+
+
+def test_tail_lines_reads_from_end(tmp_path):
+    path = tmp_path / 'trading.log'
+    path.write_text(''.join(f'line {i} 交易\n' for i in range(1000)), encoding='utf-8')
+    assert logger.tail_lines(str(path), 3, block_size=16) == ['line 997 交易\n', 'line 998 交易\n', 'line 999 交易\n']
+    assert len(logger.tail_lines(str(path), 5000)) == 1000
+    assert logger.tail_lines(str(tmp_path / 'missing.log'), 3) == []
+
+def test_ring_buffer_keeps_recent_lines():
+    handler = logger.RingBufferHandler(capacity=3)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(5):
+        handler.emit(logging.makeLogRecord({'msg': f'm{i}'}))
+    assert handler.tail(2) == ['m3\n', 'm4\n']
+    assert handler.tail(10) == ['m2\n', 'm3\n', 'm4\n']
+
+def test_shared_log_rotation_keeps_other_writers(tmp_path):
+    path = str(tmp_path / 'trading.log')
+    # 两个 handler 模拟两个 worker 进程写同一个文件
+    first = logger.SharedRotatingFileHandler(path, max_bytes=100, backup_count=5)
+    second = logger.SharedRotatingFileHandler(path, max_bytes=100, backup_count=5)
+    for handler in (first, second):
+        handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(10):
+        (first if i % 2 else second).emit(logging.makeLogRecord({'msg': 'x' * 40 + str(i)}))
+    first.close()
+    second.close()
+    assert (tmp_path / 'trading.log.2.gz').exists() and (tmp_path / 'trading.log.3.gz').exists()
+    lines = []
+    for archive in tmp_path.glob('trading.log*'):
+        if archive.suffix == '.gz':
+            lines += gzip.decompress(archive.read_bytes()).decode('utf-8').splitlines()
+        elif archive.suffix != '.lock':
+            lines += archive.read_text().splitlines()
+    # 轮转期间没有丢失任何一行
+    assert sorted(lines) == sorted('x' * 40 + str(i) for i in range(10))
@@ -0,0 +1,44 @@
+from stock_trader.services.market_collector import MarketDataCollector
+from stock_trader.utils.market import get_market_rows
+
+
+def test_collector_writes_once_per_interval():
+    now = [0.0]
+    written = []
+    collector = MarketDataCollector(
+        interval=60,
+        symbols=lambda: ['AAPL', 'MSFT'],
+        fetcher=lambda symbols: {s: {'price': 10.0, 'volatility': 1.0, 'volume': 5} for s in symbols},
+        writer=written.append,
+        clock=lambda: now[0],
+    )
+    assert collector.collect_once() is True
+    now[0] = 30
+    assert collector.collect_once() is False
+    now[0] = 61
+    assert collector.collect_once() is True
+    assert len(written) == 2
+    snapshot, collected_at = collector.latest_snapshot()
+    assert set(snapshot) == {'AAPL', 'MSFT'}
+    assert collected_at == 61
+
+def test_market_rows_prefer_snapshot_prices():
+    rows = get_market_rows(['AAPL', 'MSFT'], {'AAPL': {'price': 123.0}})
+    assert rows == [{'Symbol': 'AAPL', 'Price': 123.0}, {'Symbol': 'MSFT', 'Price': 100.0}]
+
+def test_only_lock_holder_collects(tmp_path):
+    lock_path = str(tmp_path / 'collector.lock')
+    fetcher = lambda symbols: {s: {'price': 10.0} for s in symbols}
+    leader = MarketDataCollector(interval=3600, symbols=lambda: ['AAPL'], fetcher=fetcher,
+                                 writer=lambda data: None, lock_path=lock_path)
+    follower = MarketDataCollector(interval=3600, symbols=lambda: ['AAPL'], fetcher=fetcher,
+                                   writer=lambda data: None, lock_path=lock_path,
+                                   reader=lambda: ({'AAPL': {'price': 11.0}}, 123.0))
+    try:
+        leader.start()
+        follower.start()
+        assert leader.is_leader and not follower.is_leader
+        assert follower.latest_snapshot() == ({'AAPL': {'price': 11.0}}, 123.0)
+    finally:
+        leader.stop(5)
+        follower.stop(5)
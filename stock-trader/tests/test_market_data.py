@@ -0,0 +1,90 @@
+import threading
+import time
+
+from stock_trader.utils.market_data import AsyncMarketDataFetcher, FakeMarketDataProvider, MarketDataProvider
+
+
+class GatedProvider(MarketDataProvider):
+    """
+    阻塞在 gate 上的假数据源：open_at 个调用同时进行时打开 gate；blocked 中的 symbol 一直阻塞到测试结束时 release()。
+    """
+
+    def __init__(self, open_at=None, blocked=()):
+        self.open_at = open_at
+        self.blocked = set(blocked)
+        self.gate = threading.Event()
+        self.stuck = threading.Event()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def fetch_one(self, symbol):
+        if symbol in self.blocked:
+            self.stuck.wait(10)
+            return {'price': 1.0, 'volatility': 0.0, 'volume': 0}
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            if self.open_at is None or self.active >= self.open_at:
+                self.gate.set()
+        try:
+            self.gate.wait(10)
+            return {'price': 1.0, 'volatility': 0.0, 'volume': 0}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def release(self):
+        self.gate.set()
+        self.stuck.set()
+
+
+def make_fetcher(provider, **kwargs):
+    options = {'timeout': 1.0, 'max_concurrency': 4, 'retries': 2, 'backoff': 0.01}
+    options.update(kwargs)
+    return AsyncMarketDataFetcher(provider, **options)
+
+
+def test_fetches_concurrently_within_limit():
+    # 只有 4 个请求同时在途时 gate 才会打开：串行执行会一直等到超时
+    provider = GatedProvider(open_at=4)
+    fetcher = make_fetcher(provider, timeout=5.0, max_concurrency=4, retries=0)
+    symbols = [f"S{i}" for i in range(8)] + ['AAPL']
+    try:
+        result = fetcher.fetch(symbols)
+    finally:
+        provider.release()
+        fetcher.close()
+    assert result.complete, result.errors
+    assert set(result.data) == set(symbols)
+    assert result.data['AAPL']['price'] == 1.0 and 'timestamp' in result.data['AAPL']
+    assert provider.max_active == 4
+
+
+def test_slow_symbol_times_out_with_partial_results():
+    provider = GatedProvider(blocked={'SLOW'})
+    fetcher = make_fetcher(provider, timeout=0.05, retries=0)
+    start = time.perf_counter()
+    try:
+        result = fetcher.fetch(['AAPL', 'SLOW', 'MSFT'])
+    finally:
+        provider.release()
+        fetcher.close()
+    # 上限放得很宽，只用于确认没有等 SLOW 返回（它会阻塞 10 秒）
+    assert time.perf_counter() - start < 5
+    assert set(result.data) == {'AAPL', 'MSFT'}
+    assert result.errors['SLOW'].startswith('timeout')
+    assert not result.complete
+
+
+def test_retries_with_backoff_and_records_metrics():
+    provider = FakeMarketDataProvider(failures={'FLAKY': 2, 'DEAD': -1})
+    fetcher = make_fetcher(provider, retries=2)
+    result = fetcher.fetch(['FLAKY', 'DEAD', 'AAPL'])
+    assert set(result.data) == {'FLAKY', 'AAPL'}
+    assert provider.calls == {'FLAKY': 3, 'DEAD': 3, 'AAPL': 1}
+    stats = fetcher.stats()
+    assert stats['FLAKY']['requests'] == 3 and stats['FLAKY']['failures'] == 2
+    assert stats['DEAD']['last_error'] == 'fake failure for DEAD'
+    assert stats['AAPL']['avg_latency'] >= 0
+    assert set(result.latencies) == {'FLAKY', 'DEAD', 'AAPL'}
@@ -0,0 +1,40 @@
+from stock_trader.services.market_history import MarketHistoryStore
+
+
+def make_store(tmp_path):
+    store = MarketHistoryStore(str(tmp_path / 'market.db'))
+    store.init()
+    return store
+
+def test_latest_snapshot_range_and_tail(tmp_path):
+    store = make_store(tmp_path)
+    store.append_snapshot({'AAPL': {'price': 1.0, 'timestamp': '2025-01-01T00:00:00'},
+                           'MSFT': {'price': 2.0, 'timestamp': '2025-01-01T00:00:01'}}, '2025-01-01 00:00:05')
+    store.append_snapshot({'AAPL': {'price': 3.0, 'timestamp': '2025-01-02T00:00:00'}}, '2025-01-02 00:00:05')
+    latest_date, rows = store.latest_snapshot()
+    assert latest_date == '2025-01-02 00:00:05'
+    assert [(r['symbol'], r['price']) for r in rows] == [('AAPL', 3.0)]
+    assert [r['price'] for r in store.range('AAPL', start='2025-01-01T12:00:00')] == [3.0]
+    assert [r['symbol'] for r in store.tail(2)] == ['MSFT', 'AAPL']
+    assert store.recent_dates(5) == ['2025-01-01 00:00:05', '2025-01-02 00:00:05']
+
+def test_duplicate_snapshot_rows_are_ignored(tmp_path):
+    store = make_store(tmp_path)
+    snapshot = {'AAPL': {'price': 1.0, 'timestamp': '2025-01-01T00:00:00'}}
+    assert store.append_snapshot(snapshot, '2025-01-01 00:00:05') == 1
+    assert store.append_snapshot(snapshot, '2025-01-01 00:00:05') == 0
+
+def test_migrate_from_csv(tmp_path):
+    csv_path = tmp_path / 'market_data.csv'
+    csv_path.write_text(
+        'date,symbol,price,volatility,volume,timestamp\n'
+        '2025-07-25 09:16:58,AAPL,213.76,2.16,45773373,2025-07-25T09:16:52\n'
+        '2025-07-25 09:16:58,NVDA,173.74,2.53,127727175,2025-07-25T09:16:52\n',
+        encoding='utf-8'
+    )
+    store = MarketHistoryStore(str(tmp_path / 'market.db'))
+    store.init(migrate_from=str(csv_path))
+    latest_date, rows = store.latest_snapshot()
+    assert latest_date == '2025-07-25 09:16:58'
+    assert rows[0]['price'] == 213.76
+    assert rows[1]['volume'] == 127727175
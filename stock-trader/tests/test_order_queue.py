@@ -0,0 +1,124 @@
+import time
+
+import pytest
+from stock_trader import data
+from stock_trader.services import trade_service, trading_executor
+from stock_trader.services.order_queue import OrderQueue
+from stock_trader.utils.cache import SharedCache
+
+
+@pytest.fixture
+def trades_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    trade_service.init_db()
+    return trade_service.DB_NAME
+
+
+def test_submit_returns_immediately_and_is_idempotent(trades_db, fake_quotes):
+    queue = OrderQueue()
+    order_id, created = queue.submit('AAPL', 'Buy', 2, idempotency_key='k1')
+    assert created
+    assert queue.submit('AAPL', 'Buy', 2, idempotency_key='k1') == (order_id, False)
+    assert queue.get_order(order_id)['status'] == 'pending'
+    assert fake_quotes.calls == 0
+    assert trade_service.get_trades() == []
+    with pytest.raises(ValueError):
+        queue.submit('AAPL', 'Hold', 1)
+
+
+def test_worker_fills_batch_in_one_transaction(trades_db, monkeypatch):
+    data.set_quote_provider(data.FakeQuoteProvider({'AAPL': 10.0, 'MSFT': 20.0, 'BAD': None}))
+    calls = []
+    original = trade_service.record_trades
+    monkeypatch.setattr(trade_service, 'record_trades', lambda batch, **kw: calls.append(list(batch)) or original(batch, **kw))
+    queue = OrderQueue(batch_size=10)
+    ids = [queue.submit(symbol, side, qty)[0]
+           for symbol, side, qty in [('AAPL', 'Buy', 3), ('MSFT', 'Buy', 1), ('AAPL', 'Sell', 1), ('BAD', 'Buy', 1)]]
+    assert queue.process_once() == 4
+    assert queue.process_once() == 0
+    assert len(calls) == 1
+    orders = [queue.get_order(i) for i in ids]
+    assert [o['status'] for o in orders] == ['filled', 'filled', 'filled', 'rejected']
+    assert [o['price'] for o in orders[:3]] == [10.0, 20.0, 10.0]
+    assert {p.symbol: p.quantity for p in trade_service.get_positions()} == {'AAPL': 2, 'MSFT': 1}
+    assert [e['type'] for e in queue.get_events(ids[0])] == ['submitted', 'claimed', 'filled']
+    assert queue.get_events(ids[0])[-1]['data']['trade_id'] == orders[0]['trade_id']
+    assert queue.counts() == {'filled': 3, 'rejected': 1}
+    assert queue.depth() == 0
+
+
+def test_expired_claim_is_reclaimed_and_filled_once(trades_db):
+    now = [1000.0]
+    first = OrderQueue(claim_timeout=30, clock=lambda: now[0])
+    second = OrderQueue(claim_timeout=30, clock=lambda: now[0])
+    order_id, _ = first.submit('AAPL', 'Buy', 1)
+    token, orders = first._claim()
+    assert second.process_once() == 0  # 租约未过期
+    now[0] += 31
+    assert second.process_once() == 1
+    # 原认领者恢复后提交：租约已被接管，整批回滚，不会重复成交
+    first._execute(token, orders)
+    assert len(trade_service.get_trades()) == 1
+    assert first.get_order(order_id)['status'] == 'filled'
+
+
+def test_stale_claim_in_batch_does_not_fail_the_other_orders(trades_db):
+    queue = OrderQueue(batch_size=10)
+    ids = [queue.submit(symbol, 'Buy', 1)[0] for symbol in ('AAPL', 'MSFT', 'NVDA')]
+    token, orders = queue._claim()
+    # 模拟第一个订单的租约已被其他 worker 接管
+    queue._connect().execute("UPDATE orders SET claim_token = 'other' WHERE id = ?", (ids[0],)).connection.commit()
+    assert queue._execute(token, orders) == 2
+    assert [queue.get_order(i)['status'] for i in ids] == ['claimed', 'filled', 'filled']
+    assert sorted(t.symbol for t in trade_service.get_trades()) == ['MSFT', 'NVDA']
+
+
+def test_failed_record_returns_orders_to_queue_until_max_attempts(trades_db, monkeypatch):
+    queue = OrderQueue(max_attempts=2)
+    order_id, _ = queue.submit('AAPL', 'Buy', 1)
+    monkeypatch.setattr(trade_service, 'record_trades', lambda batch, **kw: [])  # 如 database is locked
+    assert queue.process_once() == 1
+    order = queue.get_order(order_id)
+    assert (order['status'], order['attempts']) == ('pending', 1)
+    assert queue.process_once() == 1
+    order = queue.get_order(order_id)
+    assert (order['status'], order['attempts']) == ('failed', 2)
+    assert [e['type'] for e in queue.get_events(order_id)] == ['submitted', 'claimed', 'released', 'claimed', 'failed']
+
+
+def test_background_worker_drains_queue(trades_db):
+    queue = OrderQueue(poll_interval=0.05)
+    queue.start()
+    try:
+        ids = [queue.submit('AAPL', 'Buy', 1)[0] for _ in range(20)]
+        deadline = time.time() + 5
+        while queue.depth() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.stop(timeout=5)
+    assert all(queue.get_order(i)['status'] == 'filled' for i in ids)
+    assert trade_service.get_positions()[0].quantity == 20
+
+
+def test_auto_trade_enqueues_instead_of_executing(trades_db, fake_quotes, tmp_path, monkeypatch):
+    queue = OrderQueue()
+    monkeypatch.setattr(trading_executor, 'get_order_queue', lambda: queue)
+    monkeypatch.setattr(trading_executor, '_recent_llm_orders', SharedCache(str(tmp_path / 'state.db'), ttl=300))
+    result = trading_executor.auto_trade_by_llm_decision('建议买入AAPL', ['AAPL', 'MSFT'])
+    assert '订单 #1' in result
+    assert '已提交过' in trading_executor.auto_trade_by_llm_decision('建议买入AAPL', ['AAPL', 'MSFT'])
+    assert trade_service.get_trades() == [] and fake_quotes.calls == 0
+    queue.process_once()
+    assert queue.get_order(1)['status'] == 'filled'
+    assert trading_executor.auto_trade_by_llm_decision('观望', ['AAPL']) is None
+
+
+def test_llm_order_key_dedups_over_a_sliding_window(tmp_path):
+    now = [299.0]  # 旧实现按 300 秒分段：299 和 301 落在不同时间段
+    claims = SharedCache(str(tmp_path / 'state.db'), ttl=300, clock=lambda: now[0])
+    key = trading_executor.llm_order_key('Buy', 'AAPL', 1, claims=claims)
+    now[0] = 301.0
+    assert trading_executor.llm_order_key('Buy', 'AAPL', 1, claims=claims) == key
+    assert trading_executor.llm_order_key('Sell', 'AAPL', 1, claims=claims) != key
+    now[0] = 600.0
+    assert trading_executor.llm_order_key('Buy', 'AAPL', 1, claims=claims) != key
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from stock_trader.services.market_history import MarketHistoryStore
+from stock_trader.services.risk_analytics import RiskAnalytics
+
+
+def random_snapshots(n, symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, size=(n, len(symbols))), axis=0)
+    return [(f'2025-01-01 00:{i // 60:02d}:{i % 60:02d}', dict(zip(symbols, row))) for i, row in enumerate(prices)], prices
+
+
+def test_incremental_stats_match_full_recomputation():
+    symbols = ['AAPL', 'MSFT', 'NVDA']
+    snapshots, prices = random_snapshots(50, symbols)
+    risk = RiskAnalytics(window=20, periods_per_year=100)
+    for date, snapshot in snapshots:
+        risk.add_snapshot(date, snapshot)
+
+    tail = prices[-21:]
+    returns = tail[1:] / tail[:-1] - 1
+    stats = risk.symbol_stats(symbols)
+    for i, symbol in enumerate(symbols):
+        assert stats[symbol]['price'] == pytest.approx(prices[-1, i])
+        assert stats[symbol]['window_return'] == pytest.approx(tail[-1, i] / tail[0, i] - 1, abs=1e-6)
+        assert stats[symbol]['volatility'] == pytest.approx(returns[:, i].std(ddof=1) * 10, abs=1e-6)
+
+    holdings = {'AAPL': 2, 'MSFT': 1, 'NVDA': 3}
+    values = tail @ np.array([2, 1, 3])
+    value_returns = values[1:] / values[:-1] - 1
+    pf = risk.portfolio(holdings)
+    assert pf['value'] == pytest.approx(values[-1])
+    assert pf['volatility'] == pytest.approx(value_returns.std(ddof=1) * 10, abs=1e-6)
+    assert pf['sharpe'] == pytest.approx(value_returns.mean() / value_returns.std(ddof=1) * 10, abs=1e-5)
+    assert sorted(pf['correlation']['symbols']) == symbols
+    matrix = np.array(pf['correlation']['matrix'])
+    order = [symbols.index(s) for s in pf['correlation']['symbols']]
+    assert matrix == pytest.approx(np.corrcoef(returns[:, order], rowvar=False), abs=1e-4)
+
+
+def test_drawdown_and_missing_prices():
+    risk = RiskAnalytics(window=10, periods_per_year=1)
+    for i, price in enumerate([100, 120, 90, 110, None, 100]):
+        risk.add_snapshot(f'd{i}', {'AAPL': price, 'MSFT': 10.0 if i >= 2 else None})
+    pf = risk.portfolio({'AAPL': 1})
+    assert pf['max_drawdown'] == pytest.approx(0.25)  # 120 -> 90
+    assert pf['drawdown'] == pytest.approx(1 - 100 / 120, abs=1e-6)
+    assert pf['window_return'] == pytest.approx(0.0, abs=1e-6)
+    # 缺失价格沿用上一价格；MSFT 较晚出现，组合只计入两者都有价格的快照
+    assert risk.symbol_stats(['AAPL'])['AAPL']['return'] == pytest.approx(100 / 110 - 1, abs=1e-6)
+    both = risk.portfolio({'AAPL': 1, 'MSFT': 1})
+    assert both['window_return'] == pytest.approx(110 / 100 - 1, abs=1e-6)
+    assert risk.portfolio({'UNKNOWN': 5})['value'] is None
+
+
+def test_report_pulls_new_snapshots_and_caches_per_snapshot(tmp_path):
+    store = MarketHistoryStore(str(tmp_path / 'market.db'))
+    store.init()
+    for i, price in enumerate([10.0, 11.0, 12.0]):
+        store.append_snapshot({'AAPL': {'price': price}}, f'2025-01-0{i + 1} 00:00:00')
+    risk = RiskAnalytics(store=store, window=2, periods_per_year=1)
+
+    report = risk.report({'AAPL': 1})
+    assert report['date'] == '2025-01-03 00:00:00'
+    assert report['snapshots'] == 3
+    assert report['portfolio']['window_return'] == pytest.approx(0.2)
+    assert risk.report({'AAPL': 1}) is report
+    assert risk.update() == 0
+
+    store.append_snapshot({'AAPL': {'price': 9.0}}, '2025-01-04 00:00:00')
+    report = risk.report({'AAPL': 1})
+    assert report['date'] == '2025-01-04 00:00:00'
+    assert report['portfolio']['window_return'] == pytest.approx(9 / 11 - 1)
+    assert report['symbols']['AAPL']['return'] == pytest.approx(9 / 12 - 1)
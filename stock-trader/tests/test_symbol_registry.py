@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from stock_trader.services import symbol_registry
+from stock_trader.services.symbol_registry import SymbolRegistry
+from stock_trader.models.symbol import SymbolInfo
+from stock_trader.utils.market import get_asset_categories, get_watchlist, summarize_asset_values
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = SymbolRegistry([
+        SymbolInfo('AAPL', 'stock', 'NASDAQ', 'USD', 'Apple Inc.'),
+        SymbolInfo('AMZN', 'stock', 'NASDAQ', 'USD'),
+        SymbolInfo('BTC-USD', 'crypto', 'CCC', 'USD'),
+        SymbolInfo('AAPL', 'crypto'),  # 重复的 symbol 以第一条为准
+    ])
+    monkeypatch.setattr(symbol_registry, '_registry', registry)
+    return registry
+
+
+def test_lookup_and_search(registry):
+    assert len(registry) == 3
+    assert 'AAPL' in registry and 'TSLA' not in registry
+    assert registry.get('AAPL').exchange == 'NASDAQ'
+    assert registry.asset_class('BTC-USD') == 'crypto'
+    assert [info.symbol for info in registry.search('a')] == ['AAPL', 'AMZN']
+    assert [info.symbol for info in registry.search('a', limit=1)] == ['AAPL']
+    assert registry.search('X') == []
+    assert get_asset_categories() == (['AAPL', 'AMZN'], ['BTC-USD'])
+
+
+def test_summarize_asset_values_and_watchlist(registry):
+    rows = [
+        {'Symbol': 'BTC-USD', 'Buy Price': 10.0, 'Quantity': 2, 'Market Value': 30.0},
+        {'Symbol': 'AAPL', 'Buy Price': 5.0, 'Quantity': 1, 'Market Value': 6.0},
+        {'Symbol': 'UNKNOWN', 'Buy Price': 1.0, 'Quantity': 1, 'Market Value': 1.0},
+    ]
+    assert summarize_asset_values(rows) == (5.0, 6.0, 20.0, 30.0)
+    assert get_watchlist(rows[:1], limit=2) == ['BTC-USD', 'AAPL']
+
+
+def test_load_json_csv_and_db(tmp_path):
+    json_path = tmp_path / 'symbols.json'
+    json_path.write_text(json.dumps([{'symbol': 'eth-usd', 'asset_class': 'Crypto'}, {'symbol': 'MSFT'}]))
+    csv_path = tmp_path / 'symbols.csv'
+    csv_path.write_text('symbol,asset_class,exchange,currency,name\nVOD.L,stock,LSE,GBP,Vodafone\n')
+    loaded = SymbolRegistry.load(str(json_path))
+    assert loaded.symbols() == ['ETH-USD', 'MSFT']
+    assert loaded.get('ETH-USD').asset_class == 'crypto' and loaded.get('MSFT').currency == 'USD'
+    assert SymbolRegistry.load(str(csv_path)).get('VOD.L') == SymbolInfo('VOD.L', 'stock', 'LSE', 'GBP', 'Vodafone')
+
+    import sqlite3
+    db_path = tmp_path / 'symbols.db'
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE symbols (symbol TEXT, asset_class TEXT, exchange TEXT, currency TEXT, name TEXT)')
+        conn.execute("INSERT INTO symbols VALUES ('7203.T', 'stock', 'TSE', 'JPY', 'Toyota')")
+    assert SymbolRegistry.load(str(db_path)).get('7203.T').currency == 'JPY'
+
+
+def test_default_config_matches_original_watchlist():
+    registry = SymbolRegistry.load(symbol_registry.SYMBOLS_PATH)
+    assert registry.symbols() == ["AAPL", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "TSLA", "BTC-USD", "ETH-USD"]
+    assert registry.by_asset_class('crypto') == ["BTC-USD", "ETH-USD"]
@@ -26,3 +26,72 @@ def test_get_trades_handles_db_error(monkeypatch):
     monkeypatch.setattr(trade_service, 'DB_NAME', '/invalid/path/to/db')
     trades = trade_service.get_trades()
     assert trades == []
+
+def test_ledger_matches_full_recompute(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    monkeypatch.setattr(trade_service, 'get_stock_price', lambda symbol: 50.0)
+    trade_service.init_db()
+    trade_service.record_trade('AAPL', 'Buy', 10, 100)
+    trade_service.record_trade('MSFT', 'Buy', 4, 25)
+    trade_service.record_trade('AAPL', 'Sell', 4, 120)
+    trade_service.record_trade('MSFT', 'Sell', 4, 30)
+    trade_service.record_trade('AAPL', 'Buy', 2, 90)
+    from_ledger = trade_service.calculate_positions_from_ledger(initial_fund=10000)
+    from_trades = trade_service.calculate_positions_and_pnl(trade_service.get_trades(), initial_fund=10000)
+    assert from_ledger == from_trades
+    position_rows = from_ledger[0]
+    assert [row['Symbol'] for row in position_rows] == ['AAPL']
+    assert position_rows[0]['Quantity'] == 8
+    assert trade_service.verify_positions() == []
+
+def test_rebuild_positions_repairs_ledger(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    trade_service.init_db()
+    trade_service.record_trade('AAPL', 'Buy', 10, 100)
+    import sqlite3
+    with sqlite3.connect(trade_service.DB_NAME) as conn:
+        conn.execute('UPDATE positions SET quantity = 99')
+    assert trade_service.verify_positions() == ['AAPL']
+    assert trade_service.rebuild_positions() == 1
+    assert trade_service.verify_positions() == []
+
+def test_record_trades_batch_updates_ledger_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    trade_service.init_db()
+    ids = trade_service.record_trades([
+        ('AAPL', 'Buy', 10, 100), ('AAPL', 'Sell', 5, 110), ('MSFT', 'Buy', 1, 300),
+    ])
+    assert len(ids) == 3 and ids == sorted(ids)
+    positions = {p.symbol: p for p in trade_service.get_positions()}
+    assert positions['AAPL'].quantity == 5
+    assert positions['AAPL'].cost_basis == 500
+    assert trade_service.verify_positions() == []
+
+def test_connections_use_wal(tmp_path):
+    from stock_trader.services.db import get_connection
+    conn = get_connection(str(tmp_path / 'wal.db'))
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert get_connection(str(tmp_path / 'wal.db')) is conn
+
+def test_get_trades_keyset_pagination_and_filters(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    trade_service.init_db()
+    trade_service.record_trades([('AAPL', 'Buy', i + 1, 100) for i in range(5)] + [('MSFT', 'Buy', 1, 300)])
+    page, next_after_id = trade_service.get_trades_page(limit=4)
+    assert [t.id for t in page] == [6, 5, 4, 3]
+    rest, end_cursor = trade_service.get_trades_page(after_id=next_after_id, limit=4)
+    assert [t.id for t in rest] == [2, 1] and end_cursor is None
+    assert [t.id for t in trade_service.get_trades(symbol='MSFT')] == [6]
+    assert trade_service.get_trades(end='2000-01-01 00:00:00') == []
+    with trade_service.transaction(trade_service.DB_NAME) as conn:
+        plan = ' '.join(str(row) for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM trades WHERE symbol = ? ORDER BY timestamp DESC, id DESC', ('AAPL',)))
+    assert 'idx_trades_symbol_timestamp' in plan
+
+def test_execute_trades_returns_fill_prices(tmp_path, monkeypatch, fake_quotes):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    trade_service.init_db()
+    fills = trade_service.execute_trades([('AAPL', 'Buy', 2)])
+    [(trade_id, symbol, trade_type, quantity, price)] = fills
+    trade = trade_service.get_trades()[0]
+    assert (trade.id, trade.symbol, trade.type, trade.quantity, trade.price) == (trade_id, 'AAPL', 'Buy', 2, price)
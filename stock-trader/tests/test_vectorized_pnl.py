@@ -0,0 +1,57 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from stock_trader.models.trade import Trade
+from stock_trader.models.trade_batch import TradeBatch
+from stock_trader.services import trade_service
+from stock_trader.services.vectorized_pnl import calculate_positions_and_pnl_vectorized
+
+
+def random_trades(n, seed=0, allow_oversell=False):
+    rng = random.Random(seed)
+    held = {}
+    trades = []
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        symbol = rng.choice(['AAPL', 'MSFT', 'BTC-USD', 'TSLA'])
+        if held.get(symbol, 0) > 0 and rng.random() < 0.45:
+            quantity = rng.randint(1, held[symbol] + (5 if allow_oversell else 0))
+            type_ = 'Sell'
+        else:
+            quantity, type_ = rng.randint(1, 20), 'Buy'
+        held[symbol] = max(held.get(symbol, 0) + (quantity if type_ == 'Buy' else -quantity), 0)
+        trades.append(Trade(i + 1, symbol, type_, quantity, round(rng.uniform(10, 500), 2), start + timedelta(minutes=i)))
+    return trades
+
+
+def assert_same_output(expected, actual):
+    exp_rows, *exp_metrics = expected
+    act_rows, *act_metrics = actual
+    assert [r['Symbol'] for r in act_rows] == [r['Symbol'] for r in exp_rows]
+    for exp, act in zip(exp_rows, act_rows):
+        assert act['Quantity'] == exp['Quantity']
+        assert act['Buy Date'] == exp['Buy Date']
+        assert act['Buy Price'] == pytest.approx(exp['Buy Price'], abs=0.011)
+        assert act['P&L'] == pytest.approx(exp['P&L'], rel=1e-9, abs=1e-6)
+    assert act_metrics[:4] == pytest.approx(exp_metrics[:4], rel=1e-12)
+
+
+@pytest.mark.parametrize('allow_oversell', [False, True])
+def test_vectorized_matches_trade_by_trade(allow_oversell):
+    trades = random_trades(2000, seed=7, allow_oversell=allow_oversell)
+    expected = trade_service.calculate_positions_and_pnl(list(reversed(trades)), initial_fund=1_000_000)
+    actual = calculate_positions_and_pnl_vectorized(TradeBatch.from_trades(trades), initial_fund=1_000_000)
+    assert_same_output(expected, actual)
+
+
+def test_trade_batch_from_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_service, 'DB_NAME', str(tmp_path / 'trades.db'))
+    trade_service.init_db()
+    trade_service.record_trades([('AAPL', 'Buy', 10, 100), ('AAPL', 'Sell', 10, 110), ('AAPL', 'Buy', 2, 90)])
+    with trade_service.transaction(trade_service.DB_NAME) as conn:
+        batch = TradeBatch.from_db(conn)
+    assert len(batch) == 3 and batch.symbols == ['AAPL']
+    expected = trade_service.calculate_positions_from_ledger(initial_fund=10000)
+    assert_same_output(expected, calculate_positions_and_pnl_vectorized(batch, initial_fund=10000))
@@ -0,0 +1,10 @@
+"""
+生产环境 WSGI 入口：
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+worker 数、线程数和监听地址见 gunicorn.conf.py（可用环境变量覆盖）。
+"""
+from app import app
+
+application = app